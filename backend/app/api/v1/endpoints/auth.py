@@ -1,14 +1,18 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordRequestForm
-from app.models.user import Token, LoginRequest, User, UserCreate
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer, OAuth2PasswordRequestForm
+from app.models.user import Token, LoginRequest, RefreshRequest, User, UserCreate
 from app.services.auth import AuthService, get_current_active_user_dependency
 from app.services.user import UserService
 from app.core.database import get_database
+from app.core.admission import password_hashing_slot
+from app.services.revocation import revoke_token
 
 router = APIRouter()
+optional_security = HTTPBearer(auto_error=False)
 
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(password_hashing_slot)])
 async def login(login_data: LoginRequest, db=Depends(get_database)):
     """Login and get access token"""
     service = AuthService(db)
@@ -22,7 +26,9 @@ async def login(login_data: LoginRequest, db=Depends(get_database)):
     return token
 
 
-@router.post("/login/form", response_model=Token)
+@router.post(
+    "/login/form", response_model=Token, dependencies=[Depends(password_hashing_slot)]
+)
 async def login_form(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_database)):
     """Login with form data (OAuth2 compatible)"""
     service = AuthService(db)
@@ -42,7 +48,7 @@ async def read_users_me(current_user: User = Depends(get_current_active_user_dep
     return current_user
 
 
-@router.post("/register", response_model=Token)
+@router.post("/register", response_model=Token, dependencies=[Depends(password_hashing_slot)])
 async def register(user_data: UserCreate, db=Depends(get_database)):
     """Register a new user"""
     user_service = UserService(db)
@@ -50,7 +56,7 @@ async def register(user_data: UserCreate, db=Depends(get_database)):
     
     # Create the user
     try:
-        await user_service.create_user(user_data)
+        user = await user_service.create_user(user_data)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -58,16 +64,9 @@ async def register(user_data: UserCreate, db=Depends(get_database)):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
-    
-    # Authenticate the newly created user
-    token = await auth_service.authenticate_user(user_data.username, user_data.password)
-    if not token:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to authenticate after registration"
-        )
-    
-    return token
+
+    # The password was just hashed, so issue tokens without verifying it again
+    return auth_service.create_user_tokens(user)
 
 
 @router.post("/refresh", response_model=Token)
@@ -81,7 +80,34 @@ async def refresh_token(current_user: User = Depends(get_current_active_user_dep
     return Token(access_token=access_token, token_type="bearer", user=current_user)
 
 
+@router.post("/token/refresh", response_model=Token)
+async def refresh_with_refresh_token(refresh_data: RefreshRequest, db=Depends(get_database)):
+    """Exchange a refresh token for new tokens (stateless auth mode)"""
+    auth_service = AuthService(db)
+    token = await auth_service.refresh_user_tokens(refresh_data.refresh_token)
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return token
+
+
 @router.post("/logout")
-async def logout():
-    """Logout (client should remove token)"""
+async def logout(
+    refresh_data: Optional[RefreshRequest] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    db=Depends(get_database),
+):
+    """Logout, revoking the presented access token and refresh token if given"""
+    auth_service = AuthService(db)
+    if credentials:
+        token_data = auth_service.decode_token(credentials.credentials)
+        if token_data:
+            await revoke_token(db, token_data)
+    if refresh_data:
+        token_data = auth_service.decode_token(refresh_data.refresh_token, token_type="refresh")
+        if token_data:
+            await revoke_token(db, token_data)
     return {"message": "Successfully logged out"}
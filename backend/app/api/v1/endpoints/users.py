@@ -1,8 +1,14 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.models.user import User, UserCreate, UserUpdate, AdminUserUpdate
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from app.core.config import settings
+from app.models.user import User, UserCreate, UserUpdate, AdminUserUpdate, BulkUserResult
+from app.services.bulk_users import parse_user_rows
 from app.services.user import UserService
-from app.services.auth import get_current_active_user_dependency, get_current_admin_user_dependency
+from app.services.auth import (
+    get_current_active_user_dependency,
+    get_current_admin_user_dependency,
+    user_cache,
+)
 from app.core.database import get_database
 
 router = APIRouter()
@@ -17,6 +23,41 @@ async def create_user_by_admin(
     return await service.create_user(user, created_by_admin=True)
 
 
+@router.post("/bulk", response_model=BulkUserResult)
+async def bulk_create_users(
+    request: Request,
+    format: Optional[str] = Query(
+        None, pattern="^(csv|ndjson)$", description="Defaults from the Content-Type header"
+    ),
+    current_user: User = Depends(get_current_admin_user_dependency),
+    db=Depends(get_database),
+):
+    """Create users from a CSV (with header row) or NDJSON body (Admin only)
+
+    Rows that fail validation or clash with existing users are reported by line
+    number; all other rows are created.
+    """
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    try:
+        text = (await request.body()).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Upload must be UTF-8 encoded")
+
+    users, errors = parse_user_rows(text, format, max_rows=settings.BULK_USER_MAX_ROWS)
+    if len(users) + len(errors) > settings.BULK_USER_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.BULK_USER_MAX_ROWS} rows per upload",
+        )
+
+    service = UserService(db)
+    result = await service.bulk_create_users(users)
+    result.errors = sorted(errors + result.errors, key=lambda error: error.row)
+    result.failed = len(result.errors)
+    return result
+
+
 @router.get("/", response_model=List[User])
 async def get_all_users(current_user: User = Depends(get_current_admin_user_dependency), db=Depends(get_database)):
     """Get all users (Admin only)"""
@@ -30,6 +71,12 @@ async def get_current_user(current_user: User = Depends(get_current_active_user_
     return current_user
 
 
+@router.get("/cache/stats")
+async def get_user_cache_stats(current_user: User = Depends(get_current_admin_user_dependency)):
+    """Get hit-rate statistics of the authenticated-user cache (Admin only)"""
+    return user_cache.stats()
+
+
 @router.get("/{user_id}", response_model=User)
 async def get_user_by_id(
     user_id: str, current_user: User = Depends(get_current_admin_user_dependency), db=Depends(get_database)
@@ -1,15 +1,33 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from app.models.workflow import Workflow, WorkflowCreate, WorkflowUpdate
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.models.workflow import (
+    CompiledWorkflow,
+    TraversalDirection,
+    Workflow,
+    WorkflowCreate,
+    WorkflowSubgraph,
+    WorkflowUpdate,
+)
 from app.models.user import User
+from app.models.analysis import WorkflowEstimate, WorkflowTokenReport
 from app.services.workflow import WorkflowService
+from app.services.graph import extract_subgraph
+from app.services.compiler import WorkflowCompiler
+from app.services.estimator import estimate_workflow
+from app.services.tokens import count_workflow_tokens
 from app.services.auth import get_current_active_user_dependency
-from app.core.database import get_database
+from app.core.database import causal_session, get_database
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[Workflow])
+async def user_causal_session(current_user: User = Depends(get_current_active_user_dependency)):
+    """Run the request in the user's causally consistent session (secondary reads only)"""
+    async with causal_session(current_user.id):
+        yield
+
+
+@router.get("/", response_model=List[Workflow], dependencies=[Depends(user_causal_session)])
 async def get_workflows(
     skip: int = 0,
     limit: int = 100,
@@ -22,7 +40,7 @@ async def get_workflows(
     return await service.get_workflows(skip=skip, limit=limit)
 
 
-@router.post("/", response_model=Workflow)
+@router.post("/", response_model=Workflow, dependencies=[Depends(user_causal_session)])
 async def create_workflow(
     workflow: WorkflowCreate,
     current_user: User = Depends(get_current_active_user_dependency),
@@ -47,7 +65,7 @@ async def get_workflow(
     return workflow
 
 
-@router.put("/{workflow_id}", response_model=Workflow)
+@router.put("/{workflow_id}", response_model=Workflow, dependencies=[Depends(user_causal_session)])
 async def update_workflow(
     workflow_id: str,
     workflow_update: WorkflowUpdate,
@@ -71,7 +89,7 @@ async def update_workflow(
         raise e
 
 
-@router.delete("/{workflow_id}")
+@router.delete("/{workflow_id}", dependencies=[Depends(user_causal_session)])
 async def delete_workflow(
     workflow_id: str,
     current_user: User = Depends(get_current_active_user_dependency),
@@ -85,7 +103,7 @@ async def delete_workflow(
     return {"message": "Workflow deleted successfully"}
 
 
-@router.post("/{workflow_id}/share")
+@router.post("/{workflow_id}/share", dependencies=[Depends(user_causal_session)])
 async def share_workflow(
     workflow_id: str,
     current_user: User = Depends(get_current_active_user_dependency),
@@ -110,16 +128,93 @@ async def get_shared_workflow(share_token: str, db=Depends(get_database)):
     return workflow
 
 
+@router.get("/shared/{share_token}/compiled", response_model=CompiledWorkflow)
+async def get_shared_compiled_workflow(share_token: str, db=Depends(get_database)):
+    """Get the compiled artifact of a shared workflow (no auth required)"""
+    service = WorkflowService(db)
+    workflow = await service.get_workflow_by_share_token(share_token)
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    return await WorkflowCompiler(db).get_compiled(workflow)
+
+
+@router.get("/{workflow_id}/compiled", response_model=CompiledWorkflow)
+async def get_compiled_workflow(
+    workflow_id: str,
+    current_user: User = Depends(get_current_active_user_dependency),
+    db=Depends(get_database),
+):
+    """Get derived data (adjacency, execution order, inputs, placeholders) for a workflow"""
+    service = WorkflowService(db)
+    workflow = await service.get_workflow(workflow_id)
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    return await WorkflowCompiler(db).get_compiled(workflow)
+
+
 @router.get("/{workflow_id}/export")
 async def export_workflow(
+    workflow_id: str,
+    include_plan: bool = False,
+    current_user: User = Depends(get_current_active_user_dependency),
+    db=Depends(get_database),
+):
+    """Export workflow as JSON, optionally with a parallel execution plan"""
+    service = WorkflowService(db)
+    workflow = await service.get_workflow(workflow_id)
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    exported = workflow.dict(exclude={"id", "owner_id", "created_at", "updated_at"})
+    if include_plan:
+        compiled = await WorkflowCompiler(db).get_compiled(workflow)
+        exported["execution_plan"] = compiled.execution_plan.model_dump()
+    return exported
+
+
+
+@router.get("/{workflow_id}/subgraph", response_model=WorkflowSubgraph)
+async def get_workflow_subgraph(
+    workflow_id: str,
+    node: str,
+    direction: TraversalDirection = TraversalDirection.BOTH,
+    depth: Optional[int] = Query(None, ge=1),
+    current_user: User = Depends(get_current_active_user_dependency),
+    db=Depends(get_database),
+):
+    """Get the part of a workflow upstream and/or downstream of a node"""
+    service = WorkflowService(db)
+    workflow = await service.get_workflow(workflow_id)
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    subgraph = extract_subgraph(workflow, node, direction, depth)
+    if subgraph is None:
+        raise HTTPException(status_code=404, detail="Node not found in workflow")
+    return subgraph
+
+
+@router.get("/{workflow_id}/estimate", response_model=WorkflowEstimate)
+async def estimate_workflow_cost(
     workflow_id: str,
     current_user: User = Depends(get_current_active_user_dependency),
     db=Depends(get_database),
 ):
-    """Export workflow as JSON"""
+    """Estimate critical-path latency, token budget and cost per run"""
     service = WorkflowService(db)
     workflow = await service.get_workflow(workflow_id)
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
-    return workflow.dict(exclude={"id", "owner_id", "created_at", "updated_at"})
+    return estimate_workflow(workflow)
 
+
+@router.get("/{workflow_id}/tokens", response_model=WorkflowTokenReport)
+async def get_workflow_token_counts(
+    workflow_id: str,
+    current_user: User = Depends(get_current_active_user_dependency),
+    db=Depends(get_database),
+):
+    """Count prompt tokens per agent node against each node's max_tokens"""
+    service = WorkflowService(db)
+    workflow = await service.get_workflow(workflow_id)
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    return await count_workflow_tokens(workflow)
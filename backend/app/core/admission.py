@@ -0,0 +1,105 @@
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict
+from fastapi import HTTPException, Request, status
+from app.core.config import settings
+
+
+class AdmissionController:
+    """Concurrency limiter with a bounded wait queue served round-robin per client
+
+    Up to `limit` holders run at once. Further callers wait in a per-client
+    queue; when a slot frees, the next waiter is taken from the next client in
+    turn, so one client flooding the queue cannot starve the others. Callers
+    beyond `queue_size` in total, or `per_client_queue` for a single client,
+    are rejected immediately with 503 and a Retry-After header.
+    """
+
+    def __init__(self, limit: int, queue_size: int, per_client_queue: int, retry_after: int = 1):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.per_client_queue = per_client_queue
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    def _reject(self):
+        self.rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    def _release(self):
+        # Hand the slot directly to the next waiter, rotating across clients
+        while self._queues:
+            client, queue = self._queues.popitem(last=False)
+            waiter = queue.popleft()
+            if queue:
+                self._queues[client] = queue
+            self.waiting -= 1
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, client: str):
+        if self.active < self.limit and not self._queues:
+            self.active += 1
+        else:
+            queue = self._queues.get(client)
+            if self.waiting >= self.queue_size or (
+                queue is not None and len(queue) >= self.per_client_queue
+            ):
+                self._reject()
+            waiter = asyncio.get_running_loop().create_future()
+            if queue is None:
+                queue = self._queues[client] = deque()
+            queue.append(waiter)
+            self.waiting += 1
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was handed over just as we were cancelled
+                    self._release()
+                else:
+                    self._forget(client, waiter)
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _forget(self, client: str, waiter: asyncio.Future):
+        queue = self._queues.get(client)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self.waiting -= 1
+            if not queue:
+                del self._queues[client]
+
+    def stats(self) -> Dict[str, int]:
+        return {"active": self.active, "waiting": self.waiting, "rejected": self.rejected}
+
+
+# Guards endpoints that hash or verify passwords
+password_hashing_admission = AdmissionController(
+    limit=settings.PASSWORD_HASH_CONCURRENCY,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    per_client_queue=settings.PASSWORD_HASH_QUEUE_PER_CLIENT,
+    retry_after=settings.PASSWORD_HASH_RETRY_AFTER_SECONDS,
+)
+
+
+async def password_hashing_slot(request: Request):
+    """Dependency holding a password-hashing slot for the duration of the request"""
+    # request.client reflects X-Forwarded-For when uvicorn runs with --proxy-headers
+    client = request.client.host if request.client else "unknown"
+    async with password_hashing_admission.slot(client):
+        yield
@@ -0,0 +1,146 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class LRUCache:
+    """Bounded in-process mapping that evicts the least recently used entry."""
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return the cached value for key, building and storing it on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        return self._data.pop(key, default)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def pop_matching(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key satisfies predicate; returns how many were dropped"""
+        keys = [key for key in self._data if predicate(key)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        return list(self._data.items())
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TTLCache(LRUCache):
+    """LRU cache whose entries also expire ttl seconds after being stored"""
+
+    def __init__(self, maxsize: int = 128, ttl: float = 60.0):
+        super().__init__(maxsize)
+        self.ttl = ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.ttl <= 0:
+            # A zero TTL disables caching entirely
+            return
+        super().set(key, (time.monotonic() + self.ttl, value))
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        now = time.monotonic()
+        return [(key, value) for key, (expires, value) in self._data.items() if expires > now]
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+
+# Named in-process caches, so their statistics can be reported in one place
+_registry: Dict[str, LRUCache] = {}
+
+# Per collection, (cache name, callback) pairs dropping entries derived from a
+# changed document; the callback gets the document's _id, or None when the
+# whole collection changed (dropped, renamed, or changes may have been missed)
+_invalidators: Dict[str, List[Tuple[str, Callable[[Any], None]]]] = {}
+
+
+def register_cache(
+    name: str,
+    cache: LRUCache,
+    invalidate: Optional[Dict[str, Callable[[Any], None]]] = None,
+) -> LRUCache:
+    """Register a cache, with callbacks for collections whose changes make it stale"""
+    _registry[name] = cache
+    for collection, callback in (invalidate or {}).items():
+        _invalidators.setdefault(collection, []).append((name, callback))
+    return cache
+
+
+def registered_caches() -> Dict[str, LRUCache]:
+    return dict(_registry)
+
+
+def drop_workflow_entries(cache: LRUCache, workflow_id: Any) -> None:
+    """Invalidation callback for caches keyed by (workflow_id, version)"""
+    if workflow_id is None:
+        cache.clear()
+    else:
+        cache.pop_matching(lambda key: key[0] == str(workflow_id))
+
+
+def registered_invalidators() -> Dict[str, List[Tuple[str, Callable[[Any], None]]]]:
+    return {collection: list(callbacks) for collection, callbacks in _invalidators.items()}
+
+
+_MISSING = object()
@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import List, Optional
 from pydantic import ConfigDict
 from pydantic_settings import BaseSettings
 
@@ -13,9 +13,157 @@ class Settings(BaseSettings):
     MONGODB_URL: str = os.getenv("MONGODB_URL", "mongodb://host.docker.internal:27017")
     DATABASE_NAME: str = os.getenv("DATABASE_NAME", "musashi")
 
+    # Connection pool, timeouts and wire compression (comma-separated, in order of
+    # preference: zstd needs zstandard, snappy needs python-snappy, zlib is built in)
+    MONGODB_MAX_POOL_SIZE: int = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+    MONGODB_MIN_POOL_SIZE: int = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+    MONGODB_MAX_IDLE_TIME_MS: Optional[int] = (
+        int(os.getenv("MONGODB_MAX_IDLE_TIME_MS"))
+        if os.getenv("MONGODB_MAX_IDLE_TIME_MS")
+        else None
+    )
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = (
+        int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS"))
+        if os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS")
+        else None
+    )
+    MONGODB_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "20000"))
+    MONGODB_SOCKET_TIMEOUT_MS: Optional[int] = (
+        int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS"))
+        if os.getenv("MONGODB_SOCKET_TIMEOUT_MS")
+        else None
+    )
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = int(
+        os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "30000")
+    )
+    MONGODB_COMPRESSORS: str = os.getenv("MONGODB_COMPRESSORS", "")
+    # Write concern: "majority" or a node count; unset uses the server default
+    MONGODB_WRITE_CONCERN: Optional[str] = os.getenv("MONGODB_WRITE_CONCERN")
+    MONGODB_WRITE_CONCERN_TIMEOUT_MS: Optional[int] = (
+        int(os.getenv("MONGODB_WRITE_CONCERN_TIMEOUT_MS"))
+        if os.getenv("MONGODB_WRITE_CONCERN_TIMEOUT_MS")
+        else None
+    )
+
+    # Route list and shared-view reads to secondaries (replica sets only); the
+    # driver requires maxStalenessSeconds of at least 90
+    MONGODB_SECONDARY_READS: bool = os.getenv("MONGODB_SECONDARY_READS", "false").lower() == "true"
+    MONGODB_MAX_STALENESS_SECONDS: int = max(
+        90, int(os.getenv("MONGODB_MAX_STALENESS_SECONDS", "90"))
+    )
+
+    # Storage backend: "mongodb"; "sqlite" for single-node installs without a
+    # MongoDB server (data lives in one file at SQLITE_PATH); or "memory", which
+    # keeps everything in the process and is meant for tests and benchmarks
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "mongodb").lower()
+    SQLITE_PATH: str = os.getenv("SQLITE_PATH", "musashi.db")
+
     # JWT
     ALGORITHM: str = "HS256"
 
+    # Stateless auth: short-lived access tokens carry the user's claims so requests
+    # authorize without a database lookup; refresh tokens recheck the database
+    AUTH_STATELESS: bool = os.getenv("AUTH_STATELESS", "false").lower() == "true"
+    STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES: int = int(
+        os.getenv("STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES", "15")
+    )
+    REFRESH_TOKEN_EXPIRE_MINUTES: int = int(
+        os.getenv("REFRESH_TOKEN_EXPIRE_MINUTES", str(60 * 24 * 8))
+    )
+
+    # Password hashing: scheme for new hashes and its cost. Hashes with another
+    # scheme or cost are upgraded on the next successful login. See
+    # scripts/calibrate_password_hashing.py to pick costs for a latency budget.
+    PASSWORD_HASH_SCHEME: str = os.getenv("PASSWORD_HASH_SCHEME", "bcrypt")
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    ARGON2_TIME_COST: int = int(os.getenv("ARGON2_TIME_COST", "3"))
+    ARGON2_MEMORY_COST: int = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+    ARGON2_PARALLELISM: int = int(os.getenv("ARGON2_PARALLELISM", "1"))
+
+    # Threads that run password hashing off the event loop
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+    # Bulk user provisioning: processes hashing passwords and rows accepted per upload
+    BULK_HASH_WORKERS: int = int(os.getenv("BULK_HASH_WORKERS", str(os.cpu_count() or 1)))
+    BULK_USER_MAX_ROWS: int = int(os.getenv("BULK_USER_MAX_ROWS", "10000"))
+
+    # Admission control for login/register: concurrent requests, then a bounded
+    # fair queue; overflow is rejected with 503 and Retry-After
+    PASSWORD_HASH_CONCURRENCY: int = int(
+        os.getenv("PASSWORD_HASH_CONCURRENCY", str(os.cpu_count() or 1))
+    )
+    PASSWORD_HASH_QUEUE_SIZE: int = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "64"))
+    PASSWORD_HASH_QUEUE_PER_CLIENT: int = int(os.getenv("PASSWORD_HASH_QUEUE_PER_CLIENT", "4"))
+    PASSWORD_HASH_RETRY_AFTER_SECONDS: int = int(
+        os.getenv("PASSWORD_HASH_RETRY_AFTER_SECONDS", "1")
+    )
+
+    # Resolved users cached per process for authentication (0 seconds disables)
+    USER_CACHE_TTL_SECONDS: float = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+    # Token revocation (logout, deactivation)
+    REVOCATION_SYNC_SECONDS: float = float(os.getenv("REVOCATION_SYNC_SECONDS", "5"))
+    REVOCATION_SYNC_OVERLAP_SECONDS: float = float(
+        os.getenv("REVOCATION_SYNC_OVERLAP_SECONDS", "60")
+    )
+    REVOCATION_BLOOM_CAPACITY: int = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+
+    # Cross-process cache invalidation: follow a change stream (replica sets only)
+    # and otherwise cap affected cache TTLs at the fallback
+    CACHE_CHANGE_STREAMS: bool = os.getenv("CACHE_CHANGE_STREAMS", "true").lower() == "true"
+    CACHE_FALLBACK_TTL_SECONDS: float = float(os.getenv("CACHE_FALLBACK_TTL_SECONDS", "5"))
+    CACHE_INVALIDATION_RETRY_SECONDS: float = float(
+        os.getenv("CACHE_INVALIDATION_RETRY_SECONDS", "5")
+    )
+
+    # Workflow autosaves: consecutive saves by the same author within this window
+    # are merged into one database write (0 writes every save through). The
+    # buffer is per process, so it stays off when WEB_CONCURRENCY (the worker
+    # count uvicorn and gunicorn read) is above 1
+    WORKFLOW_SAVE_COALESCE_MS: int = int(os.getenv("WORKFLOW_SAVE_COALESCE_MS", "0"))
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+    # Prometheus metrics at /metrics (scraped from the backend port; nginx answers
+    # 404 for it) and how often the event loop's lag is sampled. When the backend
+    # port is reachable by others, set METRICS_TOKEN: scrapes must then send it as
+    # a bearer token
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+    EVENT_LOOP_LAG_INTERVAL_SECONDS: float = float(
+        os.getenv("EVENT_LOOP_LAG_INTERVAL_SECONDS", "0.5")
+    )
+
+    # Per-request database tracing: command count and time in a Server-Timing
+    # header; payload bytes too when DB_TRACING_BYTES (re-encodes each command)
+    DB_TRACING_ENABLED: bool = os.getenv("DB_TRACING_ENABLED", "true").lower() == "true"
+    DB_TRACING_BYTES: bool = os.getenv("DB_TRACING_BYTES", "false").lower() == "true"
+
+    # On-demand profiling of admin requests (X-Profile header or ?profile=1):
+    # sampling interval, profiles allowed per minute, and an optional directory
+    # to store speedscope files in instead of returning them
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_INTERVAL_MS: float = float(os.getenv("PROFILING_INTERVAL_MS", "1"))
+    PROFILING_MAX_PER_MINUTE: int = int(os.getenv("PROFILING_MAX_PER_MINUTE", "6"))
+    PROFILING_OUTPUT_DIR: Optional[str] = os.getenv("PROFILING_OUTPUT_DIR")
+
+    # Logging: records go through a bounded queue to one writer thread, as JSON
+    # lines or plain text. LOG_LEVELS overrides levels per logger
+    # ("app.services=debug,pymongo=warning"); DEBUG records are sampled to the
+    # first and every LOG_DEBUG_SAMPLE_EVERY-th of each call site
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "info")
+    LOG_LEVELS: str = os.getenv("LOG_LEVELS", "")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    LOG_DEBUG_SAMPLE_EVERY: int = int(os.getenv("LOG_DEBUG_SAMPLE_EVERY", "10"))
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+    # Workflow analysis: optional JSON file overriding the per-model latency/price table
+    MODEL_PROFILES_PATH: Optional[str] = os.getenv("MODEL_PROFILES_PATH")
+
+    # Prompt token counting: encoding for models tiktoken does not know, and LRU size
+    TOKEN_ENCODING: str = os.getenv("TOKEN_ENCODING", "o200k_base")
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
     model_config = ConfigDict(case_sensitive=True)
 
     @property
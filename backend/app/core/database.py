@@ -1,29 +1,269 @@
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Hashable, Optional
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.read_preferences import SecondaryPreferred
+from app.core.cache import TTLCache, register_cache
 from app.core.config import settings
+from app.core.metrics import Counter, Histogram, register_metric
 
 # Global database instance
 client = None
 database = None
+_client_lock = threading.Lock()
+
+# Session for the current request, if it runs in a causally consistent session
+current_session: ContextVar = ContextVar("current_session", default=None)
+
+# Objects told about each command the current request sends (see observe_commands).
+# Motor runs operations on its executor in a copy of the caller's context, so
+# the listener, called on that thread, sees the request's observers.
+command_observers: ContextVar[tuple] = ContextVar("command_observers", default=())
+
+# Per-user (cluster time, operation time) of their latest session, so the next
+# request's secondary reads wait for the user's own writes. Past the staleness
+# bound every eligible secondary has caught up, so entries can expire.
+_causal_times = register_cache(
+    "causal_times",
+    TTLCache(maxsize=10000, ttl=2 * settings.MONGODB_MAX_STALENESS_SECONDS),
+)
+
+mongo_command_seconds = register_metric(
+    Histogram(
+        "mongodb_command_duration_seconds",
+        "MongoDB command round-trip time",
+        labels=("command", "collection", "outcome"),
+    )
+)
+mongo_pool_wait_seconds = register_metric(
+    Histogram(
+        "mongodb_pool_wait_seconds",
+        "Time spent waiting to check a connection out of the pool",
+        labels=("outcome",),
+    )
+)
+mongo_connections_created = register_metric(
+    Counter("mongodb_connections_created_total", "Connections opened by the pool")
+)
+
+
+class CommandLatencyListener(monitoring.CommandListener):
+    """Records every command's duration, labelled by command name and collection"""
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        target = event.command.get(
+            "collection" if event.command_name == "getMore" else event.command_name
+        )
+        self._collections[(event.connection_id, event.request_id)] = (
+            target if isinstance(target, str) else ""
+        )
+        for observer in command_observers.get():
+            observer.command_started(event)
+
+    def succeeded(self, event):
+        self._record(event, "success")
+
+    def failed(self, event):
+        self._record(event, "failure")
+
+    def _record(self, event, outcome: str):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        mongo_command_seconds.observe(
+            event.duration_micros / 1_000_000, event.command_name, collection, outcome
+        )
+        for observer in command_observers.get():
+            observer.command_finished(event, collection)
+
+
+class PoolWaitListener(monitoring.ConnectionPoolListener):
+    """Records how long operations wait for a pooled connection"""
+
+    def __init__(self):
+        # Check-out starts and completes on the same thread
+        self._local = threading.local()
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self._record(event, "success")
+
+    def connection_check_out_failed(self, event):
+        self._record(event, str(event.reason))
+
+    def _record(self, event, outcome: str):
+        # pymongo 4.7+ reports the wait itself; older versions are timed here
+        duration = getattr(event, "duration", None)
+        if duration is None:
+            started = getattr(self._local, "started", None)
+            if started is None:
+                return
+            duration = time.perf_counter() - started
+        mongo_pool_wait_seconds.observe(duration, outcome)
+
+    def connection_created(self, event):
+        mongo_connections_created.inc()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+@contextmanager
+def observe_commands(observer):
+    """Report the commands sent within this block to observer
+
+    observer.command_started(event) and observer.command_finished(event,
+    collection) are called with pymongo's command monitoring events, on
+    whichever thread runs the command.
+    """
+    token = command_observers.set(command_observers.get() + (observer,))
+    try:
+        yield observer
+    finally:
+        command_observers.reset(token)
+
+
+def client_options() -> dict:
+    """Motor client options from settings"""
+    options = {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "connectTimeoutMS": settings.MONGODB_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "event_listeners": [CommandLatencyListener(), PoolWaitListener()],
+    }
+    optional = {
+        "maxIdleTimeMS": settings.MONGODB_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        "socketTimeoutMS": settings.MONGODB_SOCKET_TIMEOUT_MS,
+        "wTimeoutMS": settings.MONGODB_WRITE_CONCERN_TIMEOUT_MS,
+    }
+    options.update({key: value for key, value in optional.items() if value is not None})
+    if settings.MONGODB_COMPRESSORS:
+        options["compressors"] = settings.MONGODB_COMPRESSORS
+    if settings.MONGODB_WRITE_CONCERN:
+        w = settings.MONGODB_WRITE_CONCERN
+        options["w"] = int(w) if w.isdigit() else w
+    return options
+
+
+def get_client() -> AsyncIOMotorClient:
+    """The process-wide client, created once even if first requested concurrently"""
+    global client, database
+    if client is None:
+        with _client_lock:
+            if client is None:
+                new_client = AsyncIOMotorClient(settings.MONGODB_URL, **client_options())
+                database = new_client[settings.DATABASE_NAME]
+                client = new_client
+    return client
+
+
+def get_embedded_database():
+    """The process-wide embedded (sqlite or memory) database, opened on first use"""
+    global database
+    if database is None:
+        with _client_lock:
+            if database is None:
+                if settings.STORAGE_BACKEND == "memory":
+                    from app.services.storage.memory import open_memory_database
+
+                    database = open_memory_database(settings.DATABASE_NAME)
+                else:
+                    from app.services.storage.sqlite import open_sqlite_database
+
+                    database = open_sqlite_database(settings.SQLITE_PATH, settings.DATABASE_NAME)
+    return database
 
 
 def get_database():
     """Get database instance for dependency injection"""
-    global client, database
+    if settings.STORAGE_BACKEND in ("sqlite", "memory"):
+        return get_embedded_database()
     if database is None:
-        client = AsyncIOMotorClient(settings.MONGODB_URL)
-        database = client[settings.DATABASE_NAME]
+        get_client()
     return database
 
 
 async def connect_to_database():
     """Initialize database connection"""
-    global client, database
-    client = AsyncIOMotorClient(settings.MONGODB_URL)
-    database = client[settings.DATABASE_NAME]
+    get_database()
 
 
 async def close_database_connection():
     """Close database connection"""
-    global client
-    if client:
-        client.close()
+    global client, database
+    with _client_lock:
+        if client:
+            client.close()
+        elif database is not None:
+            database.close()
+        client = None
+        database = None
+
+
+def secondary_reads(collection):
+    """View of collection that reads from secondaries within the staleness bound"""
+    if not settings.MONGODB_SECONDARY_READS:
+        return collection
+    return collection.with_options(
+        read_preference=SecondaryPreferred(max_staleness=settings.MONGODB_MAX_STALENESS_SECONDS)
+    )
+
+
+def session_kwargs() -> dict:
+    """Keyword arguments binding a collection call to the current request's session"""
+    session = current_session.get()
+    return {"session": session} if session is not None else {}
+
+
+@asynccontextmanager
+async def causal_session(user_key: Optional[Hashable]):
+    """Causally consistent session continuing from the user's previous request
+
+    Only used with secondary reads; on the primary every read already sees
+    every acknowledged write.
+    """
+    if (
+        not settings.MONGODB_SECONDARY_READS
+        or settings.STORAGE_BACKEND != "mongodb"
+        or user_key is None
+    ):
+        yield None
+        return
+    async with await get_client().start_session(causal_consistency=True) as session:
+        times = _causal_times.get(user_key)
+        if times is not None:
+            session.advance_cluster_time(times[0])
+            session.advance_operation_time(times[1])
+        current_session.set(session)
+        try:
+            yield session
+        finally:
+            current_session.set(None)
+            if session.operation_time is not None:
+                _causal_times.set(user_key, (session.cluster_time, session.operation_time))
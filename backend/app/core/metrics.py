@@ -0,0 +1,196 @@
+import math
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# Seconds; suits both sub-millisecond pool waits and multi-second queries
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Bytes; from an empty body up to bulk uploads
+SIZE_BUCKETS = (0, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge:
+    """Current value per label combination"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = value
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def dec(self, *label_values: str, amount: float = 1.0) -> None:
+        self.inc(*label_values, amount=-amount)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class HistogramSeries:
+    """One label combination of a histogram, resolved ahead of time for hot paths"""
+
+    __slots__ = ("_histogram", "_series")
+
+    def __init__(self, histogram: "Histogram", series: List[float]):
+        self._histogram = histogram
+        self._series = series
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self._histogram.buckets, value)
+        series = self._series
+        with self._histogram._lock:
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+
+class Histogram:
+    """Bucketed distribution per label combination
+
+    Observations may come from pymongo's monitoring threads as well as the event
+    loop, so updates take a lock. Bucket counts are stored per bucket, not
+    cumulatively; the last slot counts observations above the largest bound.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def _get_series(self, label_values: Tuple[str, ...]) -> List[float]:
+        series = self._series.get(label_values)
+        if series is None:
+            # [bucket counts..., overflow count, sum, count]
+            series = self._series[label_values] = [0.0] * (len(self.buckets) + 3)
+        return series
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._get_series(label_values)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def series(self, *label_values: str) -> HistogramSeries:
+        with self._lock:
+            return HistogramSeries(self, self._get_series(label_values))
+
+    def snapshot(self) -> Dict[Tuple[str, ...], dict]:
+        with self._lock:
+            return {
+                label_values: {
+                    "buckets": list(zip(self.buckets, series[: len(self.buckets)])),
+                    "overflow": series[len(self.buckets)],
+                    "sum": series[-2],
+                    "count": series[-1],
+                }
+                for label_values, series in self._series.items()
+            }
+
+
+# Named metrics, so they can be exported in one place
+_registry: Dict[str, object] = {}
+
+
+def register_metric(metric):
+    _registry[metric.name] = metric
+    return metric
+
+
+def registered_metrics() -> Dict[str, object]:
+    return dict(_registry)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def render_prometheus(metrics: Iterable[object]) -> str:
+    """Metrics in the Prometheus text exposition format (version 0.0.4)
+
+    Histogram buckets are converted to the cumulative counts Prometheus expects.
+    """
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        if metric.kind == "histogram":
+            for label_values, data in sorted(metric.snapshot().items()):
+                cumulative = 0.0
+                for bound, count in data["buckets"] + [(math.inf, data["overflow"])]:
+                    cumulative += count
+                    labels = _format_labels(
+                        metric.labels + ("le",), label_values + (_format_value(bound),)
+                    )
+                    lines.append(f"{metric.name}_bucket{labels} {_format_value(cumulative)}")
+                labels = _format_labels(metric.labels, label_values)
+                lines.append(f"{metric.name}_sum{labels} {_format_value(data['sum'])}")
+                lines.append(f"{metric.name}_count{labels} {_format_value(data['count'])}")
+        else:
+            for label_values, value in sorted(metric.snapshot().items()):
+                labels = _format_labels(metric.labels, label_values)
+                lines.append(f"{metric.name}{labels} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,323 @@
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Tuple
+from urllib.parse import parse_qs
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from app.core.config import settings
+from app.core.database import get_database, observe_commands
+from app.models.user import UserRole
+from app.services.auth import AuthService
+
+# Await chains through the embedded storage engines count as database time
+_STORAGE_PATH = os.path.join("app", "services", "storage") + os.sep
+
+CPU = "cpu"
+DATABASE = "database"
+OTHER = "other"
+_WAIT_FRAMES = {DATABASE: "[awaiting database]", OTHER: "[awaiting other I/O]"}
+
+
+def _coroutine_frames(coro) -> List:
+    """Frames of a suspended coroutine and of everything it is awaiting, outermost first"""
+    frames = []
+    while coro is not None:
+        frame = (
+            getattr(coro, "cr_frame", None)
+            or getattr(coro, "ag_frame", None)
+            or getattr(coro, "gi_frame", None)
+        )
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = (
+            getattr(coro, "cr_await", None)
+            or getattr(coro, "ag_await", None)
+            or getattr(coro, "gi_yieldfrom", None)
+        )
+    return frames
+
+
+class SamplingProfiler:
+    """Samples one request's stack from a background thread
+
+    While the request's code runs, the event loop thread's stack is recorded as
+    CPU time. While it is suspended, the chain of coroutines it awaits is
+    recorded instead, ending in a synthetic frame saying whether it waited for
+    the database (a MongoDB command in flight, or an embedded storage engine
+    call) or for anything else. Each sample is weighted by the time since the
+    previous one.
+
+    The sampling thread needs the GIL, which a busy event loop only gives up
+    every switch interval (5 ms by default), so the interval is lowered to the
+    sampling interval while the profiler runs.
+    """
+
+    def __init__(self, root_frame, coro, interval: float):
+        self.interval = interval
+        self._root_frame = root_frame
+        self._coro = coro
+        self._thread_id = threading.get_ident()
+        self._commands_in_flight = 0
+        self._frames: Dict[Tuple[str, str, int], int] = {}
+        self._frame_list: List[dict] = []
+        self.samples: List[List[int]] = []
+        self.weights: List[float] = []
+        self.totals = {CPU: 0.0, DATABASE: 0.0, OTHER: 0.0}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self.started = self.stopped = 0.0
+        self._switch_interval = sys.getswitchinterval()
+
+    # Command observer interface (see app.core.database.observe_commands)
+    def command_started(self, event) -> None:
+        self._commands_in_flight += 1
+
+    def command_finished(self, event, collection: str) -> None:
+        self._commands_in_flight -= 1
+
+    def start(self) -> None:
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.perf_counter()
+        sys.setswitchinterval(self._switch_interval)
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            try:
+                self._sample(now - last)
+            except (AttributeError, ValueError):
+                # The request moved on while its stack was being read
+                pass
+            last = now
+
+    def _sample(self, weight: float) -> None:
+        frame = sys._current_frames().get(self._thread_id)
+        running = []
+        while frame is not None:
+            running.append(frame)
+            if frame is self._root_frame:
+                break
+            frame = frame.f_back
+        if frame is not None:
+            stack, kind = running[::-1], CPU
+        else:
+            stack = _coroutine_frames(self._coro)
+            for index, frame in enumerate(stack):
+                if frame is self._root_frame:
+                    stack = stack[index:]
+                    break
+            waiting_on_storage = self._commands_in_flight > 0 or any(
+                _STORAGE_PATH in frame.f_code.co_filename for frame in stack
+            )
+            kind = DATABASE if waiting_on_storage else OTHER
+        indexes = [self._frame_index(frame.f_code) for frame in stack]
+        if kind != CPU:
+            indexes.append(self._synthetic_index(_WAIT_FRAMES[kind]))
+        self.samples.append(indexes)
+        self.weights.append(weight * 1000)
+        self.totals[kind] += weight * 1000
+
+    def _frame_index(self, code) -> int:
+        key = (code.co_qualname, code.co_filename, code.co_firstlineno)
+        index = self._frames.get(key)
+        if index is None:
+            index = self._frames[key] = len(self._frame_list)
+            self._frame_list.append(
+                {"name": code.co_qualname, "file": code.co_filename, "line": code.co_firstlineno}
+            )
+        return index
+
+    def _synthetic_index(self, name: str) -> int:
+        key = (name, "", 0)
+        index = self._frames.get(key)
+        if index is None:
+            index = self._frames[key] = len(self._frame_list)
+            self._frame_list.append({"name": name})
+        return index
+
+    def summary(self) -> Dict[str, float]:
+        """Milliseconds of wall time, and of sampled CPU, database and other waiting time"""
+        return {
+            "wall_ms": round((self.stopped - self.started) * 1000, 1),
+            "cpu_ms": round(self.totals[CPU], 1),
+            "database_ms": round(self.totals[DATABASE], 1),
+            "other_ms": round(self.totals[OTHER], 1),
+        }
+
+    def speedscope(self, name: str) -> dict:
+        """The profile in speedscope's file format (https://www.speedscope.app)"""
+        summary = self.summary()
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "exporter": "musashi",
+            "name": name,
+            "activeProfileIndex": 0,
+            "shared": {"frames": self._frame_list},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": (
+                        f"{name}: cpu {summary['cpu_ms']} ms, database "
+                        f"{summary['database_ms']} ms, other {summary['other_ms']} ms"
+                    ),
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": summary["wall_ms"],
+                    "samples": self.samples,
+                    "weights": self.weights,
+                }
+            ],
+        }
+
+
+class ProfileRateLimiter:
+    """At most `per_minute` profiles in any 60 seconds, one at a time"""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self.active = False
+        self._started: Deque[float] = deque()
+
+    def acquire(self) -> bool:
+        now = time.monotonic()
+        while self._started and now - self._started[0] >= 60:
+            self._started.popleft()
+        if self.active or len(self._started) >= self.per_minute:
+            return False
+        self._started.append(now)
+        self.active = True
+        return True
+
+    def release(self) -> None:
+        self.active = False
+
+
+def _profile_requested(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value not in (b"", b"0", b"false")
+    query = scope.get("query_string", b"")
+    if b"profile=" not in query:
+        return False
+    return parse_qs(query.decode("latin-1")).get("profile", ["0"])[-1] not in ("", "0", "false")
+
+
+async def _is_admin(scope) -> bool:
+    authorization = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        user = await AuthService(get_database()).get_current_user(
+            HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        )
+    except HTTPException:
+        return False
+    return user.is_active and user.role == UserRole.ADMIN
+
+
+def _with_headers(message: dict, headers: List[Tuple[bytes, bytes]]) -> dict:
+    return {**message, "headers": [*message.get("headers", []), *headers]}
+
+
+class ProfilingMiddleware:
+    """Profiles requests from admins that ask for it with an X-Profile header or ?profile=1
+
+    Installed only when PROFILING_ENABLED is set; other requests pay for one
+    header scan. The speedscope profile is returned in place of the response
+    (its status moves to X-Profiled-Status), or written to PROFILING_OUTPUT_DIR
+    when that is set, in which case the response is passed through and
+    X-Profile names the file. X-Profile-Summary carries the CPU / database /
+    other split either way. Requests that are not from an admin are served
+    unprofiled; over the rate limit they are served with X-Profile: rate-limited.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.limiter = ProfileRateLimiter(settings.PROFILING_MAX_PER_MINUTE)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _profile_requested(scope) or not await _is_admin(scope):
+            await self.app(scope, receive, send)
+            return
+        if not self.limiter.acquire():
+            async def send_rate_limited(message):
+                if message["type"] == "http.response.start":
+                    message = _with_headers(message, [(b"x-profile", b"rate-limited")])
+                await send(message)
+
+            await self.app(scope, receive, send_rate_limited)
+            return
+
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            self.limiter.release()
+
+    async def _profile(self, scope, receive, send):
+        profiler = SamplingProfiler(
+            sys._getframe(),
+            asyncio.current_task().get_coro(),
+            settings.PROFILING_INTERVAL_MS / 1000,
+        )
+        messages = []
+
+        async def send_buffered(message):
+            messages.append(message)
+
+        profiler.start()
+        try:
+            with observe_commands(profiler):
+                await self.app(scope, receive, send_buffered)
+        finally:
+            profiler.stop()
+
+        profile = profiler.speedscope(f"{scope['method']} {scope['path']}")
+        summary = ", ".join(f"{key}={value}" for key, value in profiler.summary().items())
+        headers = [(b"x-profile-summary", summary.encode())]
+
+        if settings.PROFILING_OUTPUT_DIR:
+            slug = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_")
+            filename = (
+                f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{scope['method']}-{slug}.speedscope.json"
+            )
+            os.makedirs(settings.PROFILING_OUTPUT_DIR, exist_ok=True)
+            with open(os.path.join(settings.PROFILING_OUTPUT_DIR, filename), "w") as file:
+                json.dump(profile, file)
+            headers.append((b"x-profile", filename.encode()))
+            for message in messages:
+                if message["type"] == "http.response.start":
+                    message = _with_headers(message, headers)
+                await send(message)
+            return
+
+        body = json.dumps(profile).encode()
+        status = messages[0]["status"] if messages else 500
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"x-profiled-status", str(status).encode()),
+                    *headers,
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
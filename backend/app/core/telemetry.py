@@ -0,0 +1,151 @@
+import asyncio
+import time
+from typing import Dict, Tuple
+from app.core.cache import registered_caches
+from app.core.metrics import (
+    SIZE_BUCKETS,
+    Counter,
+    Gauge,
+    Histogram,
+    HistogramSeries,
+    register_metric,
+    registered_metrics,
+    render_prometheus,
+)
+
+# Requests that matched no route, or used a non-standard method, share one
+# label, so clients cannot grow the number of series
+UNMATCHED_ROUTE = "<unmatched>"
+OTHER_METHOD = "OTHER"
+_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+http_request_seconds = register_metric(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time from receiving a request to sending the last byte of its response",
+        labels=("method", "route", "status"),
+    )
+)
+http_request_bytes = register_metric(
+    Histogram(
+        "http_request_size_bytes",
+        "Request body size",
+        labels=("method", "route", "status"),
+        buckets=SIZE_BUCKETS,
+    )
+)
+http_response_bytes = register_metric(
+    Histogram(
+        "http_response_size_bytes",
+        "Response body size",
+        labels=("method", "route", "status"),
+        buckets=SIZE_BUCKETS,
+    )
+)
+http_requests_in_flight = register_metric(
+    Gauge("http_requests_in_flight", "Requests currently being handled")
+)
+event_loop_lag_seconds = register_metric(
+    Histogram(
+        "event_loop_lag_seconds",
+        "How late the event loop ran a timer, i.e. how long callbacks waited for the loop",
+    )
+)
+
+
+class HTTPMetricsMiddleware:
+    """Pure ASGI middleware recording latency and payload sizes per route template
+
+    Routes are labelled by their template (/api/v1/workflows/{workflow_id}), read
+    from the route the router matched. The three histogram series of a (method,
+    route, status) are looked up once and reused, so a request costs a dict
+    lookup and three bucket increments; no headers are parsed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._series: Dict[Tuple[str, str, int], Tuple[HistogramSeries, ...]] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_bytes = 0
+        response_bytes = 0
+        status = 500
+
+        async def receive_counted():
+            nonlocal request_bytes
+            message = await receive()
+            request_bytes += len(message.get("body", b""))
+            return message
+
+        async def send_counted(message):
+            nonlocal response_bytes, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        started = time.perf_counter()
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive_counted, send_counted)
+        finally:
+            duration = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            method = scope["method"]
+            key = (
+                method if method in _METHODS else OTHER_METHOD,
+                route.path if route is not None else UNMATCHED_ROUTE,
+                status,
+            )
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = self._resolve(*key)
+            series[0].observe(duration)
+            series[1].observe(request_bytes)
+            series[2].observe(response_bytes)
+
+    @staticmethod
+    def _resolve(method: str, route: str, status: int) -> Tuple[HistogramSeries, ...]:
+        labels = (method, route, str(status))
+        return (
+            http_request_seconds.series(*labels),
+            http_request_bytes.series(*labels),
+            http_response_bytes.series(*labels),
+        )
+
+
+async def run_event_loop_lag_monitor(interval: float) -> None:
+    """Background task measuring how far past their deadline timers fire"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        event_loop_lag_seconds.observe(max(0.0, loop.time() - started - interval))
+
+
+def _cache_metrics():
+    """Cache statistics as of now, in the shape of the registered metrics"""
+    hits = Counter("cache_hits_total", "In-process cache hits", labels=("cache",))
+    misses = Counter("cache_misses_total", "In-process cache misses", labels=("cache",))
+    entries = Gauge("cache_entries", "Entries held by in-process caches", labels=("cache",))
+    hit_ratio = Gauge(
+        "cache_hit_ratio", "Hits over lookups since the process started", labels=("cache",)
+    )
+    for name, cache in registered_caches().items():
+        stats = cache.stats()
+        hits.inc(name, amount=stats["hits"])
+        misses.inc(name, amount=stats["misses"])
+        entries.set(stats["size"], name)
+        hit_ratio.set(stats["hit_ratio"], name)
+    return [hits, misses, entries, hit_ratio]
+
+
+def render_metrics() -> str:
+    """Everything /metrics exposes: registered metrics, then cache statistics"""
+    return render_prometheus([*registered_metrics().values(), *_cache_metrics()])
@@ -0,0 +1,120 @@
+import threading
+import time
+from typing import Callable, List
+import bson
+from bson.errors import InvalidDocument
+from app.core.config import settings
+from app.core.database import observe_commands
+from app.core.metrics import Histogram, register_metric
+from app.core.telemetry import UNMATCHED_ROUTE
+
+db_commands_per_request = register_metric(
+    Histogram(
+        "http_request_db_commands",
+        "Database commands sent while handling a request",
+        labels=("route",),
+        buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 64),
+    )
+)
+
+
+def _encoded_size(document) -> int:
+    if not isinstance(document, dict):
+        return 0
+    try:
+        return len(bson.encode(document))
+    except InvalidDocument:
+        return 0
+
+
+class RequestTrace:
+    """Database commands one request sent, with their time and (optionally) payload bytes
+
+    A command observer (see app.core.database.observe_commands). Commands of
+    one request can finish on several driver threads at once, hence the lock.
+    Payload sizes are measured by re-encoding commands and replies, which costs
+    about as much as the driver's own encoding, so only with DB_TRACING_BYTES.
+    """
+
+    def __init__(self):
+        self.commands = 0
+        self.seconds = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.calls: List[str] = []
+        self._lock = threading.Lock()
+
+    def command_started(self, event) -> None:
+        if settings.DB_TRACING_BYTES:
+            sent = _encoded_size(event.command)
+            with self._lock:
+                self.bytes_sent += sent
+
+    def command_finished(self, event, collection: str) -> None:
+        received = _encoded_size(getattr(event, "reply", None)) if settings.DB_TRACING_BYTES else 0
+        with self._lock:
+            self.commands += 1
+            self.seconds += event.duration_micros / 1_000_000
+            self.bytes_received += received
+            self.calls.append(f"{event.command_name} {collection}".rstrip())
+
+    def server_timing(self, total_seconds: float) -> str:
+        description = f"{self.commands} commands"
+        if settings.DB_TRACING_BYTES:
+            description += f", {self.bytes_sent} B sent, {self.bytes_received} B received"
+        return (
+            f'db;dur={self.seconds * 1000:.1f};desc="{description}", '
+            f"total;dur={total_seconds * 1000:.1f}"
+        )
+
+
+# Called with ("METHOD /route/template", trace) after each traced request
+_listeners: List[Callable[[str, RequestTrace], None]] = []
+
+
+def add_trace_listener(listener: Callable[[str, RequestTrace], None]) -> None:
+    _listeners.append(listener)
+
+
+def remove_trace_listener(listener: Callable[[str, RequestTrace], None]) -> None:
+    _listeners.remove(listener)
+
+
+class DatabaseTracingMiddleware:
+    """Pure ASGI middleware counting each request's database commands
+
+    The totals so far go out in a Server-Timing header with the response
+    (browsers show it in the network panel), and the command count per route
+    template feeds the http_request_db_commands histogram, so N+1 patterns show
+    up both while debugging and in production metrics.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                timing = trace.server_timing(time.perf_counter() - started)
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (b"server-timing", timing.encode())],
+                }
+            await send(message)
+
+        with observe_commands(trace):
+            await self.app(scope, receive, send_with_timing)
+
+        route = scope.get("route")
+        template = route.path if route is not None else UNMATCHED_ROUTE
+        db_commands_per_request.observe(trace.commands, template)
+        endpoint = f"{scope['method']} {template}"
+        for listener in _listeners:
+            listener(endpoint, trace)
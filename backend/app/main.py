@@ -1,42 +1,102 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 from app.core.config import settings
 from app.api.v1.api import api_router
 from app.core.database import get_database
+from app.core.logging import RequestIdMiddleware, configure_logging, shutdown_logging
+from app.core.profiling import ProfilingMiddleware
+from app.core.telemetry import HTTPMetricsMiddleware, render_metrics, run_event_loop_lag_monitor
+from app.core.tracing import DatabaseTracingMiddleware
+from app.services.autosave import save_buffer
+from app.services.compiler import WorkflowCompiler
+from app.services.invalidation import run_cache_invalidation
 from app.services.user import UserService
+from app.services.revocation import (
+    ensure_revocation_indexes,
+    revocation_list,
+    run_revocation_sync,
+)
+import asyncio
+import logging
 import os
+import secrets
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Connect to database and initialize admin user
+    configure_logging()
+    revocation_sync = None
+    cache_invalidation = None
+    loop_lag_monitor = None
+    if settings.METRICS_ENABLED:
+        loop_lag_monitor = asyncio.create_task(
+            run_event_loop_lag_monitor(settings.EVENT_LOOP_LAG_INTERVAL_SECONDS)
+        )
     try:
         from app.core.database import connect_to_database, close_database_connection
 
         # Connect to database
         await connect_to_database()
-        print("✅ Database connection established")
+        logger.info("Database connection established")
 
         # Initialize admin user
         db = get_database()  # Now synchronous
         user_service = UserService(db)
+        try:
+            await user_service.ensure_indexes()
+        except Exception as e:
+            # Typically existing duplicate users; UserService checks with reads meanwhile
+            logger.error(
+                "Could not create user indexes, checking uniqueness with reads instead: %s", e
+            )
         await user_service.init_admin_user()
-        print("✅ Admin user initialization completed")
+        logger.info("Admin user initialization completed")
+
+        # Load revoked tokens, then keep following revocations from other processes
+        await ensure_revocation_indexes(db)
+        await revocation_list.sync(db)
+        revocation_sync = asyncio.create_task(run_revocation_sync(db))
+        logger.info("Token revocation list loaded")
+
+        # Compiled workflow artifacts are looked up per (workflow, version)
+        await WorkflowCompiler(db).ensure_indexes()
+
+        if settings.WORKFLOW_SAVE_COALESCE_MS > 0 and not save_buffer.enabled:
+            logger.warning(
+                "WORKFLOW_SAVE_COALESCE_MS is ignored with WEB_CONCURRENCY=%d: "
+                "the save buffer only works within one process",
+                settings.WEB_CONCURRENCY,
+            )
+
+        # Drop cached users and workflows when any process changes them
+        cache_invalidation = asyncio.create_task(run_cache_invalidation(db))
     except Exception as e:
-        print(f"❌ Error during startup: {e}")
+        logger.exception("Error during startup: %s", e)
 
     yield
 
     # Shutdown: Close database connection
+    for task in (revocation_sync, cache_invalidation, loop_lag_monitor):
+        if task is not None:
+            task.cancel()
+    try:
+        # Buffered autosaves must reach the database before it closes
+        await save_buffer.flush_all()
+    except Exception as e:
+        logger.exception("Error flushing buffered workflow saves: %s", e)
     try:
         await close_database_connection()
-        print("🔄 Database connection closed")
+        logger.info("Database connection closed")
     except Exception as e:
-        print(f"❌ Error during shutdown: {e}")
-    print("🔄 Application shutting down")
+        logger.exception("Error during shutdown: %s", e)
+    logger.info("Application shutting down")
+    shutdown_logging()
 
 
 app = FastAPI(
@@ -55,6 +115,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.DB_TRACING_ENABLED:
+    app.add_middleware(DatabaseTracingMiddleware)
+
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Added after the others so it times everything, CORS included
+if settings.METRICS_ENABLED:
+    app.add_middleware(HTTPMetricsMiddleware)
+
+# Outside everything else, so every record logged for a request carries its id
+app.add_middleware(RequestIdMiddleware)
+
 # API routes
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -108,6 +181,22 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if not settings.METRICS_ENABLED:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    if settings.METRICS_TOKEN and not secrets.compare_digest(
+        request.headers.get("authorization", "").encode(),
+        f"Bearer {settings.METRICS_TOKEN}".encode(),
+    ):
+        return JSONResponse(
+            status_code=401,
+            content={"detail": "Not authenticated"},
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/api/v1/health")
 async def api_health_check():
     return {"status": "healthy", "api": "v1"}
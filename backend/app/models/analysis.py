@@ -0,0 +1,54 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class ModelProfile(BaseModel):
+    latency_ms: float  # Fixed per-call overhead (time to first token)
+    output_tokens_per_second: float
+    input_cost_per_million: float
+    output_cost_per_million: float
+
+
+class NodeEstimate(BaseModel):
+    node_id: str
+    label: str
+    model: Optional[str] = None
+    unknown_model: bool = False
+    input_tokens: int = 0
+    output_tokens: int = 0
+    latency_ms: float = 0.0
+    cost: float = 0.0
+    on_critical_path: bool = False
+    dominant: bool = False  # Carries a large share of critical-path latency or run cost
+
+
+class WorkflowEstimate(BaseModel):
+    workflow_id: str
+    version: int
+    critical_path: List[str] = []
+    critical_path_latency_ms: float = 0.0
+    total_input_tokens: int = 0
+    total_output_tokens: int = 0
+    total_tokens: int = 0
+    cost_per_run: float = 0.0
+    nodes: List[NodeEstimate] = []
+    unscheduled_nodes: List[str] = []  # Nodes on cycles, excluded from the critical path
+
+
+class NodeTokenCount(BaseModel):
+    node_id: str
+    label: str
+    model: Optional[str] = None
+    encoding: str
+    developer_message_tokens: int = 0
+    prompt_tokens: int = 0  # Sum over prompt contexts
+    total_tokens: int = 0
+    max_tokens: Optional[int] = None
+    exceeds_max_tokens: bool = False
+
+
+class WorkflowTokenReport(BaseModel):
+    workflow_id: str
+    version: int
+    total_tokens: int = 0
+    nodes: List[NodeTokenCount] = []
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field, EmailStr, field_validator, ConfigDict
 from datetime import datetime
 from bson import ObjectId
@@ -50,6 +50,18 @@ class UserCreate(UserBase):
     password: str
 
 
+class BulkUserError(BaseModel):
+    row: int  # Line number in the uploaded file
+    username: Optional[str] = None
+    detail: str
+
+
+class BulkUserResult(BaseModel):
+    created: int = 0
+    failed: int = 0
+    errors: List[BulkUserError] = []
+
+
 class UserUpdate(BaseModel):
     email: Optional[EmailStr] = None
     username: Optional[str] = Field(None, min_length=1, max_length=50)
@@ -150,9 +162,25 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     user: User
+    refresh_token: Optional[str] = None  # Only issued in stateless auth mode
 
 
 class TokenPayload(BaseModel):
     sub: Optional[str] = None
     role: Optional[str] = None
+    typ: Optional[str] = None  # "access" or "refresh"; absent on legacy tokens
+    jti: Optional[str] = None  # Token id, used for revocation
+    iat: Optional[int] = None
+    exp: Optional[int] = None
+    # Full user claims, present on stateless access tokens
+    uid: Optional[str] = None
+    active: Optional[bool] = None
+    email: Optional[str] = None
+    full_name: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
@@ -1,8 +1,10 @@
+import json
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field, GetCoreSchemaHandler, ConfigDict
+from pydantic import BaseModel, Field, GetCoreSchemaHandler, ConfigDict, field_validator
 from pydantic_core import CoreSchema, core_schema
 from datetime import datetime
 from bson import ObjectId
+from enum import Enum
 
 
 class PyObjectId(ObjectId):
@@ -53,6 +55,12 @@ class Edge(BaseModel):
     data: Optional[Dict[str, Any]] = {}
 
 
+class TraversalDirection(str, Enum):
+    UP = "up"
+    DOWN = "down"
+    BOTH = "both"
+
+
 class UpdateLog(BaseModel):
     username: str
     timestamp: datetime
@@ -103,3 +111,58 @@ class WorkflowInDB(WorkflowBase):
 class Workflow(WorkflowInDB):
     pass
 
+
+
+class WorkflowSubgraph(BaseModel):
+    workflow_id: str
+    version: int
+    node: str
+    direction: TraversalDirection
+    depth: Optional[int] = None
+    nodes: List[Node] = []
+    edges: List[Edge] = []
+
+
+class PlanNode(BaseModel):
+    stage: Optional[int] = None  # None when the node is on or downstream of a cycle
+    fan_in: int = 0
+    fan_out: int = 0
+
+
+class ExecutionPlan(BaseModel):
+    stages: List[List[str]] = []  # Nodes within a stage can run concurrently
+    critical_path: List[str] = []
+    nodes: Dict[str, PlanNode] = {}
+    cyclic_nodes: List[str] = []  # Nodes on a dependency cycle
+    unscheduled_nodes: List[str] = []  # Cycle members and everything downstream of them
+
+
+class ConnectedInput(BaseModel):
+    nodeId: str
+    nodeName: str
+    outputKey: str
+    outputType: str = "string"
+    outputExample: Optional[str] = None
+
+    @field_validator("outputExample", mode="before")
+    @classmethod
+    def validate_output_example(cls, v):
+        # Examples of structured outputs may be stored as objects; keep the
+        # compiled artifact's serialization stable by holding them as JSON text
+        if v is None or isinstance(v, str):
+            return v
+        return json.dumps(v, sort_keys=True, default=str)
+
+
+class CompiledWorkflow(BaseModel):
+    """Data derived from a workflow version's nodes and edges"""
+
+    workflow_id: str
+    version: int
+    compiler_version: int
+    compiled_at: datetime = Field(default_factory=datetime.utcnow)
+    adjacency: Dict[str, List[str]] = {}  # Node id -> successor node ids
+    topological_order: List[str] = []
+    execution_plan: ExecutionPlan = ExecutionPlan()
+    connected_inputs: Dict[str, List[ConnectedInput]] = {}  # Resolved from edges
+    placeholders: Dict[str, List[str]] = {}  # Agent node id -> $$TOKEN$$ names
@@ -0,0 +1,55 @@
+from typing import Any, Dict, List
+from app.services.prompts import agent_prompt_texts, extract_placeholders
+
+
+def node_input_keys(properties: Dict[str, Any]) -> List[str]:
+    """Input keys an agent prompt may reference, as validated in the editor"""
+    keys: Dict[str, None] = {}
+    for connected in properties.get("connected_inputs") or []:
+        if connected.get("outputKey"):
+            keys[connected["outputKey"]] = None
+    # Legacy nodes declared their inputs directly
+    for legacy in properties.get("inputs") or []:
+        if legacy.get("key"):
+            keys[legacy["key"]] = None
+    return list(keys)
+
+
+def audit_workflow(workflow: Dict[str, Any]) -> Dict[str, Any]:
+    """Report unresolved $$TOKEN$$ placeholders and unused inputs of every agent node
+
+    Works on raw workflow documents so it can run in worker processes without
+    validating whole models.
+    """
+    findings = []
+    for node in workflow.get("nodes") or []:
+        if node.get("type") != "agent":
+            continue
+        properties = node.get("properties") or {}
+        texts = agent_prompt_texts(properties.get("parameters") or {})
+        inputs = node_input_keys(properties)
+        # Like validateSystemPrompt, nodes without a developer message or inputs pass
+        if not texts[0] or not inputs:
+            continue
+        tokens = extract_placeholders(texts)
+        unresolved = [token for token in tokens if token not in inputs]
+        unused = [key for key in inputs if key not in tokens]
+        if unresolved or unused:
+            findings.append(
+                {
+                    "node_id": node.get("id"),
+                    "label": node.get("label"),
+                    "unresolved_tokens": unresolved,
+                    "unused_inputs": unused,
+                }
+            )
+    return {
+        "workflow_id": str(workflow.get("_id", workflow.get("id"))),
+        "name": workflow.get("name"),
+        "nodes": findings,
+    }
+
+
+def audit_workflows(workflows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Audit a batch of workflow documents; the unit of work sent to each worker process"""
+    return [audit_workflow(workflow) for workflow in workflows]
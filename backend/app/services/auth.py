@@ -1,15 +1,103 @@
-from typing import Optional
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from app.core.cache import TTLCache, register_cache
 from app.core.config import settings
-from app.models.user import Token, User, TokenPayload
+from app.models.user import Token, User, TokenPayload, UserRole
+from app.services.revocation import revocation_list
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+PASSWORD_HASH_SCHEMES = ("bcrypt", "argon2")
+
+
+def argon2_available() -> bool:
+    try:
+        import argon2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def build_password_context(
+    scheme: str = settings.PASSWORD_HASH_SCHEME,
+    bcrypt_rounds: int = settings.BCRYPT_ROUNDS,
+    argon2_time_cost: int = settings.ARGON2_TIME_COST,
+    argon2_memory_cost: int = settings.ARGON2_MEMORY_COST,
+    argon2_parallelism: int = settings.ARGON2_PARALLELISM,
+) -> CryptContext:
+    """Context hashing with `scheme` at the given cost
+
+    Hashes made with the other scheme, or with different cost parameters, still
+    verify but are reported by verify_and_update so they can be rehashed.
+    """
+    if scheme not in PASSWORD_HASH_SCHEMES:
+        raise ValueError(f"Unknown password hash scheme: {scheme}")
+    if scheme == "argon2" and not argon2_available():
+        raise RuntimeError("PASSWORD_HASH_SCHEME=argon2 requires the argon2-cffi package")
+
+    # argon2 hashes can only be verified when the optional argon2-cffi is installed
+    schemes = [scheme] + [
+        other
+        for other in PASSWORD_HASH_SCHEMES
+        if other != scheme and (other != "argon2" or argon2_available())
+    ]
+    options = {
+        # Equal min and max make any other cost count as outdated
+        "bcrypt__rounds": bcrypt_rounds,
+        "bcrypt__min_rounds": bcrypt_rounds,
+        "bcrypt__max_rounds": bcrypt_rounds,
+    }
+    if "argon2" in schemes:
+        options.update(
+            {
+                "argon2__type": "ID",
+                "argon2__rounds": argon2_time_cost,
+                "argon2__min_rounds": argon2_time_cost,
+                "argon2__max_rounds": argon2_time_cost,
+                "argon2__memory_cost": argon2_memory_cost,
+                "argon2__parallelism": argon2_parallelism,
+            }
+        )
+    return CryptContext(schemes=schemes, deprecated="auto", **options)
+
+
+pwd_context = build_password_context()
 security = HTTPBearer()
 
+# bcrypt releases the GIL while hashing, so a bounded thread pool keeps the
+# ~200ms per hash off the event loop without a process pool's pickling cost.
+password_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+
+# Resolved users keyed by username, so steady-state authentication skips Mongo.
+# Entries are dropped by UserService writes, by changes other processes make
+# (see app.services.invalidation), and otherwise expire after the TTL.
+user_cache = register_cache(
+    "users",
+    TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS),
+    invalidate={
+        "users": lambda user_id: (
+            user_cache.clear() if user_id is None else invalidate_cached_user(user_id=str(user_id))
+        )
+    },
+)
+
+
+def invalidate_cached_user(user_id: Optional[str] = None, username: Optional[str] = None):
+    """Drop a user from the authentication cache by id and/or username"""
+    if username is not None:
+        user_cache.pop(username)
+    if user_id is not None:
+        for cached_username, user in user_cache.items():
+            if user.id == user_id:
+                user_cache.pop(cached_username)
+
 
 class AuthService:
     def __init__(self, db):
@@ -22,43 +110,122 @@ class AuthService:
     def get_password_hash(self, password: str) -> str:
         return pwd_context.hash(password)
 
+    async def verify_password_async(self, plain_password: str, hashed_password: str) -> bool:
+        """verify_password on the password hashing pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            password_hash_executor, pwd_context.verify, plain_password, hashed_password
+        )
+
+    async def verify_and_update_password_async(
+        self, plain_password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        """Verify on the password hashing pool, returning a new hash if the old one is outdated"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            password_hash_executor, pwd_context.verify_and_update, plain_password, hashed_password
+        )
+
+    async def get_password_hash_async(self, password: str) -> str:
+        """get_password_hash on the password hashing pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_hash_executor, pwd_context.hash, password)
+
     def create_access_token(self, data: dict, expires_delta: Optional[timedelta] = None) -> str:
         to_encode = data.copy()
         if expires_delta:
             expire = datetime.utcnow() + expires_delta
         else:
             expire = datetime.utcnow() + timedelta(minutes=15)
-        to_encode.update({"exp": expire})
+        # jti and iat let individual tokens, or all of a user's tokens, be revoked
+        to_encode.update({"exp": expire, "iat": datetime.utcnow()})
+        to_encode.setdefault("jti", uuid.uuid4().hex)
         encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
         return encoded_jwt
 
+    def create_user_tokens(self, user: User) -> Token:
+        """Issue tokens for a user; stateless mode embeds user claims and adds a refresh token"""
+        role = UserRole(user.role).value
+        if not settings.AUTH_STATELESS:
+            access_token = self.create_access_token(
+                data={"sub": user.username, "role": role},
+                expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+            )
+            return Token(access_token=access_token, token_type="bearer", user=user)
+
+        access_token = self.create_access_token(
+            data={
+                "sub": user.username,
+                "role": role,
+                "typ": "access",
+                "uid": user.id,
+                "active": user.is_active,
+                "email": user.email,
+                "full_name": user.full_name,
+                "created_at": user.created_at.isoformat(),
+                "updated_at": user.updated_at.isoformat(),
+            },
+            expires_delta=timedelta(minutes=settings.STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES),
+        )
+        refresh_token = self.create_access_token(
+            data={"sub": user.username, "typ": "refresh"},
+            expires_delta=timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES),
+        )
+        return Token(
+            access_token=access_token,
+            token_type="bearer",
+            user=user,
+            refresh_token=refresh_token,
+        )
+
     async def authenticate_user(self, username: str, password: str) -> Optional[Token]:
         user = await self.users_collection.find_one({"username": username})
-        if not user or not self.verify_password(password, user["hashed_password"]):
+        if not user:
             return None
-
-        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = self.create_access_token(
-            data={"sub": user["username"], "role": user["role"]}, expires_delta=access_token_expires
+        verified, new_hash = await self.verify_and_update_password_async(
+            password, user["hashed_password"]
         )
+        if not verified:
+            return None
+        if new_hash is not None:
+            # Hashed with another scheme or cost; upgrade while the password is at hand
+            await self.users_collection.update_one(
+                {"_id": user["_id"]}, {"$set": {"hashed_password": new_hash}}
+            )
+
         # Convert ObjectId to string for serialization
         user_data = dict(user)
         user_data["id"] = str(user_data["_id"])
         user_data.pop("_id", None)
         user_data.pop("hashed_password", None)
 
-        return Token(access_token=access_token, token_type="bearer", user=User(**user_data))
+        return self.create_user_tokens(User(**user_data))
+
+    async def refresh_user_tokens(self, refresh_token: str) -> Optional[Token]:
+        """Exchange a refresh token for new tokens, rechecking the user in the database"""
+        token_data = self.decode_token(refresh_token, token_type="refresh")
+        if token_data is None or revocation_list.is_revoked(token_data):
+            return None
+
+        user = await self.users_collection.find_one({"username": token_data.sub})
+        if user is None or not user.get("is_active", True):
+            return None
 
-    def decode_token(self, token: str) -> Optional[TokenPayload]:
+        user["id"] = str(user["_id"])
+        user.pop("_id", None)
+        user.pop("hashed_password", None)
+        return self.create_user_tokens(User(**user))
+
+    def decode_token(self, token: str, token_type: str = "access") -> Optional[TokenPayload]:
         try:
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-            username: str = payload.get("sub")
-            role: str = payload.get("role")
-            if username is None:
+            if payload.get("sub") is None:
+                return None
+            # Tokens issued before typed tokens carry no "typ" and are access tokens
+            if payload.get("typ", "access") != token_type:
                 return None
-            token_data = TokenPayload(sub=username, role=role)
-            return token_data
-        except JWTError:
+            return TokenPayload.model_validate(payload)
+        except (JWTError, ValueError):
             return None
 
     async def get_current_user(
@@ -71,9 +238,26 @@ class AuthService:
         )
 
         token_data = self.decode_token(credentials.credentials)
-        if token_data is None:
+        if token_data is None or revocation_list.is_revoked(token_data):
             raise credentials_exception
 
+        if settings.AUTH_STATELESS and token_data.uid is not None:
+            # Signed claims are trusted until the short-lived token expires
+            return User(
+                id=token_data.uid,
+                username=token_data.sub,
+                email=token_data.email,
+                full_name=token_data.full_name,
+                is_active=token_data.active,
+                role=token_data.role,
+                created_at=token_data.created_at,
+                updated_at=token_data.updated_at,
+            )
+
+        cached_user = user_cache.get(token_data.sub)
+        if cached_user is not None:
+            return cached_user
+
         user = await self.users_collection.find_one({"username": token_data.sub})
         if user is None:
             raise credentials_exception
@@ -81,7 +265,9 @@ class AuthService:
         user["id"] = str(user["_id"])
         user.pop("_id", None)
         user.pop("hashed_password", None)
-        return User(**user)
+        resolved_user = User(**user)
+        user_cache.set(token_data.sub, resolved_user)
+        return resolved_user
 
     async def get_current_active_user(self, current_user: User = Depends(get_current_user)) -> User:
         if not current_user.is_active:
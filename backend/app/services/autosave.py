@@ -0,0 +1,221 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+from bson import ObjectId
+from app.core.cache import registered_invalidators
+from app.core.config import settings
+from app.core.metrics import Counter, register_metric
+from app.models.workflow import Workflow
+
+logger = logging.getLogger(__name__)
+
+# Matches the cap update_workflow applies to update_logs
+MAX_UPDATE_LOGS = 50
+
+# Writes of a buffer that raise are retried after another window this many times in all
+MAX_FLUSH_ATTEMPTS = 3
+
+workflow_saves = register_metric(
+    Counter(
+        "workflow_saves_total",
+        "Workflow saves by how they reached the database",
+        labels=("outcome",),
+    )
+)
+
+
+@dataclass
+class PendingSave:
+    collection: Any
+    base: Workflow
+    author: str
+    fields: Dict[str, Any] = field(default_factory=dict)
+    saves: int = 0
+    log_entry: Optional[dict] = None
+    view: Optional[Workflow] = None
+    timer: Optional[asyncio.Task] = None
+    attempts: int = 0
+
+
+@dataclass
+class FailedSave:
+    """Buffered saves that never reached the database, reported on the author's next save"""
+
+    author: str
+    saves: int
+    reason: str
+
+
+class WorkflowSaveBuffer:
+    """Write-behind buffer merging one author's rapid saves of a workflow into one write
+
+    The first buffered save starts a window of WORKFLOW_SAVE_COALESCE_MS; saves
+    by the same author within it are merged and the result is written once
+    when the window closes, or earlier when something else needs the stored
+    document. Each save still gets the version it would have had if written
+    through, and reads in this process see the merged document.
+
+    Other processes read what is stored, so they can lag by up to one window,
+    and the buffer stays off when WEB_CONCURRENCY says there are several
+    workers. If the workflow changed underneath, the merged write fails its
+    version check and is dropped; a write that raises is buffered again and
+    retried, up to MAX_FLUSH_ATTEMPTS. Dropped saves are reported to their
+    author with a 409 on the next save (see take_failure). Versions handed
+    out for buffered saves are not final until written, so derived data for
+    them is never cached (see is_unsaved).
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, PendingSave] = {}
+        self._flushing: Dict[str, asyncio.Task] = {}
+        self._writing: Dict[str, PendingSave] = {}
+        self._failed: Dict[str, FailedSave] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.WORKFLOW_SAVE_COALESCE_MS > 0 and settings.WEB_CONCURRENCY <= 1
+
+    def pending_view(self, workflow_id: str) -> Optional[Workflow]:
+        pending = self._pending.get(workflow_id)
+        return pending.view if pending is not None else None
+
+    def add(
+        self, collection, workflow_id: str, current: Workflow, update_data: dict, author: str
+    ) -> Workflow:
+        """Buffer a validated save; returns the workflow as if it had been written"""
+        pending = self._pending.get(workflow_id)
+        if pending is None:
+            pending = self._pending[workflow_id] = PendingSave(collection, current, author)
+            pending.timer = asyncio.create_task(self._flush_later(workflow_id, pending))
+            workflow_saves.inc("written")
+        else:
+            workflow_saves.inc("coalesced")
+            logger.debug("Coalesced a save of workflow %s by %s", workflow_id, author)
+
+        pending.fields.update(update_data)
+        pending.saves += 1
+        version = pending.base.version + pending.saves
+        pending.log_entry = {
+            "username": author,
+            "timestamp": update_data["updated_at"],
+            "version": version,
+        }
+        logs = [log.model_dump() for log in pending.base.update_logs] + [pending.log_entry]
+        pending.view = Workflow(
+            **{
+                **pending.base.model_dump(),
+                **pending.fields,
+                "version": version,
+                "update_logs": logs[-MAX_UPDATE_LOGS:],
+            }
+        )
+        return pending.view
+
+    def is_unsaved(self, workflow: Workflow) -> bool:
+        """Whether workflow is a buffered version that has not been written yet"""
+        workflow_id = str(workflow.id)
+        pending = self._pending.get(workflow_id) or self._writing.get(workflow_id)
+        return pending is not None and workflow.version > pending.base.version
+
+    def take_failure(self, workflow_id: str, author: str) -> Optional[FailedSave]:
+        """Saves by author that were dropped since their last save, reported once"""
+        failed = self._failed.get(workflow_id)
+        if failed is None or failed.author != author:
+            return None
+        return self._failed.pop(workflow_id)
+
+    def accepts(self, workflow_id: str, author: str) -> bool:
+        """Whether a save by author can join the workflow's buffer without a flush first"""
+        pending = self._pending.get(workflow_id)
+        return pending is None or pending.author == author
+
+    def discard(self, workflow_id: str) -> None:
+        pending = self._pending.pop(workflow_id, None)
+        if pending is not None:
+            pending.timer.cancel()
+
+    async def wait_for_flush(self, workflow_id: str) -> None:
+        """Wait for a write of this workflow's buffer already under way"""
+        task = self._flushing.get(workflow_id)
+        if task is not None:
+            try:
+                await asyncio.shield(task)
+            except Exception:
+                # Raised to whoever flushed; the saves are buffered again or recorded
+                pass
+
+    async def flush(self, workflow_id: str) -> None:
+        """Write the workflow's buffered saves now, if it has any"""
+        pending = self._pending.pop(workflow_id, None)
+        if pending is None:
+            await self.wait_for_flush(workflow_id)
+            return
+        if pending.timer is not asyncio.current_task():
+            pending.timer.cancel()
+        task = asyncio.ensure_future(self._write(workflow_id, pending))
+        self._flushing[workflow_id] = task
+        self._writing[workflow_id] = pending
+        try:
+            await asyncio.shield(task)
+        finally:
+            if self._flushing.get(workflow_id) is task:
+                del self._flushing[workflow_id]
+                del self._writing[workflow_id]
+
+    async def flush_all(self) -> None:
+        await asyncio.gather(
+            *(self.flush(workflow_id) for workflow_id in list(self._pending)),
+            *(asyncio.shield(task) for task in list(self._flushing.values())),
+        )
+
+    async def _flush_later(self, workflow_id: str, pending: PendingSave) -> None:
+        await asyncio.sleep(settings.WORKFLOW_SAVE_COALESCE_MS / 1000)
+        if self._pending.get(workflow_id) is pending:
+            try:
+                await self.flush(workflow_id)
+            except Exception:
+                # No request is waiting on this flush; _write has kept or recorded the saves
+                logger.exception("Writing buffered saves of workflow %s failed", workflow_id)
+
+    async def _write(self, workflow_id: str, pending: PendingSave) -> None:
+        pending.attempts += 1
+        try:
+            # Runs outside the request that started the window, so without its session
+            result = await pending.collection.update_one(
+                {"_id": ObjectId(workflow_id), "version": pending.base.version},
+                {
+                    "$set": pending.fields,
+                    "$inc": {"version": pending.saves},
+                    "$push": {
+                        "update_logs": {"$each": [pending.log_entry], "$slice": -MAX_UPDATE_LOGS}
+                    },
+                },
+            )
+        except Exception as e:
+            if pending.attempts < MAX_FLUSH_ATTEMPTS and workflow_id not in self._pending:
+                # Nothing was written; keep serving the saves and retry after another window
+                self._pending[workflow_id] = pending
+                pending.timer = asyncio.create_task(self._flush_later(workflow_id, pending))
+            else:
+                self._drop(workflow_id, pending, f"they could not be written ({e})")
+            raise
+        if result.modified_count == 0:
+            self._drop(
+                workflow_id,
+                pending,
+                f"the workflow was changed elsewhere since version {pending.base.version}",
+            )
+
+    def _drop(self, workflow_id: str, pending: PendingSave, reason: str) -> None:
+        workflow_saves.inc("dropped", amount=pending.saves)
+        self._failed[workflow_id] = FailedSave(pending.author, pending.saves, reason)
+        logger.warning(
+            "Dropped %d buffered saves of workflow %s: %s", pending.saves, workflow_id, reason
+        )
+        # Derived data may have been built for versions that now will never exist
+        for _, callback in registered_invalidators().get("workflows", []):
+            callback(workflow_id)
+
+
+save_buffer = WorkflowSaveBuffer()
@@ -0,0 +1,105 @@
+import asyncio
+import csv
+import io
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+from pydantic import ValidationError
+from app.core.config import settings
+from app.models.user import BulkUserError, UserCreate
+
+_bulk_hash_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_bulk_hash_executor() -> ProcessPoolExecutor:
+    """Process pool for bulk hashing, kept apart from the pool serving logins"""
+    global _bulk_hash_executor
+    if _bulk_hash_executor is None:
+        # spawn rather than fork: forking a process that runs an event loop and
+        # threads can deadlock the child
+        _bulk_hash_executor = ProcessPoolExecutor(
+            max_workers=settings.BULK_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _bulk_hash_executor
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    # Runs in a worker process, so it must stay importable at module level
+    from app.services.auth import pwd_context
+
+    return [pwd_context.hash(password) for password in passwords]
+
+
+async def hash_passwords_parallel(passwords: List[str]) -> List[str]:
+    """Hash passwords across the bulk process pool in a few chunks per worker"""
+    if not passwords:
+        return []
+    chunk_count = min(len(passwords), settings.BULK_HASH_WORKERS * 4)
+    size = -(-len(passwords) // chunk_count)
+    chunks = [passwords[i : i + size] for i in range(0, len(passwords), size)]
+    loop = asyncio.get_running_loop()
+    executor = get_bulk_hash_executor()
+    results = await asyncio.gather(
+        *(loop.run_in_executor(executor, hash_passwords, chunk) for chunk in chunks)
+    )
+    return [hashed for chunk in results for hashed in chunk]
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+
+
+def _row_username(fields: Optional[dict]) -> Optional[str]:
+    # Echoed back in the error report, whatever JSON type the row gave it
+    username = (fields or {}).get("username")
+    return None if username is None else str(username)
+
+
+def parse_user_rows(
+    text: str, fmt: str, max_rows: Optional[int] = None
+) -> Tuple[List[Tuple[int, UserCreate]], List[BulkUserError]]:
+    """Parse CSV (with a header row) or NDJSON into users keyed by line number
+
+    With `max_rows`, parsing stops once one row more than that has been read,
+    so an oversized upload is detected without validating all of it.
+    """
+    records: List[Tuple[int, Optional[dict], Optional[str]]] = []
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(text))
+        for record in reader:
+            # Blank cells mean "use the default", not an empty value
+            fields = {key: value for key, value in record.items() if key and value}
+            records.append((reader.line_num, fields, None))
+            if max_rows is not None and len(records) > max_rows:
+                break
+    else:
+        for line_number, line in enumerate(io.StringIO(text, newline=None), start=1):
+            if max_rows is not None and len(records) > max_rows:
+                break
+            if not line.strip():
+                continue
+            try:
+                fields = json.loads(line)
+            except json.JSONDecodeError as e:
+                records.append((line_number, None, f"Invalid JSON: {e.msg}"))
+                continue
+            if not isinstance(fields, dict):
+                records.append((line_number, None, "Each line must be a JSON object"))
+                continue
+            records.append((line_number, fields, None))
+
+    users: List[Tuple[int, UserCreate]] = []
+    errors: List[BulkUserError] = []
+    for row, fields, problem in records:
+        if problem is None:
+            try:
+                users.append((row, UserCreate(**fields)))
+                continue
+            except ValidationError as e:
+                problem = _validation_message(e)
+        errors.append(BulkUserError(row=row, username=_row_username(fields), detail=problem))
+    return users, errors
@@ -0,0 +1,138 @@
+from typing import Dict, List
+from pymongo.errors import DuplicateKeyError
+from app.core.cache import LRUCache, drop_workflow_entries, register_cache
+from app.models.workflow import CompiledWorkflow, ConnectedInput, Workflow
+from app.services.autosave import save_buffer
+from app.services.graph import get_graph_index
+from app.services.prompts import agent_prompt_texts, extract_placeholders
+
+# Bump when the compiled artifact's shape or derivation changes so stored
+# artifacts from older code are recompiled instead of served.
+COMPILER_VERSION = 1
+
+# Node types whose connected_inputs are derived from incoming edges in the editor
+CONNECTED_INPUT_NODE_TYPES = {"agent", "mcp", "function"}
+
+# Artifacts are immutable for a given (workflow_id, version); a changed or
+# deleted workflow only makes its older entries unreachable, so drop them
+_compiled_cache = register_cache(
+    "compiled_workflows",
+    LRUCache(maxsize=512),
+    invalidate={
+        "workflows": lambda workflow_id: drop_workflow_entries(_compiled_cache, workflow_id)
+    },
+)
+
+
+def resolve_connected_inputs(workflow: Workflow) -> Dict[str, List[ConnectedInput]]:
+    """Rebuild connected_inputs from edges, mirroring the editor's reconstruction"""
+    index = get_graph_index(workflow)
+    resolved: Dict[str, List[ConnectedInput]] = {}
+    for edge in workflow.edges:
+        target = index.nodes.get(edge.target)
+        source = index.nodes.get(edge.source)
+        if not target or not source or target.type not in CONNECTED_INPUT_NODE_TYPES:
+            continue
+        output_key = (edge.sourceHandle or "").replace("output-", "") or "output"
+        for output in source.properties.get("outputs") or []:
+            if output.get("key") == output_key:
+                resolved.setdefault(target.id, []).append(
+                    ConnectedInput(
+                        nodeId=source.id,
+                        nodeName=source.properties.get("name") or source.label,
+                        outputKey=output_key,
+                        outputType=output.get("type") or "string",
+                        outputExample=output.get("example"),
+                    )
+                )
+                break
+    return resolved
+
+
+def compile_workflow(workflow: Workflow) -> CompiledWorkflow:
+    """Derive adjacency, execution order, resolved inputs and placeholders in one pass"""
+    index = get_graph_index(workflow)
+    plan = index.execution_plan()
+    return CompiledWorkflow(
+        workflow_id=str(workflow.id),
+        version=workflow.version,
+        compiler_version=COMPILER_VERSION,
+        adjacency={node_id: list(successors) for node_id, successors in index.successors.items()},
+        topological_order=[node_id for stage in plan.stages for node_id in stage],
+        execution_plan=plan,
+        connected_inputs=resolve_connected_inputs(workflow),
+        placeholders={
+            node.id: extract_placeholders(
+                agent_prompt_texts(node.properties.get("parameters") or {})
+            )
+            for node in workflow.nodes
+            if node.type == "agent"
+        },
+    )
+
+
+class WorkflowCompiler:
+    """Serves compiled artifacts from memory, then the side collection, compiling on a miss"""
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.compiled_workflows
+
+    async def ensure_indexes(self):
+        """Unique index serving the artifact lookup, the upsert and the cleanup of old versions"""
+        keys = [("workflow_id", 1), ("version", 1), ("compiler_version", 1)]
+        try:
+            await self.collection.create_index(keys, unique=True)
+        except DuplicateKeyError:
+            # Duplicates stored by racing compiles before the index existed; the
+            # artifacts are derived data, so drop them and recompile on demand
+            await self.collection.delete_many({})
+            await self.collection.create_index(keys, unique=True)
+
+    async def get_compiled(self, workflow: Workflow) -> CompiledWorkflow:
+        if save_buffer.is_unsaved(workflow):
+            # A buffered version may be dropped and its number reused, so it is not stored
+            return compile_workflow(workflow)
+        key = (str(workflow.id), workflow.version)
+        compiled = _compiled_cache.get(key)
+        if compiled is not None:
+            return compiled
+
+        stored = await self.collection.find_one(
+            {
+                "workflow_id": key[0],
+                "version": key[1],
+                "compiler_version": COMPILER_VERSION,
+            }
+        )
+        if stored:
+            stored.pop("_id", None)
+            compiled = CompiledWorkflow(**stored)
+        else:
+            compiled = compile_workflow(workflow)
+            try:
+                await self.collection.update_one(
+                    {
+                        "workflow_id": key[0],
+                        "version": key[1],
+                        "compiler_version": COMPILER_VERSION,
+                    },
+                    {"$set": compiled.model_dump()},
+                    upsert=True,
+                )
+            except DuplicateKeyError:
+                # A concurrent compile of the same version stored the same artifact
+                pass
+            # Artifacts for older versions, or from older compilers, are never read again
+            await self.collection.delete_many(
+                {
+                    "workflow_id": key[0],
+                    "$or": [
+                        {"version": {"$lt": key[1]}},
+                        {"compiler_version": {"$ne": COMPILER_VERSION}},
+                    ],
+                }
+            )
+
+        _compiled_cache.set(key, compiled)
+        return compiled
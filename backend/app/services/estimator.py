@@ -0,0 +1,133 @@
+import json
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+from app.core.config import settings
+from app.models.analysis import ModelProfile, NodeEstimate, WorkflowEstimate
+from app.models.workflow import Node, Workflow
+from app.services.graph import get_graph_index
+from app.services.prompts import agent_prompt_texts
+
+# Rough, illustrative defaults for the models offered in the editor. Deployments
+# should point MODEL_PROFILES_PATH at a JSON file with their own measurements:
+# {"models": {"<model>": {...ModelProfile fields}}, "tools": {"<tool>": <latency_ms>}}
+DEFAULT_MODEL_PROFILES: Dict[str, Tuple[float, float, float, float]] = {
+    # model: (latency_ms, output_tokens_per_second, input $/1M, output $/1M)
+    "o3": (4000, 60, 2.0, 8.0),
+    "o3-mini": (2000, 120, 1.1, 4.4),
+    "o3-pro": (15000, 30, 20.0, 80.0),
+    "o4-mini": (1500, 130, 1.1, 4.4),
+    "gpt-4.1": (800, 80, 2.0, 8.0),
+    "gpt-4o": (600, 90, 2.5, 10.0),
+    "claude-opus-4.1": (2000, 40, 15.0, 75.0),
+    "claude-sonnet-4": (1200, 70, 3.0, 15.0),
+    "claude-haiku-3.5": (700, 120, 0.8, 4.0),
+    "gemini-2.5-flash": (600, 200, 0.3, 2.5),
+    "gemini-2.5-pro": (2000, 90, 1.25, 10.0),
+    # Used for models missing from the table
+    "default": (1000, 80, 3.0, 15.0),
+}
+
+# Extra latency added per enabled agent tool
+DEFAULT_TOOL_LATENCY_MS: Dict[str, float] = {
+    "web_search": 1500,
+    "api_call": 800,
+    "file_search": 500,
+    "code_interpreter": 2000,
+    "image_generation": 8000,
+}
+
+# Characters per token used to approximate prompt size
+CHARS_PER_TOKEN = 4
+
+# A node is flagged as dominant above this share of critical-path latency or run cost
+DOMINANT_SHARE = 0.3
+
+
+@lru_cache(maxsize=1)
+def load_profiles() -> Tuple[Dict[str, ModelProfile], Dict[str, float]]:
+    """Return (model profiles, tool latencies), with MODEL_PROFILES_PATH overriding defaults"""
+    models = {
+        name: dict(zip(ModelProfile.model_fields, profile))
+        for name, profile in DEFAULT_MODEL_PROFILES.items()
+    }
+    tools = dict(DEFAULT_TOOL_LATENCY_MS)
+    if settings.MODEL_PROFILES_PATH:
+        with open(settings.MODEL_PROFILES_PATH, "r", encoding="utf-8") as fh:
+            overrides = json.load(fh)
+        models.update(overrides.get("models", {}))
+        tools.update(overrides.get("tools", {}))
+    return {name: ModelProfile(**profile) for name, profile in models.items()}, tools
+
+
+def estimate_prompt_tokens(parameters: Dict[str, Any]) -> int:
+    """Approximate the input token count of an agent's developer message and prompts"""
+    chars = sum(len(text) for text in agent_prompt_texts(parameters))
+    return -(-chars // CHARS_PER_TOKEN)
+
+
+def estimate_node(
+    node: Node, profiles: Dict[str, ModelProfile], tools: Dict[str, float]
+) -> NodeEstimate:
+    estimate = NodeEstimate(node_id=node.id, label=node.label)
+    if node.type != "agent":
+        # Only agent nodes call a model; other nodes are treated as free and instant
+        return estimate
+
+    parameters = node.properties.get("parameters") or {}
+    model = parameters.get("model") or None
+    profile = profiles.get(model) if model else None
+    if profile is None:
+        profile = profiles["default"]
+        estimate.unknown_model = True
+
+    estimate.model = model
+    estimate.input_tokens = estimate_prompt_tokens(parameters)
+    estimate.output_tokens = int(parameters.get("max_tokens") or 0)
+    estimate.latency_ms = profile.latency_ms + (
+        estimate.output_tokens / profile.output_tokens_per_second * 1000
+    )
+    for tool in parameters.get("tools") or []:
+        if tool.get("enabled"):
+            estimate.latency_ms += tools.get(tool.get("type"), 0.0)
+    estimate.cost = (
+        estimate.input_tokens * profile.input_cost_per_million
+        + estimate.output_tokens * profile.output_cost_per_million
+    ) / 1_000_000
+    return estimate
+
+
+def estimate_workflow(workflow: Workflow) -> WorkflowEstimate:
+    """Estimate end-to-end latency, token budget and cost of one workflow run"""
+    profiles, tools = load_profiles()
+    index = get_graph_index(workflow)
+    estimates = {
+        node_id: estimate_node(node, profiles, tools) for node_id, node in index.nodes.items()
+    }
+
+    stages, unscheduled = index.topological_stages()
+    path, path_latency = index.critical_path(stages, lambda node_id: estimates[node_id].latency_ms)
+    total_cost = sum(estimate.cost for estimate in estimates.values())
+
+    for node_id in path:
+        estimates[node_id].on_critical_path = True
+    for estimate in estimates.values():
+        latency_share = (
+            estimate.latency_ms / path_latency if estimate.on_critical_path and path_latency else 0.0
+        )
+        cost_share = estimate.cost / total_cost if total_cost else 0.0
+        estimate.dominant = max(latency_share, cost_share) >= DOMINANT_SHARE
+
+    total_input = sum(estimate.input_tokens for estimate in estimates.values())
+    total_output = sum(estimate.output_tokens for estimate in estimates.values())
+    return WorkflowEstimate(
+        workflow_id=str(workflow.id),
+        version=workflow.version,
+        critical_path=path,
+        critical_path_latency_ms=path_latency,
+        total_input_tokens=total_input,
+        total_output_tokens=total_output,
+        total_tokens=total_input + total_output,
+        cost_per_run=total_cost,
+        nodes=list(estimates.values()),
+        unscheduled_nodes=unscheduled,
+    )
@@ -0,0 +1,247 @@
+from collections import deque
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from app.core.cache import LRUCache, drop_workflow_entries, register_cache
+from app.models.workflow import (
+    Edge,
+    ExecutionPlan,
+    Node,
+    PlanNode,
+    TraversalDirection,
+    Workflow,
+    WorkflowSubgraph,
+)
+from app.services.autosave import save_buffer
+
+# Adjacency indexes are immutable for a given workflow version, so they are
+# cached by (workflow_id, version) and never go stale; entries of changed or
+# deleted workflows are dropped only to free their slots early.
+_index_cache = register_cache(
+    "graph_index",
+    LRUCache(maxsize=256),
+    invalidate={
+        "workflows": lambda workflow_id: drop_workflow_entries(_index_cache, workflow_id)
+    },
+)
+
+
+class GraphIndex:
+    """Adjacency index over a workflow's nodes and edges"""
+
+    def __init__(self, nodes: List[Node], edges: List[Edge]):
+        self.nodes: Dict[str, Node] = {node.id: node for node in nodes}
+        self.edges: List[Edge] = edges
+        # Map node id -> list of (edge position, neighbour id)
+        self.outgoing: Dict[str, List[Tuple[int, str]]] = {node_id: [] for node_id in self.nodes}
+        self.incoming: Dict[str, List[Tuple[int, str]]] = {node_id: [] for node_id in self.nodes}
+        # Execution dependencies follow edge direction only, deduplicated across handles
+        self.successors: Dict[str, Dict[str, None]] = {node_id: {} for node_id in self.nodes}
+        self.predecessors: Dict[str, Dict[str, None]] = {node_id: {} for node_id in self.nodes}
+        self._plan: Optional[ExecutionPlan] = None
+
+        for position, edge in enumerate(edges):
+            if edge.source not in self.nodes or edge.target not in self.nodes:
+                # Dangling edges reference deleted nodes; ignore them
+                continue
+            if edge.source != edge.target:
+                self.successors[edge.source][edge.target] = None
+                self.predecessors[edge.target][edge.source] = None
+            self.outgoing[edge.source].append((position, edge.target))
+            self.incoming[edge.target].append((position, edge.source))
+            # Bidirectional edges (e.g. Vector Store connections) carry data both ways
+            if (edge.data or {}).get("direction") == "bidirectional":
+                self.outgoing[edge.target].append((position, edge.source))
+                self.incoming[edge.source].append((position, edge.target))
+
+    def traverse(
+        self, start: str, direction: TraversalDirection, depth: Optional[int] = None
+    ) -> Tuple[Set[str], Set[int]]:
+        """Breadth-first walk from start, returning reached node ids and traversed edge positions"""
+        adjacency = []
+        if direction in (TraversalDirection.UP, TraversalDirection.BOTH):
+            adjacency.append(self.incoming)
+        if direction in (TraversalDirection.DOWN, TraversalDirection.BOTH):
+            adjacency.append(self.outgoing)
+
+        reached = {start}
+        traversed: Set[int] = set()
+        for neighbours in adjacency:
+            # Each direction is walked separately so "both" means upstream + downstream,
+            # not every node weakly connected to start
+            distance = {start: 0}
+            queue = deque([start])
+            while queue:
+                node_id = queue.popleft()
+                if depth is not None and distance[node_id] >= depth:
+                    continue
+                for position, neighbour in neighbours[node_id]:
+                    traversed.add(position)
+                    if neighbour not in distance:
+                        distance[neighbour] = distance[node_id] + 1
+                        reached.add(neighbour)
+                        queue.append(neighbour)
+        return reached, traversed
+
+    def topological_stages(self) -> Tuple[List[List[str]], List[str]]:
+        """Kahn's algorithm grouped by level; returns (stages, unscheduled nodes)
+
+        Unscheduled nodes are those on a cycle and everything downstream of one.
+        """
+        in_degree = {node_id: len(preds) for node_id, preds in self.predecessors.items()}
+        stage = [node_id for node_id, degree in in_degree.items() if degree == 0]
+        stages = []
+        while stage:
+            stages.append(stage)
+            next_stage = []
+            for node_id in stage:
+                for successor in self.successors[node_id]:
+                    in_degree[successor] -= 1
+                    if in_degree[successor] == 0:
+                        next_stage.append(successor)
+            stage = next_stage
+        unscheduled = [node_id for node_id, degree in in_degree.items() if degree > 0]
+        return stages, unscheduled
+
+    def cycle_members(self, candidates: List[str]) -> List[str]:
+        """Nodes among candidates that lie on a dependency cycle
+
+        Tarjan's strongly connected components over the candidates (the
+        unscheduled nodes suffice, as scheduled ones cannot be on a cycle); a
+        node is on a cycle when its component has more than one node. Self-loops
+        are not dependencies, so they do not count.
+        """
+        within = set(candidates)
+
+        def successors_within(node_id: str):
+            return iter([s for s in self.successors[node_id] if s in within])
+
+        order: Dict[str, int] = {}
+        low: Dict[str, int] = {}
+        stack: List[str] = []
+        on_stack: Set[str] = set()
+        members: Set[str] = set()
+        for root in candidates:
+            if root in order:
+                continue
+            # Iterative DFS: (node, iterator over its successors within candidates)
+            order[root] = low[root] = len(order)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, successors_within(root))]
+            while work:
+                node_id, successors = work[-1]
+                successor = next(successors, None)
+                if successor is not None:
+                    if successor not in order:
+                        order[successor] = low[successor] = len(order)
+                        stack.append(successor)
+                        on_stack.add(successor)
+                        work.append((successor, successors_within(successor)))
+                    elif successor in on_stack:
+                        low[node_id] = min(low[node_id], order[successor])
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node_id])
+                if low[node_id] == order[node_id]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node_id:
+                            break
+                    if len(component) > 1:
+                        members.update(component)
+        return [node_id for node_id in candidates if node_id in members]
+
+    def critical_path(
+        self, stages: List[List[str]], weight: Callable[[str], float] = lambda node_id: 1.0
+    ) -> Tuple[List[str], float]:
+        """Heaviest source-to-sink path through the scheduled nodes, and its total weight"""
+        best: Dict[str, float] = {}
+        parent: Dict[str, Optional[str]] = {}
+        for stage in stages:
+            for node_id in stage:
+                heaviest = None
+                for predecessor in self.predecessors[node_id]:
+                    if predecessor not in best:
+                        continue
+                    if heaviest is None or best[predecessor] > best[heaviest]:
+                        heaviest = predecessor
+                parent[node_id] = heaviest
+                best[node_id] = weight(node_id) + (best[heaviest] if heaviest is not None else 0.0)
+        if not best:
+            return [], 0.0
+
+        # End the path at a sink so zero-weight terminal nodes are included
+        sinks = [
+            node_id for node_id in best if not any(s in best for s in self.successors[node_id])
+        ]
+        tail = max(sinks, key=best.get)
+        path = []
+        node_id: Optional[str] = tail
+        while node_id is not None:
+            path.append(node_id)
+            node_id = parent[node_id]
+        return path[::-1], best[tail]
+
+    def execution_plan(self) -> ExecutionPlan:
+        """Stages of concurrently runnable nodes, computed once per index"""
+        if self._plan is None:
+            stages, unscheduled = self.topological_stages()
+            stage_of = {node_id: level for level, stage in enumerate(stages) for node_id in stage}
+            path, _ = self.critical_path(stages)
+            self._plan = ExecutionPlan(
+                stages=stages,
+                critical_path=path,
+                nodes={
+                    node_id: PlanNode(
+                        stage=stage_of.get(node_id),
+                        fan_in=len(self.predecessors[node_id]),
+                        fan_out=len(self.successors[node_id]),
+                    )
+                    for node_id in self.nodes
+                },
+                cyclic_nodes=self.cycle_members(unscheduled),
+                unscheduled_nodes=unscheduled,
+            )
+        return self._plan
+
+
+def get_graph_index(workflow: Workflow) -> GraphIndex:
+    """Return the cached adjacency index for this workflow version"""
+    if save_buffer.is_unsaved(workflow):
+        # Its version number is not final until the buffered saves are written
+        return GraphIndex(workflow.nodes, workflow.edges)
+    key = (str(workflow.id), workflow.version)
+    return _index_cache.get_or_create(key, lambda: GraphIndex(workflow.nodes, workflow.edges))
+
+
+def extract_subgraph(
+    workflow: Workflow,
+    node_id: str,
+    direction: TraversalDirection = TraversalDirection.BOTH,
+    depth: Optional[int] = None,
+) -> Optional[WorkflowSubgraph]:
+    """Return the nodes and edges upstream and/or downstream of node_id, or None if it is unknown"""
+    index = get_graph_index(workflow)
+    if node_id not in index.nodes:
+        return None
+
+    reached, traversed = index.traverse(node_id, direction, depth)
+    return WorkflowSubgraph(
+        workflow_id=str(workflow.id),
+        version=workflow.version,
+        node=node_id,
+        direction=direction,
+        depth=depth,
+        # Preserve the workflow's original ordering of nodes and edges
+        nodes=[node for node in workflow.nodes if node.id in reached],
+        edges=[edge for position, edge in enumerate(workflow.edges) if position in traversed],
+    )
+
+
+def get_execution_plan(workflow: Workflow) -> ExecutionPlan:
+    """Return the cached execution plan for this workflow version"""
+    return get_graph_index(workflow).execution_plan()
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+from pymongo.errors import OperationFailure, PyMongoError
+from app.core.cache import TTLCache, registered_caches, registered_invalidators
+from app.core.config import settings
+from app.core.metrics import Counter, register_metric
+
+logger = logging.getLogger(__name__)
+
+# Server errors meaning change streams cannot be used at all (standalone mongod)
+# or cannot resume from the saved token (it fell off the oplog)
+_UNSUPPORTED_CODES = {40573}
+_HISTORY_LOST_CODES = {260, 280, 286}
+
+# Events that make cached copies of a document stale; inserts cannot
+_DOCUMENT_EVENTS = {"update", "replace", "delete"}
+_COLLECTION_EVENTS = {"drop", "rename", "dropDatabase", "invalidate"}
+
+cache_invalidations = register_metric(
+    Counter(
+        "cache_invalidations_total",
+        "Cache invalidations published from the change stream",
+        labels=("collection", "operation"),
+    )
+)
+
+
+class CacheInvalidator:
+    """Publishes changes made by any process to the in-process caches derived from them
+
+    Follows one change stream over every collection a cache registered an
+    invalidation callback for. Without change streams (a standalone server,
+    an embedded backend, or while the stream is down), TTL caches with such
+    callbacks are capped at CACHE_FALLBACK_TTL_SECONDS instead, bounding how
+    long another process's writes can go unseen.
+    """
+
+    def __init__(self):
+        self.resume_token: Optional[Dict[str, Any]] = None
+        self.watching = False
+        self._configured_ttls: Dict[str, float] = {}
+
+    def _ttl_caches(self):
+        caches = registered_caches()
+        for callbacks in registered_invalidators().values():
+            for name, _ in callbacks:
+                cache = caches.get(name)
+                if isinstance(cache, TTLCache):
+                    yield name, cache
+
+    def use_fallback_ttl(self) -> None:
+        self.watching = False
+        for name, cache in self._ttl_caches():
+            self._configured_ttls.setdefault(name, cache.ttl)
+            cache.ttl = min(self._configured_ttls[name], settings.CACHE_FALLBACK_TTL_SECONDS)
+
+    def use_configured_ttl(self) -> None:
+        self.watching = True
+        for name, cache in self._ttl_caches():
+            cache.ttl = self._configured_ttls.pop(name, cache.ttl)
+
+    def publish(self, change: Dict[str, Any]) -> None:
+        """Run the invalidation callbacks a change event concerns"""
+        operation = change.get("operationType")
+        if operation in _DOCUMENT_EVENTS:
+            collection = change["ns"]["coll"]
+            document_id = change["documentKey"]["_id"]
+            collections = [collection]
+        elif operation in _COLLECTION_EVENTS:
+            collection = change.get("ns", {}).get("coll")
+            document_id = None
+            collections = [collection] if collection else list(registered_invalidators())
+        else:
+            return
+        invalidators = registered_invalidators()
+        for collection in collections:
+            for _, callback in invalidators.get(collection, []):
+                callback(document_id)
+            cache_invalidations.inc(collection, operation)
+            logger.debug("Invalidated %s %s after %s", collection, document_id, operation)
+
+    def invalidate_all(self) -> None:
+        """Treat every watched collection as changed, after changes may have been missed"""
+        for collection, callbacks in registered_invalidators().items():
+            for _, callback in callbacks:
+                callback(None)
+
+    async def watch(self, db) -> None:
+        """Follow the change stream until cancelled, resuming after interruptions"""
+        collections = list(registered_invalidators())
+        pipeline = [
+            {
+                "$match": {
+                    "$or": [
+                        {"ns.coll": {"$in": collections}},
+                        {"operationType": {"$in": ["dropDatabase", "invalidate"]}},
+                    ]
+                }
+            }
+        ]
+        while True:
+            try:
+                async with db.watch(pipeline, start_after=self.resume_token) as stream:
+                    if not self.watching:
+                        # Anything may have changed while nobody was listening
+                        if self.resume_token is None:
+                            self.invalidate_all()
+                        self.use_configured_ttl()
+                        logger.info("Watching changes for cache invalidation")
+                    while stream.alive:
+                        change = await stream.try_next()
+                        # Advances even when nothing changed, so a resume skips idle history
+                        self.resume_token = stream.resume_token
+                        if change is not None:
+                            self.publish(change)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code in _UNSUPPORTED_CODES:
+                    self.use_fallback_ttl()
+                    logger.warning(
+                        "Change streams unavailable (not a replica set); caches fall back "
+                        "to a %gs TTL",
+                        settings.CACHE_FALLBACK_TTL_SECONDS,
+                    )
+                    return
+                if e.code in _HISTORY_LOST_CODES:
+                    self.resume_token = None
+                self.use_fallback_ttl()
+                logger.warning("Cache invalidation stream failed, resuming: %s", e)
+            except PyMongoError as e:
+                self.use_fallback_ttl()
+                logger.warning("Cache invalidation stream interrupted, resuming: %s", e)
+            await asyncio.sleep(settings.CACHE_INVALIDATION_RETRY_SECONDS)
+
+
+cache_invalidator = CacheInvalidator()
+
+
+async def run_cache_invalidation(db) -> None:
+    """Background task keeping in-process caches consistent with other processes"""
+    if settings.STORAGE_BACKEND != "mongodb" or not settings.CACHE_CHANGE_STREAMS:
+        cache_invalidator.use_fallback_ttl()
+        return
+    await cache_invalidator.watch(db)
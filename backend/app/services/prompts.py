@@ -0,0 +1,22 @@
+import re
+from typing import Any, Dict, List
+
+# Same pattern as extractTokensFromPrompt in frontend/src/utils/systemPromptValidator.ts
+PLACEHOLDER_PATTERN = re.compile(r"\$\$([A-Za-z_][A-Za-z0-9_]*)\$\$")
+
+
+def agent_prompt_texts(parameters: Dict[str, Any]) -> List[str]:
+    """Return the developer message followed by every prompt context of an agent"""
+    # Legacy workflows may still carry system_prompt instead of developer_message
+    texts = [parameters.get("developer_message") or parameters.get("system_prompt") or ""]
+    texts.extend(prompt.get("content") or "" for prompt in parameters.get("prompts") or [])
+    return texts
+
+
+def extract_placeholders(texts: List[str]) -> List[str]:
+    """Return the distinct $$TOKEN$$ names used across texts, in order of first use"""
+    tokens: Dict[str, None] = {}
+    for text in texts:
+        for token in PLACEHOLDER_PATTERN.findall(text):
+            tokens[token] = None
+    return list(tokens)
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+from app.models.user import TokenPayload
+
+logger = logging.getLogger(__name__)
+
+
+def _epoch(value: datetime) -> float:
+    # Mongo returns naive datetimes in UTC
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing of Python's str hash.
+
+    The hash is salted per process, which is fine because the filter is never
+    persisted or shared.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        h1 = hash(item) & 0xFFFFFFFFFFFFFFFF
+        h2 = (h1 >> 32) | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        for position in self._positions(item):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class RevocationList:
+    """In-process view of revoked tokens, synced from the revoked_tokens collection
+
+    Individual tokens are revoked by jti; all tokens of a user issued up to a
+    cutoff are revoked by username (deactivation, deletion, role change). The
+    Bloom filter answers the common "not revoked" case without touching the
+    exact map, which only confirms positives. Entries are kept until the
+    tokens they cover would have expired anyway.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.clear()
+
+    def clear(self) -> None:
+        self._tokens: Dict[str, float] = {}  # jti -> expiry (epoch seconds)
+        self._users: Dict[str, Tuple[float, float]] = {}  # username -> (cutoff, expiry)
+        self._bloom = BloomFilter(self.capacity)
+        self._watermark: Optional[datetime] = None
+
+    def add_token(self, jti: str, expires: float) -> None:
+        if jti in self._tokens:
+            return
+        self._tokens[jti] = expires
+        if self._bloom.count >= self._bloom.capacity:
+            self._rebuild()
+        else:
+            self._bloom.add(jti)
+
+    def add_user(self, username: str, cutoff: float, expires: float) -> None:
+        current = self._users.get(username)
+        if current is None or current[0] < cutoff:
+            self._users[username] = (cutoff, expires)
+
+    def is_revoked(self, token: TokenPayload) -> bool:
+        if self._users:
+            revoked_user = self._users.get(token.sub)
+            # Tokens issued before jti/iat claims existed predate any cutoff
+            if revoked_user is not None and (token.iat is None or token.iat <= revoked_user[0]):
+                return True
+        return bool(self._tokens) and token.jti is not None and (
+            token.jti in self._bloom and token.jti in self._tokens
+        )
+
+    def prune(self, now: Optional[float] = None) -> None:
+        """Drop entries whose tokens have expired, rebuilding the filter if any went"""
+        now = time.time() if now is None else now
+        expired = [jti for jti, expires in self._tokens.items() if expires <= now]
+        for jti in expired:
+            del self._tokens[jti]
+        for username in [name for name, (_, expires) in self._users.items() if expires <= now]:
+            del self._users[username]
+        if expired:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        self._bloom = BloomFilter(max(self.capacity, 2 * len(self._tokens)))
+        for jti in self._tokens:
+            self._bloom.add(jti)
+
+    def _apply(self, doc: dict) -> None:
+        expires = _epoch(doc["expires_at"])
+        if doc.get("jti"):
+            self.add_token(doc["jti"], expires)
+        elif doc.get("username"):
+            self.add_user(doc["username"], doc["revoked_before"], expires)
+
+    async def sync(self, db) -> None:
+        """Pull revocations recorded since the last sync, including other processes'"""
+        query = {}
+        if self._watermark is not None:
+            # Re-read a window behind the watermark to tolerate clock skew between writers
+            overlap = timedelta(seconds=settings.REVOCATION_SYNC_OVERLAP_SECONDS)
+            query = {"revoked_at": {"$gte": self._watermark - overlap}}
+        async for doc in db.revoked_tokens.find(query):
+            self._apply(doc)
+            if self._watermark is None or doc["revoked_at"] > self._watermark:
+                self._watermark = doc["revoked_at"]
+        self.prune()
+
+
+revocation_list = RevocationList(capacity=settings.REVOCATION_BLOOM_CAPACITY)
+
+
+def _max_token_lifetime() -> timedelta:
+    return timedelta(
+        minutes=max(
+            settings.ACCESS_TOKEN_EXPIRE_MINUTES,
+            settings.STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES,
+            settings.REFRESH_TOKEN_EXPIRE_MINUTES,
+        )
+    )
+
+
+async def revoke_token(db, token: TokenPayload) -> None:
+    """Revoke a single token by jti until its own expiry"""
+    if token.jti is None:
+        return
+    now = datetime.utcnow()
+    if token.exp is not None:
+        expires_at = datetime.utcfromtimestamp(token.exp)
+    else:
+        expires_at = now + _max_token_lifetime()
+    revocation_list.add_token(token.jti, _epoch(expires_at))
+    await db.revoked_tokens.update_one(
+        {"jti": token.jti},
+        {"$set": {"jti": token.jti, "revoked_at": now, "expires_at": expires_at}},
+        upsert=True,
+    )
+
+
+async def revoke_user_tokens(db, username: str) -> None:
+    """Revoke every token issued to a user up to now"""
+    now = datetime.utcnow()
+    cutoff = int(time.time())
+    expires_at = now + _max_token_lifetime()
+    revocation_list.add_user(username, cutoff, _epoch(expires_at))
+    await db.revoked_tokens.update_one(
+        {"username": username},
+        {
+            "$set": {
+                "username": username,
+                "revoked_before": cutoff,
+                "revoked_at": now,
+                "expires_at": expires_at,
+            }
+        },
+        upsert=True,
+    )
+
+
+async def ensure_revocation_indexes(db) -> None:
+    # Mongo's TTL monitor removes entries once the tokens they cover have expired
+    await db.revoked_tokens.create_index("expires_at", expireAfterSeconds=0)
+    await db.revoked_tokens.create_index("revoked_at")
+
+
+async def run_revocation_sync(db) -> None:
+    """Background loop keeping this process's revocation list current"""
+    while True:
+        await asyncio.sleep(settings.REVOCATION_SYNC_SECONDS)
+        try:
+            await revocation_list.sync(db)
+        except Exception as e:
+            logger.exception("Error syncing token revocations: %s", e)
@@ -0,0 +1,63 @@
+"""The storage interface services are written against.
+
+Services use a small subset of Motor's collection API, so that subset is the
+interface: Motor's own database is the MongoDB implementation, and embedded
+engines implement the same calls on top of `engine.Store`.
+"""
+from typing import Any, List, Mapping, Optional, Protocol
+
+from pymongo.results import DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+
+class StorageCursor(Protocol):
+    def skip(self, skip: int) -> "StorageCursor": ...
+
+    def limit(self, limit: int) -> "StorageCursor": ...
+
+    def sort(self, key_or_list: Any, direction: Optional[int] = None) -> "StorageCursor": ...
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]: ...
+
+    def __aiter__(self): ...
+
+
+class StorageCollection(Protocol):
+    async def find_one(
+        self, filter: Any = None, projection: Any = None, **kwargs
+    ) -> Optional[dict]: ...
+
+    def find(
+        self, filter: Optional[Mapping] = None, projection: Any = None, **kwargs
+    ) -> StorageCursor: ...
+
+    async def count_documents(self, filter: Mapping, **kwargs) -> int: ...
+
+    async def insert_one(self, document: dict, **kwargs) -> InsertOneResult: ...
+
+    async def insert_many(
+        self, documents: List[dict], ordered: bool = True, **kwargs
+    ) -> InsertManyResult: ...
+
+    async def update_one(
+        self, filter: Mapping, update: Mapping, upsert: bool = False, **kwargs
+    ) -> UpdateResult: ...
+
+    async def delete_one(self, filter: Mapping, **kwargs) -> DeleteResult: ...
+
+    async def delete_many(self, filter: Mapping, **kwargs) -> DeleteResult: ...
+
+    async def find_one_and_update(
+        self, filter: Mapping, update: Mapping, **kwargs
+    ) -> Optional[dict]: ...
+
+    async def find_one_and_delete(self, filter: Mapping, **kwargs) -> Optional[dict]: ...
+
+    async def create_index(self, keys: Any, **kwargs) -> str: ...
+
+    def with_options(self, **kwargs) -> "StorageCollection": ...
+
+
+class StorageDatabase(Protocol):
+    def __getattr__(self, name: str) -> StorageCollection: ...
+
+    def __getitem__(self, name: str) -> StorageCollection: ...
@@ -0,0 +1,512 @@
+"""Collections with MongoDB semantics over a simple document store.
+
+A `Store` only keeps documents and index definitions; `Collection` adds
+queries, updates, unique and partial indexes and TTL expiry on top, and
+`AsyncDatabase` exposes it through the Motor calls services make.
+"""
+import copy
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+from app.core.database import command_observers
+from app.services.storage.query import (
+    apply_update,
+    equality_fields,
+    get_values,
+    matches,
+    project,
+    sort_documents,
+)
+
+# MongoDB's TTL monitor runs once a minute; expired documents linger until then
+TTL_INTERVAL_SECONDS = 60
+
+
+@dataclass
+class IndexSpec:
+    name: str
+    keys: Tuple[Tuple[str, int], ...]
+    unique: bool = False
+    partial_filter: Optional[dict] = None
+    expire_after_seconds: Optional[int] = None
+
+    @property
+    def fields(self) -> List[str]:
+        return [name for name, _ in self.keys]
+
+
+def normalize_keys(keys: Any, direction: Optional[int] = None) -> Tuple[Tuple[str, int], ...]:
+    """Index or sort keys as (field, direction) pairs, from any form pymongo accepts"""
+    if isinstance(keys, str):
+        return ((keys, direction if direction is not None else 1),)
+    if isinstance(keys, dict):
+        return tuple(keys.items())
+    return tuple((name, value) for name, value in keys)
+
+
+class Store:
+    """Storage primitives: documents by collection and _id, plus index definitions
+
+    `scan` may narrow by the top-level equality conditions it is given but
+    must never drop a document that could match them; callers filter again.
+    """
+
+    def scan(self, collection: str, equality: Dict[str, Any]) -> Iterator[dict]:
+        raise NotImplementedError
+
+    def insert(self, collection: str, document: dict) -> None:
+        raise NotImplementedError
+
+    def replace(self, collection: str, document: dict) -> None:
+        raise NotImplementedError
+
+    def delete(self, collection: str, document_id: Any) -> None:
+        raise NotImplementedError
+
+    def indexes(self, collection: str) -> List[IndexSpec]:
+        raise NotImplementedError
+
+    def add_index(self, collection: str, spec: IndexSpec) -> None:
+        raise NotImplementedError
+
+    @contextmanager
+    def transaction(self):
+        """Make the enclosed writes atomic, and unique checks race-free"""
+        yield
+
+    def close(self) -> None:
+        pass
+
+
+class Collection:
+    """Synchronous MongoDB-style collection over a Store"""
+
+    def __init__(self, store: Store, name: str):
+        self.store = store
+        self.name = name
+        self._purged_at = 0.0
+
+    # Reads
+
+    def _matching(self, filter: Optional[dict]) -> Iterator[dict]:
+        filter = _as_filter(filter)
+        self._purge_expired()
+        for document in self.store.scan(self.name, equality_fields(filter)):
+            if matches(document, filter):
+                yield document
+
+    def find(
+        self,
+        filter: Optional[dict] = None,
+        projection: Any = None,
+        sort: Optional[Tuple[Tuple[str, int], ...]] = None,
+        skip: int = 0,
+        limit: int = 0,
+    ) -> List[dict]:
+        documents = self._matching(filter)
+        if sort:
+            documents = iter(sort_documents(documents, list(sort)))
+        results = []
+        for index, document in enumerate(documents):
+            if index < skip:
+                continue
+            if limit and len(results) >= limit:
+                break
+            results.append(project(document, projection))
+        return results
+
+    def find_one(self, filter: Any = None, projection: Any = None, sort=None) -> Optional[dict]:
+        found = self.find(filter, projection, sort=sort, limit=1)
+        return found[0] if found else None
+
+    def count_documents(self, filter: Optional[dict] = None) -> int:
+        return sum(1 for _ in self._matching(filter))
+
+    # Writes
+
+    def insert_one(self, document: dict) -> Any:
+        with self.store.transaction():
+            self._check_unique(document)
+            self.store.insert(self.name, document)
+        return document["_id"]
+
+    def insert_many(self, documents: List[dict], ordered: bool = True) -> List[Any]:
+        inserted, write_errors = [], []
+        with self.store.transaction():
+            for index, document in enumerate(documents):
+                try:
+                    self._check_unique(document)
+                except DuplicateKeyError as e:
+                    write_errors.append(
+                        {"index": index, "code": e.code, "errmsg": str(e), **e.details}
+                    )
+                    if ordered:
+                        break
+                    continue
+                self.store.insert(self.name, document)
+                inserted.append(document["_id"])
+        if write_errors:
+            raise BulkWriteError(
+                {
+                    "writeErrors": write_errors,
+                    "writeConcernErrors": [],
+                    "nInserted": len(inserted),
+                    "nUpserted": 0,
+                    "nMatched": 0,
+                    "nModified": 0,
+                    "nRemoved": 0,
+                    "upserted": [],
+                }
+            )
+        return inserted
+
+    def update_one(
+        self, filter: dict, update: dict, upsert: bool = False, return_document: bool = False,
+        projection: Any = None, sort=None,
+    ) -> Tuple[dict, Optional[dict]]:
+        """Update the first match; returns the raw result and the before/after document"""
+        with self.store.transaction():
+            found = self.find(filter, sort=sort, limit=1)
+            if found:
+                before = found[0]
+                after = copy.deepcopy(before)
+                apply_update(after, update)
+                if "_id" in after and after["_id"] != before["_id"]:
+                    raise OperationFailure(
+                        "Performing an update would modify the immutable field '_id'", 66
+                    )
+                after["_id"] = before["_id"]
+                modified = after != before
+                if modified:
+                    self._check_unique(after)
+                    self.store.replace(self.name, after)
+                raw = {"n": 1, "nModified": int(modified), "ok": 1.0, "updatedExisting": True}
+                returned = after if return_document else before
+            elif upsert:
+                after = _upsert_seed(filter)
+                apply_update(after, update, inserting=True)
+                after.setdefault("_id", ObjectId())
+                self._check_unique(after)
+                self.store.insert(self.name, after)
+                raw = {"n": 1, "nModified": 0, "ok": 1.0, "updatedExisting": False,
+                       "upserted": after["_id"]}
+                returned = after if return_document else None
+            else:
+                return {"n": 0, "nModified": 0, "ok": 1.0, "updatedExisting": False}, None
+        return raw, project(returned, projection) if returned is not None else None
+
+    def delete(self, filter: dict, many: bool = False, projection: Any = None, sort=None):
+        """Delete the first (or every) match; returns the count and the first deleted document"""
+        with self.store.transaction():
+            found = self.find(filter, sort=sort, limit=0 if many else 1)
+            for document in found:
+                self.store.delete(self.name, document["_id"])
+        first = project(found[0], projection) if found else None
+        return len(found), first
+
+    # Indexes
+
+    def create_index(self, keys: Any, **options) -> str:
+        keys = normalize_keys(keys)
+        name = options.get("name") or "_".join(f"{field}_{direction}" for field, direction in keys)
+        spec = IndexSpec(
+            name=name,
+            keys=keys,
+            unique=bool(options.get("unique")),
+            partial_filter=options.get("partialFilterExpression"),
+            expire_after_seconds=options.get("expireAfterSeconds"),
+        )
+        with self.store.transaction():
+            existing = {index.name: index for index in self.store.indexes(self.name)}
+            if name in existing:
+                if existing[name] != spec:
+                    raise OperationFailure(
+                        f"An index named {name} already exists with different options", 85
+                    )
+                return name
+            if spec.unique:
+                seen = []
+                for document in self.store.scan(self.name, {}):
+                    if not _indexed(spec, document):
+                        continue
+                    key = _index_key(spec, document)
+                    if key in seen:
+                        raise DuplicateKeyError(
+                            f"E11000 duplicate key error collection: {self.name} index: {name}",
+                            11000,
+                        )
+                    seen.append(key)
+            self.store.add_index(self.name, spec)
+        return name
+
+    def _check_unique(self, document: dict) -> None:
+        for spec in self.store.indexes(self.name):
+            if not spec.unique or not _indexed(spec, document):
+                continue
+            key = _index_key(spec, document)
+            equality = {
+                name: value for name, value in zip(spec.fields, key)
+                if "." not in name and value is not None
+            }
+            for other in self.store.scan(self.name, equality):
+                if other["_id"] == document.get("_id") and "_id" in document:
+                    continue
+                if _indexed(spec, other) and _index_key(spec, other) == key:
+                    key_value = dict(zip(spec.fields, key))
+                    raise DuplicateKeyError(
+                        f"E11000 duplicate key error collection: {self.name} index: {spec.name} "
+                        f"dup key: {key_value}",
+                        11000,
+                        {"keyPattern": dict(spec.keys), "keyValue": key_value},
+                    )
+
+    def _purge_expired(self) -> None:
+        now = time.monotonic()
+        if now - self._purged_at < TTL_INTERVAL_SECONDS:
+            return
+        self._purged_at = now
+        ttl_indexes = [
+            spec for spec in self.store.indexes(self.name) if spec.expire_after_seconds is not None
+        ]
+        if not ttl_indexes:
+            return
+        current = datetime.utcnow()
+        with self.store.transaction():
+            for document in list(self.store.scan(self.name, {})):
+                for spec in ttl_indexes:
+                    expiry = timedelta(seconds=spec.expire_after_seconds)
+                    dates = [
+                        value for value in get_values(document, spec.fields[0])
+                        if isinstance(value, datetime)
+                    ]
+                    if dates and min(_naive(value) for value in dates) + expiry <= current:
+                        self.store.delete(self.name, document["_id"])
+                        break
+
+
+def _as_filter(filter: Any) -> dict:
+    # Like pymongo, a bare value is shorthand for an _id lookup
+    if filter is None:
+        return {}
+    if isinstance(filter, dict):
+        return filter
+    return {"_id": filter}
+
+
+def _naive(value: datetime) -> datetime:
+    # Stored datetimes are naive UTC, as pymongo returns them
+    if value.tzinfo is not None:
+        value = (value - value.utcoffset()).replace(tzinfo=None)
+    return value
+
+
+def _upsert_seed(filter: dict) -> dict:
+    seed = {}
+    for name, value in equality_fields(filter).items():
+        if "." not in name:
+            seed[name] = copy.deepcopy(value)
+    return seed
+
+
+def _indexed(spec: IndexSpec, document: dict) -> bool:
+    return spec.partial_filter is None or matches(document, spec.partial_filter)
+
+
+def _index_key(spec: IndexSpec, document: dict) -> Tuple[Any, ...]:
+    # Missing fields index as null, so a plain unique index admits one of them
+    key = []
+    for name in spec.fields:
+        values = get_values(document, name)
+        key.append(values[0] if values else None)
+    return tuple(key)
+
+
+class AsyncCursor:
+    """Lazy cursor mirroring Motor's: options chain, results load on first await"""
+
+    def __init__(
+        self, collection: "AsyncCollection", filter, projection, sort=None, skip=0, limit=0
+    ):
+        self._collection = collection
+        self._filter = filter
+        self._projection = projection
+        self._sort = normalize_keys(sort) if sort else None
+        self._skip = skip
+        self._limit = limit
+
+    def skip(self, skip: int) -> "AsyncCursor":
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int) -> "AsyncCursor":
+        self._limit = limit
+        return self
+
+    def sort(self, key_or_list: Any, direction: Optional[int] = None) -> "AsyncCursor":
+        self._sort = normalize_keys(key_or_list, direction)
+        return self
+
+    async def _fetch(self, length: Optional[int] = None) -> List[dict]:
+        limit = self._limit
+        if length is not None and (not limit or length < limit):
+            limit = length
+        return await self._collection._run(
+            self._collection._collection.find,
+            self._filter,
+            self._projection,
+            self._sort,
+            self._skip,
+            limit,
+        )
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        return await self._fetch(length)
+
+    async def __aiter__(self):
+        for document in await self._fetch():
+            yield document
+
+
+@dataclass
+class StorageCommandEvent:
+    """What command observers get for an embedded engine call, shaped like pymongo's events"""
+
+    command_name: str
+    command: dict
+    reply: Optional[dict] = None
+    duration_micros: int = 0
+
+
+class AsyncCollection:
+    """Motor-compatible facade; `run` decides where the synchronous work executes"""
+
+    def __init__(self, collection: Collection, run: Callable):
+        self._collection = collection
+        self._execute = run
+
+    async def _run(self, fn: Callable, *args, **kwargs):
+        observers = command_observers.get()
+        if not observers:
+            return await self._execute(fn, *args, **kwargs)
+        # Reported like MongoDB commands, so request tracing covers every backend
+        event = StorageCommandEvent(fn.__name__, {"args": list(args), **kwargs})
+        for observer in observers:
+            observer.command_started(event)
+        started = time.perf_counter()
+        try:
+            result = await self._execute(fn, *args, **kwargs)
+            event.reply = {"result": result}
+            return result
+        finally:
+            event.duration_micros = int((time.perf_counter() - started) * 1_000_000)
+            for observer in observers:
+                observer.command_finished(event, self.name)
+
+    @property
+    def name(self) -> str:
+        return self._collection.name
+
+    def with_options(self, **kwargs) -> "AsyncCollection":
+        # Read preferences and write concerns have no meaning for an embedded store
+        return self
+
+    async def find_one(self, filter: Any = None, projection: Any = None, *args, sort=None,
+                       session=None, **kwargs) -> Optional[dict]:
+        return await self._run(
+            self._collection.find_one, filter, projection, normalize_keys(sort) if sort else None
+        )
+
+    def find(self, filter: Optional[dict] = None, projection: Any = None, *args, sort=None,
+             skip: int = 0, limit: int = 0, session=None, **kwargs) -> AsyncCursor:
+        return AsyncCursor(self, filter, projection, sort, skip, limit)
+
+    async def count_documents(self, filter: dict, session=None, **kwargs) -> int:
+        return await self._run(self._collection.count_documents, filter)
+
+    async def insert_one(self, document: dict, session=None, **kwargs) -> InsertOneResult:
+        # pymongo adds the generated _id to the caller's document
+        document.setdefault("_id", ObjectId())
+        return InsertOneResult(await self._run(self._collection.insert_one, document), True)
+
+    async def insert_many(self, documents: List[dict], ordered: bool = True, session=None,
+                          **kwargs) -> InsertManyResult:
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+        inserted_ids = await self._run(self._collection.insert_many, documents, ordered)
+        return InsertManyResult(inserted_ids, True)
+
+    async def update_one(self, filter: dict, update: dict, upsert: bool = False, session=None,
+                         **kwargs) -> UpdateResult:
+        raw, _ = await self._run(self._collection.update_one, filter, update, upsert)
+        return UpdateResult(raw, True)
+
+    async def find_one_and_update(self, filter: dict, update: dict, projection: Any = None,
+                                  sort=None, upsert: bool = False,
+                                  return_document: bool = ReturnDocument.BEFORE, session=None,
+                                  **kwargs) -> Optional[dict]:
+        _, document = await self._run(
+            self._collection.update_one,
+            filter,
+            update,
+            upsert,
+            bool(return_document),
+            projection,
+            normalize_keys(sort) if sort else None,
+        )
+        return document
+
+    async def delete_one(self, filter: dict, session=None, **kwargs) -> DeleteResult:
+        count, _ = await self._run(self._collection.delete, filter)
+        return DeleteResult({"n": count, "ok": 1.0}, True)
+
+    async def delete_many(self, filter: dict, session=None, **kwargs) -> DeleteResult:
+        count, _ = await self._run(self._collection.delete, filter, True)
+        return DeleteResult({"n": count, "ok": 1.0}, True)
+
+    async def find_one_and_delete(self, filter: dict, projection: Any = None, sort=None,
+                                  session=None, **kwargs) -> Optional[dict]:
+        _, document = await self._run(
+            self._collection.delete, filter, False, projection,
+            normalize_keys(sort) if sort else None,
+        )
+        return document
+
+    async def create_index(self, keys: Any, session=None, **kwargs) -> str:
+        return await self._run(self._collection.create_index, keys, **kwargs)
+
+
+@dataclass
+class AsyncDatabase:
+    """Database handle resolving collections by attribute or key, like Motor's"""
+
+    store: Store
+    run: Callable
+    name: str = "musashi"
+    _collections: Dict[str, AsyncCollection] = field(default_factory=dict, repr=False)
+
+    def get_collection(self, name: str) -> AsyncCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = AsyncCollection(
+                Collection(self.store, name), self.run
+            )
+        return collection
+
+    def __getitem__(self, name: str) -> AsyncCollection:
+        return self.get_collection(name)
+
+    def __getattr__(self, name: str) -> AsyncCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.get_collection(name)
+
+    def close(self) -> None:
+        self.store.close()
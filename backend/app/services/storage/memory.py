@@ -0,0 +1,131 @@
+"""In-process storage for tests and benchmarks.
+
+Documents are kept BSON-encoded, so values normalize as they would in
+MongoDB (millisecond datetimes, enums as strings) and callers never share
+mutable state with the store. Calls run inline on the event loop.
+"""
+from typing import Any, Dict, Hashable, Iterator, List, Set
+
+import bson
+from pymongo.errors import DuplicateKeyError
+
+from app.services.storage.engine import AsyncDatabase, IndexSpec, Store
+
+# Bucket of documents an index lookup cannot rule out (the field holds an array)
+_ALWAYS = object()
+
+
+def _key(value: Any) -> Hashable:
+    return value if isinstance(value, Hashable) else repr(value)
+
+
+def _bucket(value: Any) -> Hashable:
+    return _ALWAYS if isinstance(value, list) or not isinstance(value, Hashable) else value
+
+
+class MemoryStore(Store):
+    def __init__(self):
+        self._documents: Dict[str, Dict[Hashable, bytes]] = {}
+        # Insertion sequence per _id, so index lookups return documents in natural order
+        self._positions: Dict[str, Dict[Hashable, int]] = {}
+        self._sequence = 0
+        self._indexes: Dict[str, List[IndexSpec]] = {}
+        # collection -> field -> value -> ids, for top-level indexed fields
+        self._lookups: Dict[str, Dict[str, Dict[Any, Set[Hashable]]]] = {}
+
+    def _collection(self, collection: str) -> Dict[Hashable, bytes]:
+        return self._documents.setdefault(collection, {})
+
+    def scan(self, collection: str, equality: Dict[str, Any]) -> Iterator[dict]:
+        documents = self._collection(collection)
+        if "_id" in equality:
+            encoded = documents.get(_key(equality["_id"]))
+            if encoded is not None:
+                yield bson.decode(encoded)
+            return
+        lookups = self._lookups.get(collection, {})
+        for name, value in equality.items():
+            if name in lookups and value is not None and isinstance(value, Hashable):
+                buckets = lookups[name]
+                ids = buckets.get(value, set()) | buckets.get(_ALWAYS, set())
+                positions = self._positions.get(collection, {})
+                for document_id in sorted(ids, key=positions.__getitem__):
+                    yield bson.decode(documents[document_id])
+                return
+        for encoded in list(documents.values()):
+            yield bson.decode(encoded)
+
+    def _index_document(self, collection: str, document: dict, add: bool) -> None:
+        document_id = _key(document["_id"])
+        for name, buckets in self._lookups.get(collection, {}).items():
+            if name not in document:
+                continue
+            key = _bucket(document[name])
+            if add:
+                buckets.setdefault(key, set()).add(document_id)
+            else:
+                ids = buckets.get(key)
+                if ids is not None:
+                    ids.discard(document_id)
+                    if not ids:
+                        del buckets[key]
+
+    def insert(self, collection: str, document: dict) -> None:
+        documents = self._collection(collection)
+        document_id = _key(document["_id"])
+        if document_id in documents:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {collection} index: _id_",
+                11000,
+                {"keyPattern": {"_id": 1}, "keyValue": {"_id": document["_id"]}},
+            )
+        documents[document_id] = bson.encode(document)
+        self._sequence += 1
+        self._positions.setdefault(collection, {})[document_id] = self._sequence
+        self._index_document(collection, document, add=True)
+
+    def replace(self, collection: str, document: dict) -> None:
+        documents = self._collection(collection)
+        document_id = _key(document["_id"])
+        previous = documents.get(document_id)
+        if previous is not None:
+            self._index_document(collection, bson.decode(previous), add=False)
+        documents[document_id] = bson.encode(document)
+        self._index_document(collection, document, add=True)
+
+    def delete(self, collection: str, document_id: Any) -> None:
+        encoded = self._collection(collection).pop(_key(document_id), None)
+        if encoded is not None:
+            self._positions[collection].pop(_key(document_id), None)
+            self._index_document(collection, bson.decode(encoded), add=False)
+
+    def indexes(self, collection: str) -> List[IndexSpec]:
+        return self._indexes.get(collection, [])
+
+    def add_index(self, collection: str, spec: IndexSpec) -> None:
+        self._indexes.setdefault(collection, []).append(spec)
+        lookups = self._lookups.setdefault(collection, {})
+        for name in spec.fields:
+            if "." in name or name in lookups:
+                continue
+            buckets = lookups[name] = {}
+            for document_id, encoded in self._collection(collection).items():
+                document = bson.decode(encoded)
+                if name in document:
+                    buckets.setdefault(_bucket(document[name]), set()).add(document_id)
+
+    def clear(self) -> None:
+        """Drop every document, keeping collections' index definitions"""
+        self._documents.clear()
+        self._positions.clear()
+        for lookups in self._lookups.values():
+            for buckets in lookups.values():
+                buckets.clear()
+
+
+async def _run_inline(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+def open_memory_database(name: str = "musashi") -> AsyncDatabase:
+    return AsyncDatabase(store=MemoryStore(), run=_run_inline, name=name)
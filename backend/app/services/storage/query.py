@@ -0,0 +1,321 @@
+"""MongoDB query, projection and update semantics over plain dicts.
+
+Covers the operators Musashi issues; anything else raises NotImplementedError
+rather than silently matching differently from MongoDB.
+"""
+import copy
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from bson import ObjectId
+
+# BSON type order used when comparing values of different types
+_TYPE_ORDER = {type(None): 1, int: 2, float: 2, str: 3, dict: 4, list: 5, ObjectId: 7, bool: 8,
+               datetime: 9}
+
+
+def get_values(doc: Any, path: str) -> List[Any]:
+    """Every value reachable at a dotted path, descending into arrays like MongoDB does"""
+    values = [doc]
+    for part in path.split("."):
+        next_values = []
+        for value in values:
+            if isinstance(value, dict):
+                if part in value:
+                    next_values.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit() and int(part) < len(value):
+                    next_values.append(value[int(part)])
+                else:
+                    next_values.extend(
+                        item[part] for item in value if isinstance(item, dict) and part in item
+                    )
+        values = next_values
+    return values
+
+
+def _candidates(values: List[Any]) -> List[Any]:
+    # An array field matches if the array itself or any element matches
+    expanded = []
+    for value in values:
+        expanded.append(value)
+        if isinstance(value, list):
+            expanded.extend(value)
+    return expanded
+
+
+def _comparable(a: Any, b: Any) -> bool:
+    return _TYPE_ORDER.get(type(a)) == _TYPE_ORDER.get(type(b)) and a is not None
+
+
+def _equals(value: Any, expected: Any) -> bool:
+    if isinstance(value, bool) != isinstance(expected, bool):
+        return False
+    if isinstance(value, dict) and isinstance(expected, dict):
+        # Embedded documents are equal only with the same fields in the same order
+        return list(value) == list(expected) and all(
+            _equals(value[key], expected[key]) for key in value
+        )
+    if isinstance(value, list) and isinstance(expected, list):
+        return len(value) == len(expected) and all(map(_equals, value, expected))
+    return value == expected
+
+
+def _match_operator(values: List[Any], operator: str, argument: Any) -> bool:
+    candidates = _candidates(values)
+    if operator == "$eq":
+        if argument is None:
+            return not values or any(value is None for value in candidates)
+        return any(_equals(value, argument) for value in candidates)
+    if operator == "$ne":
+        return not _match_operator(values, "$eq", argument)
+    if operator == "$in":
+        return any(_match_operator(values, "$eq", item) for item in argument)
+    if operator == "$nin":
+        return not _match_operator(values, "$in", argument)
+    if operator in ("$gt", "$gte", "$lt", "$lte"):
+        if argument is None:
+            # null only compares equal to null (and missing fields)
+            return operator in ("$gte", "$lte") and _match_operator(values, "$eq", None)
+        for value in candidates:
+            if not _comparable(value, argument):
+                continue
+            if (
+                (operator == "$gt" and value > argument)
+                or (operator == "$gte" and value >= argument)
+                or (operator == "$lt" and value < argument)
+                or (operator == "$lte" and value <= argument)
+            ):
+                return True
+        return False
+    if operator == "$exists":
+        return bool(values) == bool(argument)
+    if operator == "$type":
+        names = {"string": str, "int": int, "double": float, "bool": bool, "object": dict,
+                 "array": list, "objectId": ObjectId, "date": datetime, "null": type(None)}
+        expected = names.get(argument)
+        if expected is None:
+            raise NotImplementedError(f"$type {argument!r} is not supported")
+        return any(
+            type(value) is expected for value in (values + [item for value in values
+                                                            if isinstance(value, list)
+                                                            for item in value])
+        )
+    if operator == "$regex":
+        pattern = argument if hasattr(argument, "search") else re.compile(argument)
+        return any(isinstance(value, str) and pattern.search(value) for value in candidates)
+    if operator == "$size":
+        return any(isinstance(value, list) and len(value) == argument for value in values)
+    raise NotImplementedError(f"Query operator {operator} is not supported")
+
+
+def matches(doc: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    """Whether doc satisfies a MongoDB filter document"""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, sub) for sub in condition):
+                return False
+        elif key.startswith("$"):
+            raise NotImplementedError(f"Query operator {key} is not supported")
+        else:
+            values = get_values(doc, key)
+            if isinstance(condition, dict) and condition and all(
+                name.startswith("$") for name in condition
+            ):
+                for operator, argument in condition.items():
+                    if operator == "$options":
+                        continue
+                    if operator == "$regex" and "$options" in condition:
+                        flags = re.IGNORECASE if "i" in condition["$options"] else 0
+                        argument = re.compile(argument, flags)
+                    if operator == "$not":
+                        if matches(doc, {key: argument}):
+                            return False
+                    elif not _match_operator(values, operator, argument):
+                        return False
+            elif not _match_operator(values, "$eq", condition):
+                return False
+    return True
+
+
+def equality_fields(query: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Top-level field == value conditions, usable to narrow candidates or seed upserts"""
+    fields = {}
+    for key, condition in (query or {}).items():
+        if key.startswith("$"):
+            continue
+        if isinstance(condition, dict) and any(name.startswith("$") for name in condition):
+            if set(condition) == {"$eq"}:
+                fields[key] = condition["$eq"]
+            continue
+        fields[key] = condition
+    return fields
+
+
+def project(doc: Dict[str, Any], projection: Optional[Any]) -> Dict[str, Any]:
+    """Apply an inclusion or exclusion projection; without one, doc is returned as is"""
+    if not projection:
+        return doc
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = bool(projection.get("_id", 1))
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    if fields and all(value for value in fields.values()):
+        result = {}
+        for path in fields:
+            _copy_path(doc, result, path.split("."))
+        if include_id and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return copy.deepcopy(result)
+    result = copy.deepcopy(doc)
+    for path in fields:
+        _unset_path(result, path.split("."))
+    if not include_id:
+        result.pop("_id", None)
+    return result
+
+
+def _copy_path(source: Any, target: Dict[str, Any], parts: List[str]) -> None:
+    if not isinstance(source, dict) or parts[0] not in source:
+        return
+    value = source[parts[0]]
+    if len(parts) == 1:
+        target[parts[0]] = value
+    elif isinstance(value, list):
+        items = target.setdefault(parts[0], [{} for _ in value])
+        for item, target_item in zip(value, items):
+            _copy_path(item, target_item, parts[1:])
+    elif isinstance(value, dict):
+        _copy_path(value, target.setdefault(parts[0], {}), parts[1:])
+
+
+def _unset_path(doc: Any, parts: List[str]) -> None:
+    for part in parts[:-1]:
+        if not isinstance(doc, dict) or part not in doc:
+            return
+        doc = doc[part]
+    if isinstance(doc, dict):
+        doc.pop(parts[-1], None)
+
+
+def _parent(doc: Dict[str, Any], path: str, create: bool) -> Tuple[Optional[Dict], str]:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        if isinstance(doc, list) and part.isdigit():
+            doc = doc[int(part)]
+            continue
+        if part not in doc:
+            if not create:
+                return None, parts[-1]
+            doc[part] = {}
+        doc = doc[part]
+    return doc, parts[-1]
+
+
+def _set(doc: Dict[str, Any], path: str, value: Any) -> None:
+    parent, key = _parent(doc, path, create=True)
+    if isinstance(parent, list) and key.isdigit():
+        parent[int(key)] = value
+    else:
+        parent[key] = value
+
+
+def apply_update(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool = False) -> None:
+    """Apply update operators (or a replacement document) to doc in place"""
+    if not any(key.startswith("$") for key in update):
+        document_id = doc.get("_id")
+        doc.clear()
+        doc.update(copy.deepcopy(update))
+        if document_id is not None:
+            doc["_id"] = document_id
+        return
+
+    for operator, fields in update.items():
+        if operator == "$set" or (operator == "$setOnInsert" and inserting):
+            for path, value in fields.items():
+                _set(doc, path, copy.deepcopy(value))
+        elif operator == "$setOnInsert":
+            continue
+        elif operator == "$unset":
+            for path in fields:
+                _unset_path(doc, path.split("."))
+        elif operator == "$inc":
+            for path, amount in fields.items():
+                current = get_values(doc, path)
+                _set(doc, path, (current[0] if current else 0) + amount)
+        elif operator == "$push":
+            for path, value in fields.items():
+                current = get_values(doc, path)
+                items = list(current[0]) if current else []
+                if isinstance(value, dict) and "$each" in value:
+                    items.extend(copy.deepcopy(value["$each"]))
+                    if "$slice" in value:
+                        limit = value["$slice"]
+                        items = items[limit:] if limit < 0 else items[:limit]
+                else:
+                    items.append(copy.deepcopy(value))
+                _set(doc, path, items)
+        elif operator == "$addToSet":
+            for path, value in fields.items():
+                current = get_values(doc, path)
+                items = list(current[0]) if current else []
+                if isinstance(value, dict) and "$each" in value:
+                    additions = value["$each"]
+                else:
+                    additions = [value]
+                for item in additions:
+                    if item not in items:
+                        items.append(copy.deepcopy(item))
+                _set(doc, path, items)
+        elif operator == "$pull":
+            for path, condition in fields.items():
+                current = get_values(doc, path)
+                if current and isinstance(current[0], list):
+                    kept = [item for item in current[0] if not _pull_matches(item, condition)]
+                    _set(doc, path, kept)
+        else:
+            raise NotImplementedError(f"Update operator {operator} is not supported")
+
+
+def _pull_matches(item: Any, condition: Any) -> bool:
+    if isinstance(condition, dict):
+        if isinstance(item, dict):
+            return matches(item, condition)
+        return matches({"value": item}, {"value": condition})
+    return item == condition
+
+
+def _sort_value(value: Any) -> Tuple:
+    # Type rank first, then the value; documents compare field by field, in order
+    if value is None:
+        return (1, 0)
+    if isinstance(value, dict):
+        return (4, tuple((key, _sort_value(item)) for key, item in value.items()))
+    if isinstance(value, list):
+        return (5, tuple(_sort_value(item) for item in value))
+    return (_TYPE_ORDER.get(type(value), 6), value)
+
+
+def sort_documents(docs: Iterable[Dict[str, Any]], keys: List[Tuple[str, int]]) -> List[Dict]:
+    """Sort by (field, direction) pairs, ordering mixed types the way MongoDB does
+
+    An array sorts by its smallest element ascending and its largest descending;
+    an empty array sorts before null.
+    """
+    docs = list(docs)
+    for field, direction in reversed(keys):
+        def sort_key(doc, field=field, pick=max if direction < 0 else min):
+            values = get_values(doc, field)
+            value = values[0] if values else None
+            if isinstance(value, list):
+                return pick((_sort_value(item) for item in value), default=(0, 0))
+            return _sort_value(value)
+
+        docs.sort(key=sort_key, reverse=direction < 0)
+    return docs
@@ -0,0 +1,212 @@
+"""Embedded storage on SQLite, for single-node installs without a MongoDB server.
+
+Each collection is a table of JSON documents (Extended JSON, so ObjectIds and
+datetimes round-trip). WAL mode lets readers in other worker processes run
+alongside a writer, and write transactions take the lock up front, so unique
+checks and the write they guard cannot interleave with another process.
+All connection use happens on one thread, off the event loop.
+"""
+import asyncio
+import functools
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+from bson import json_util
+from bson.json_util import JSONMode, JSONOptions
+from pymongo.errors import DuplicateKeyError
+
+from app.services.storage.engine import AsyncDatabase, IndexSpec, Store
+
+JSON_OPTIONS = JSONOptions(json_mode=JSONMode.RELAXED, tz_aware=False)
+
+_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# Only these compare the same way in SQL as in MongoDB, after refiltering
+_PUSHDOWN_TYPES = (str, int, float)
+
+
+def _encode(value: Any) -> str:
+    return json_util.dumps(value, json_options=JSON_OPTIONS)
+
+
+def _decode(text: str) -> Any:
+    return json_util.loads(text, json_options=JSON_OPTIONS)
+
+
+def _table(collection: str) -> str:
+    if not _NAME.match(collection):
+        raise ValueError(f"Invalid collection name: {collection!r}")
+    return f'"c_{collection}"'
+
+
+class SQLiteStore(Store):
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._connection = None
+        self._tables = set()
+        self._indexes: Dict[str, List[IndexSpec]] = {}
+        self._schema_version = None
+        self._depth = 0
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS _indexes ("
+                "collection TEXT NOT NULL, name TEXT NOT NULL, spec TEXT NOT NULL, "
+                "PRIMARY KEY (collection, name))"
+            )
+            self._connection = connection
+        return self._connection
+
+    def _ensure_table(self, collection: str) -> str:
+        table = _table(collection)
+        if collection not in self._tables:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, doc TEXT NOT NULL)"
+            )
+            self._tables.add(collection)
+        return table
+
+    @contextmanager
+    def transaction(self):
+        if self._depth:
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+            return
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        self._depth = 1
+        try:
+            # Another process may have created indexes since they were cached
+            version = connection.execute("PRAGMA schema_version").fetchone()[0]
+            if version != self._schema_version:
+                self._indexes.clear()
+                self._schema_version = version
+            yield
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        else:
+            connection.execute("COMMIT")
+        finally:
+            self._depth = 0
+
+    def scan(self, collection: str, equality: Dict[str, Any]) -> Iterator[dict]:
+        table = self._ensure_table(collection)
+        conditions, parameters = [], []
+        for name, value in equality.items():
+            if name == "_id":
+                conditions.append("id = ?")
+                parameters.append(_encode(value))
+            elif _NAME.match(name) and type(value) in _PUSHDOWN_TYPES:
+                # An array field matches when any element does, so arrays are always candidates
+                conditions.append(
+                    f"(json_extract(doc, '$.{name}') = ? OR json_type(doc, '$.{name}') = 'array')"
+                )
+                parameters.append(value)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        for (text,) in self.connection.execute(f"SELECT doc FROM {table}{where}", parameters):
+            yield _decode(text)
+
+    def insert(self, collection: str, document: dict) -> None:
+        table = self._ensure_table(collection)
+        try:
+            self.connection.execute(
+                f"INSERT INTO {table} (id, doc) VALUES (?, ?)",
+                (_encode(document["_id"]), _encode(document)),
+            )
+        except sqlite3.IntegrityError:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {collection} index: _id_",
+                11000,
+                {"keyPattern": {"_id": 1}, "keyValue": {"_id": document["_id"]}},
+            )
+
+    def replace(self, collection: str, document: dict) -> None:
+        table = self._ensure_table(collection)
+        self.connection.execute(
+            f"UPDATE {table} SET doc = ? WHERE id = ?",
+            (_encode(document), _encode(document["_id"])),
+        )
+
+    def delete(self, collection: str, document_id: Any) -> None:
+        table = self._ensure_table(collection)
+        self.connection.execute(f"DELETE FROM {table} WHERE id = ?", (_encode(document_id),))
+
+    def indexes(self, collection: str) -> List[IndexSpec]:
+        specs = self._indexes.get(collection)
+        if specs is None:
+            rows = self.connection.execute(
+                "SELECT spec FROM _indexes WHERE collection = ? ORDER BY rowid", (collection,)
+            )
+            specs = self._indexes[collection] = [_spec_from_json(text) for (text,) in rows]
+        return specs
+
+    def add_index(self, collection: str, spec: IndexSpec) -> None:
+        table = self._ensure_table(collection)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO _indexes (collection, name, spec) VALUES (?, ?, ?)",
+            (collection, spec.name, _spec_to_json(spec)),
+        )
+        # Expression indexes serve the equality pushdown in scan()
+        for name in spec.fields:
+            if not _NAME.match(name):
+                continue
+            for function in ("json_extract", "json_type"):
+                self.connection.execute(
+                    f'CREATE INDEX IF NOT EXISTS "ix_{collection}_{name}_{function}" '
+                    f"ON {table} ({function}(doc, '$.{name}'))"
+                )
+        self._indexes.pop(collection, None)
+
+    def close(self) -> None:
+        def close_connection():
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+        self._executor.submit(close_connection).result()
+        self._executor.shutdown(wait=True)
+
+
+def _spec_to_json(spec: IndexSpec) -> str:
+    return _encode(
+        {
+            "name": spec.name,
+            "keys": [list(key) for key in spec.keys],
+            "unique": spec.unique,
+            "partial_filter": spec.partial_filter,
+            "expire_after_seconds": spec.expire_after_seconds,
+        }
+    )
+
+
+def _spec_from_json(text: str) -> IndexSpec:
+    data = _decode(text)
+    return IndexSpec(
+        name=data["name"],
+        keys=tuple((name, direction) for name, direction in data["keys"]),
+        unique=data["unique"],
+        partial_filter=data["partial_filter"],
+        expire_after_seconds=data["expire_after_seconds"],
+    )
+
+
+def open_sqlite_database(path: str, name: str) -> AsyncDatabase:
+    store = SQLiteStore(path)
+    return AsyncDatabase(store=store, run=store.run, name=name)
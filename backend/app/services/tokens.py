@@ -0,0 +1,104 @@
+import asyncio
+import hashlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import tiktoken
+from fastapi import HTTPException, status
+from app.core.cache import LRUCache, register_cache
+from app.core.config import settings
+from app.models.analysis import NodeTokenCount, WorkflowTokenReport
+from app.models.workflow import Workflow
+from app.services.prompts import agent_prompt_texts
+
+# (sha256 of text, encoding name) -> token count. Keyed by content rather than
+# node so that recounting after a small edit only encodes the changed prompt.
+_count_cache = register_cache("prompt_tokens", LRUCache(maxsize=settings.TOKEN_CACHE_SIZE))
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str) -> "tiktoken.Encoding":
+    return tiktoken.get_encoding(name)
+
+
+def _encode_batch(encoding_name: str, texts: List[str]) -> List[List[int]]:
+    # Loading an encoding reads (and the first time may download) its BPE file,
+    # so this runs on a worker thread. Prompts are user text: special-token
+    # markers such as <|endoftext|> in them are counted as plain text.
+    try:
+        encoding = get_encoding(encoding_name)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Tokenizer {encoding_name} could not be loaded: {e}",
+        ) from e
+    return encoding.encode_batch(texts, disallowed_special=())
+
+
+def encoding_name_for_model(model: Optional[str]) -> str:
+    """tiktoken encoding for a model, falling back to TOKEN_ENCODING for other providers"""
+    if model:
+        try:
+            return tiktoken.encoding_name_for_model(model)
+        except KeyError:
+            pass
+    return settings.TOKEN_ENCODING
+
+
+def _cache_key(text: str, encoding_name: str) -> Tuple[str, str]:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest(), encoding_name
+
+
+async def count_tokens(texts: List[str], encoding_name: str) -> List[int]:
+    """Token counts for texts, encoding only cache misses in one batch on a worker thread"""
+    keys = [_cache_key(text, encoding_name) for text in texts]
+    counts = [_count_cache.get(key) for key in keys]
+    misses = {key: text for key, text, count in zip(keys, texts, counts) if count is None}
+    if misses:
+        encoded = await asyncio.to_thread(_encode_batch, encoding_name, list(misses.values()))
+        fresh = {key: len(tokens) for key, tokens in zip(misses, encoded)}
+        for key, count in fresh.items():
+            _count_cache.set(key, count)
+        counts = [fresh[key] if count is None else count for key, count in zip(keys, counts)]
+    return counts
+
+
+async def count_workflow_tokens(workflow: Workflow) -> WorkflowTokenReport:
+    """Per-node and total prompt token counts for every agent node"""
+    agents = [node for node in workflow.nodes if node.type == "agent"]
+
+    # Group prompt texts by encoding so each encoding is batched once
+    texts_by_encoding: Dict[str, List[str]] = {}
+    node_texts = []
+    for node in agents:
+        parameters = node.properties.get("parameters") or {}
+        encoding_name = encoding_name_for_model(parameters.get("model"))
+        texts = agent_prompt_texts(parameters)
+        batch = texts_by_encoding.setdefault(encoding_name, [])
+        node_texts.append((node, parameters, encoding_name, len(batch), len(texts)))
+        batch.extend(texts)
+
+    counts_by_encoding = {
+        encoding_name: await count_tokens(texts, encoding_name)
+        for encoding_name, texts in texts_by_encoding.items()
+    }
+
+    report = WorkflowTokenReport(workflow_id=str(workflow.id), version=workflow.version)
+    for node, parameters, encoding_name, offset, size in node_texts:
+        counts = counts_by_encoding[encoding_name][offset : offset + size]
+        max_tokens = int(parameters.get("max_tokens") or 0)
+        total = sum(counts)
+        report.nodes.append(
+            NodeTokenCount(
+                node_id=node.id,
+                label=node.label,
+                model=parameters.get("model") or None,
+                encoding=encoding_name,
+                developer_message_tokens=counts[0],
+                prompt_tokens=total - counts[0],
+                total_tokens=total,
+                max_tokens=max_tokens or None,
+                exceeds_max_tokens=bool(max_tokens) and total > max_tokens,
+            )
+        )
+        report.total_tokens += total
+    return report
@@ -1,8 +1,32 @@
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import datetime
 from fastapi import HTTPException, status
-from app.models.user import User, UserCreate, UserInDB, UserUpdate, AdminUserUpdate, UserRole
-from app.services.auth import AuthService
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.models.user import (
+    AdminUserUpdate,
+    BulkUserError,
+    BulkUserResult,
+    User,
+    UserCreate,
+    UserInDB,
+    UserRole,
+    UserUpdate,
+)
+from app.services.auth import AuthService, invalidate_cached_user
+from app.services.bulk_users import hash_passwords_parallel
+from app.services.revocation import revoke_user_tokens
+
+
+# Set once ensure_indexes has succeeded in this process. Until then (e.g. when
+# existing duplicates prevent building the indexes) uniqueness is checked with reads
+unique_indexes_ready = False
+
+
+def duplicate_key_field(details: Optional[dict]) -> Optional[str]:
+    """Field whose unique index rejected a write, from a duplicate-key error's details"""
+    details = details or {}
+    return next(iter(details.get("keyPattern") or details.get("keyValue") or {}), None)
 
 
 class UserService:
@@ -17,7 +41,7 @@ class UserService:
         if not admin_user:
             admin_data = {
                 "username": "admin",
-                "hashed_password": self.auth_service.get_password_hash("1234"),
+                "hashed_password": await self.auth_service.get_password_hash_async("1234"),
                 "role": UserRole.ADMIN,
                 "is_active": True,
                 "created_at": datetime.utcnow(),
@@ -25,34 +49,115 @@ class UserService:
             }
             await self.collection.insert_one(admin_data)
 
-    async def create_user(self, user: UserCreate, created_by_admin: bool = False) -> User:
-        # Check if username already exists
-        existing_user = await self.collection.find_one({"username": user.username})
-        if existing_user:
-            raise ValueError("Username already registered")
-            
-        # Check if email already exists (only if email is provided)
-        if user.email is not None:
-            # MongoDB finds both null values and missing fields with {email: null}
-            # So we need to check for exact email value, not null
-            existing_email = await self.collection.find_one({"email": user.email})
-            if existing_email:
-                raise ValueError("Email already registered")
+    async def ensure_indexes(self):
+        """Unique indexes that enforce username and (when set) email uniqueness"""
+        global unique_indexes_ready
+        await self.collection.create_index("username", unique=True)
+        await self.collection.create_index(
+            "email", unique=True, partialFilterExpression={"email": {"$type": "string"}}
+        )
+        unique_indexes_ready = True
+
+    async def _taken_field(
+        self, username: Optional[str], email: Optional[str], exclude_id=None
+    ) -> Optional[str]:
+        """Pre-check read used only while the unique indexes are missing"""
+        if unique_indexes_ready:
+            return None
+        other = {"_id": {"$ne": exclude_id}} if exclude_id is not None else {}
+        if username is not None and await self.collection.find_one({"username": username, **other}):
+            return "username"
+        if email is not None and await self.collection.find_one({"email": email, **other}):
+            return "email"
+        return None
 
-        hashed_password = self.auth_service.get_password_hash(user.password)
+    async def create_user(self, user: UserCreate, created_by_admin: bool = False) -> User:
+        hashed_password = await self.auth_service.get_password_hash_async(user.password)
         user_data = user.model_dump(exclude={"password"})
         user_data["hashed_password"] = hashed_password
         user_data["created_at"] = datetime.utcnow()
         user_data["updated_at"] = datetime.utcnow()
 
-        result = await self.collection.insert_one(user_data)
-        created_user = await self.collection.find_one({"_id": result.inserted_id})
-        if created_user:
-            created_user["id"] = str(created_user["_id"])
-            created_user.pop("_id", None)
-            created_user.pop("hashed_password", None)
-            return User(**created_user)
-        raise HTTPException(status_code=500, detail="Failed to create user")
+        # Uniqueness is enforced by the indexes from ensure_indexes
+        taken = await self._taken_field(user.username, user.email)
+        if taken is not None:
+            raise ValueError(f"{taken.capitalize()} already registered")
+        try:
+            result = await self.collection.insert_one(user_data)
+        except DuplicateKeyError as e:
+            if duplicate_key_field(e.details) == "email":
+                raise ValueError("Email already registered")
+            raise ValueError("Username already registered")
+
+        user_data.pop("hashed_password")
+        user_data.pop("_id", None)  # insert_one adds it to the document in place
+        return User(id=str(result.inserted_id), **user_data)
+
+    async def bulk_create_users(self, users: List[Tuple[int, UserCreate]]) -> BulkUserResult:
+        """Create many users with parallel hashing and one unordered insert"""
+        result = BulkUserResult()
+
+        # Duplicates within the upload are dropped before hashing; clashes with
+        # existing users are reported by the unique indexes on insert
+        seen_usernames, seen_emails = set(), set()
+        if not unique_indexes_ready:
+            cursor = self.collection.find(
+                {
+                    "$or": [
+                        {"username": {"$in": list({user.username for _, user in users})}},
+                        {"email": {"$in": list({user.email for _, user in users if user.email})}},
+                    ]
+                },
+                {"username": 1, "email": 1},
+            )
+            async for existing in cursor:
+                seen_usernames.add(existing.get("username"))
+                seen_emails.add(existing.get("email"))
+        accepted = []
+        for row, user in users:
+            if user.username in seen_usernames:
+                detail = "Username already registered"
+            elif user.email is not None and user.email in seen_emails:
+                detail = "Email already registered"
+            else:
+                seen_usernames.add(user.username)
+                if user.email is not None:
+                    seen_emails.add(user.email)
+                accepted.append((row, user))
+                continue
+            result.errors.append(BulkUserError(row=row, username=user.username, detail=detail))
+
+        hashed_passwords = await hash_passwords_parallel([user.password for _, user in accepted])
+        now = datetime.utcnow()
+        documents = []
+        for (_, user), hashed_password in zip(accepted, hashed_passwords):
+            user_data = user.model_dump(exclude={"password"})
+            user_data["hashed_password"] = hashed_password
+            user_data["created_at"] = now
+            user_data["updated_at"] = now
+            documents.append(user_data)
+
+        if documents:
+            try:
+                inserted = await self.collection.insert_many(documents, ordered=False)
+                result.created = len(inserted.inserted_ids)
+            except BulkWriteError as e:
+                # Unique-index violations, mapped back to their rows
+                result.created = e.details.get("nInserted", 0)
+                for write_error in e.details.get("writeErrors", []):
+                    row, user = accepted[write_error["index"]]
+                    field = duplicate_key_field(write_error)
+                    if write_error.get("code") == 11000 and field in ("username", "email"):
+                        detail = f"{field.capitalize()} already registered"
+                    else:
+                        detail = write_error.get("errmsg", "Insert failed")
+                    result.errors.append(
+                        BulkUserError(row=row, username=user.username, detail=detail)
+                    )
+
+        result.errors.sort(key=lambda error: error.row)
+        result.failed = len(result.errors)
+        return result
 
     async def get_user_by_username(self, username: str) -> Optional[UserInDB]:
         user = await self.collection.find_one({"username": username})
@@ -76,83 +181,101 @@ class UserService:
             users.append(User(**user_data))
         return users
 
-    async def update_user(self, user_id: str, user_update: UserUpdate) -> User:
-        from bson import ObjectId
+    async def _write_update(self, user_id: str, update_data: dict) -> User:
+        """Apply an update in one round-trip and return the updated user
 
-        update_data = {}
-        for field, value in user_update.model_dump(exclude_unset=True).items():
-            if field == "password" and value:
-                update_data["hashed_password"] = self.auth_service.get_password_hash(value)
-            elif field != "password":
-                update_data[field] = value
+        The write returns the document as it was before the update; the user
+        returned is that document with the `$set` fields applied.
+
+        Revokes outstanding tokens when they no longer describe the account:
+        after a deactivation or role change, and, since tokens name the user
+        they were issued to, under the previous username after a rename.
+        """
+        from bson import ObjectId
 
+        previous_username = None
         if update_data:
+            taken = await self._taken_field(
+                update_data.get("username"), update_data.get("email"), ObjectId(user_id)
+            )
+            if taken is not None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"{taken.capitalize()} already exists",
+                )
             update_data["updated_at"] = datetime.utcnow()
-
-            # Check username uniqueness if updating username
-            if "username" in update_data:
-                existing_user = await self.collection.find_one(
-                    {"username": update_data["username"], "_id": {"$ne": ObjectId(user_id)}}
+            try:
+                # The document as it was, so a rename also yields the old username
+                previous = await self.collection.find_one_and_update(
+                    {"_id": ObjectId(user_id)},
+                    {"$set": update_data},
+                    projection={"hashed_password": 0},
+                    return_document=ReturnDocument.BEFORE,
                 )
-                if existing_user:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST, detail="Username already exists"
-                    )
-            
-            # Check email uniqueness if updating email (and email is not None)
-            if "email" in update_data and update_data["email"] is not None:
-                existing_email = await self.collection.find_one(
-                    {"email": update_data["email"], "_id": {"$ne": ObjectId(user_id)}}
+            except DuplicateKeyError as e:
+                field = duplicate_key_field(e.details) or "username"
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"{field.capitalize()} already exists",
                 )
-                if existing_email:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST, detail="Email already exists"
-                    )
-
-            await self.collection.update_one({"_id": ObjectId(user_id)}, {"$set": update_data})
+            invalidate_cached_user(user_id=user_id)
+            updated_user = None
+            if previous is not None:
+                previous_username = previous.get("username")
+                updated_user = {**previous, **update_data}
+                updated_user.pop("hashed_password", None)
+        else:
+            updated_user = await self.collection.find_one(
+                {"_id": ObjectId(user_id)}, {"hashed_password": 0}
+            )
 
-        updated_user = await self.collection.find_one({"_id": ObjectId(user_id)})
+        if updated_user is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
         updated_user["id"] = str(updated_user["_id"])
         updated_user.pop("_id", None)
-        updated_user.pop("hashed_password", None)
-        return User(**updated_user)
+        user = User(**updated_user)
 
-    async def admin_update_user(self, user_id: str, user_update: AdminUserUpdate) -> User:
-        from bson import ObjectId
+        if update_data.get("is_active") is False or "role" in update_data:
+            await revoke_user_tokens(self.db, user.username)
+        if previous_username is not None and previous_username != user.username:
+            await revoke_user_tokens(self.db, previous_username)
+        return user
 
+    async def update_user(self, user_id: str, user_update: UserUpdate) -> User:
         update_data = {}
         for field, value in user_update.model_dump(exclude_unset=True).items():
             if field == "password" and value:
-                update_data["hashed_password"] = self.auth_service.get_password_hash(value)
+                update_data["hashed_password"] = await self.auth_service.get_password_hash_async(
+                    value
+                )
             elif field != "password":
                 update_data[field] = value
 
-        if update_data:
-            update_data["updated_at"] = datetime.utcnow()
+        return await self._write_update(user_id, update_data)
 
-            # Check username uniqueness if updating username
-            if "username" in update_data:
-                existing_user = await self.collection.find_one(
-                    {"username": update_data["username"], "_id": {"$ne": ObjectId(user_id)}}
+    async def admin_update_user(self, user_id: str, user_update: AdminUserUpdate) -> User:
+        update_data = {}
+        for field, value in user_update.model_dump(exclude_unset=True).items():
+            if field == "password" and value:
+                update_data["hashed_password"] = await self.auth_service.get_password_hash_async(
+                    value
                 )
-                if existing_user:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST, detail="Username already exists"
-                    )
-
-            await self.collection.update_one({"_id": ObjectId(user_id)}, {"$set": update_data})
+            elif field != "password":
+                update_data[field] = value
 
-        updated_user = await self.collection.find_one({"_id": ObjectId(user_id)})
-        updated_user["id"] = str(updated_user["_id"])
-        updated_user.pop("_id", None)
-        updated_user.pop("hashed_password", None)
-        return User(**updated_user)
+        return await self._write_update(user_id, update_data)
 
     async def delete_user(self, user_id: str) -> bool:
         from bson import ObjectId
 
-        result = await self.collection.delete_one({"_id": ObjectId(user_id)})
-        return result.deleted_count > 0
+        deleted = await self.collection.find_one_and_delete(
+            {"_id": ObjectId(user_id)}, projection={"username": 1}
+        )
+        invalidate_cached_user(user_id=user_id)
+        if deleted is None:
+            return False
+        await revoke_user_tokens(self.db, deleted["username"])
+        return True
 
     async def get_user_by_email(self, email: str) -> Optional[UserInDB]:
         user = await self.collection.find_one({"email": email})
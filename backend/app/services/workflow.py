@@ -3,7 +3,9 @@ from bson import ObjectId
 import secrets
 from datetime import datetime
 from fastapi import HTTPException, status
+from app.core.database import secondary_reads, session_kwargs
 from app.models.workflow import Workflow, WorkflowCreate, WorkflowUpdate
+from app.services.autosave import save_buffer, workflow_saves
 
 
 class WorkflowService:
@@ -26,8 +28,10 @@ class WorkflowService:
             "version": 1
         }]
         
-        result = await self.collection.insert_one(workflow_data)
-        created_workflow = await self.collection.find_one({"_id": result.inserted_id})
+        result = await self.collection.insert_one(workflow_data, **session_kwargs())
+        created_workflow = await self.collection.find_one(
+            {"_id": result.inserted_id}, **session_kwargs()
+        )
         if created_workflow:
             created_workflow["id"] = str(created_workflow["_id"])
             created_workflow.pop("_id", None)
@@ -36,6 +40,15 @@ class WorkflowService:
     async def get_workflow(self, workflow_id: str) -> Optional[Workflow]:
         if not ObjectId.is_valid(workflow_id):
             return None
+        # Saves still in the write-behind buffer are newer than what is stored
+        buffered = save_buffer.pending_view(workflow_id)
+        if buffered is not None:
+            return buffered
+        await save_buffer.wait_for_flush(workflow_id)
+        # A write that failed puts its saves back in the buffer
+        buffered = save_buffer.pending_view(workflow_id)
+        if buffered is not None:
+            return buffered
         workflow = await self.collection.find_one({"_id": ObjectId(workflow_id)})
         if workflow:
             # Safe access to _id field for mock objects in tests
@@ -52,14 +65,23 @@ class WorkflowService:
         filter_query = {}
         if owner_id:
             filter_query["owner_id"] = owner_id
-        cursor = self.collection.find(filter_query).skip(skip).limit(limit)
+        # Listing tolerates bounded staleness; the user's session keeps their own writes visible
+        cursor = (
+            secondary_reads(self.collection)
+            .find(filter_query, **session_kwargs())
+            .skip(skip)
+            .limit(limit)
+        )
         workflows = await cursor.to_list(length=limit)
         for workflow in workflows:
             # Safe access to _id field for mock objects in tests
             if "_id" in workflow:
                 workflow["id"] = str(workflow["_id"])
                 workflow.pop("_id", None)
-        return [Workflow(**workflow) for workflow in workflows]
+        return [
+            save_buffer.pending_view(workflow.get("id")) or Workflow(**workflow)
+            for workflow in workflows
+        ]
 
     async def update_workflow(
         self, workflow_id: str, workflow_update: WorkflowUpdate, current_user_id: str = None, current_username: str = None
@@ -76,6 +98,20 @@ class WorkflowService:
         if not update_data:
             return current_workflow
 
+        # Autosaves acknowledged earlier but dropped when written are reported first
+        failed = save_buffer.take_failure(workflow_id, current_username or current_user_id)
+        if failed is not None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={
+                    "message": f"Your last {failed.saves} saves were not stored: {failed.reason}",
+                    "current_version": current_workflow.version,
+                    "your_version": workflow_update.version,
+                    "last_modified_by": current_workflow.last_modified_by,
+                    "workflow": current_workflow.model_dump(mode="json"),
+                },
+            )
+
         # Check for version conflict (optimistic locking)
         if workflow_update.version is not None:
             if current_workflow.version != workflow_update.version:
@@ -87,7 +123,7 @@ class WorkflowService:
                         "current_version": current_workflow.version,
                         "your_version": workflow_update.version,
                         "last_modified_by": current_workflow.last_modified_by,
-                        "workflow": current_workflow.model_dump()
+                        "workflow": current_workflow.model_dump(mode="json")
                     }
                 )
 
@@ -98,6 +134,19 @@ class WorkflowService:
         elif current_user_id:
             update_data["last_modified_by"] = current_user_id
 
+        # Rapid autosaves by one author are merged into a single write
+        if save_buffer.enabled:
+            author = current_username if current_username else current_user_id
+            if not save_buffer.accepts(workflow_id, author):
+                # Another author's pending saves are written first; build on the result
+                await save_buffer.flush(workflow_id)
+                current_workflow = await self.get_workflow(workflow_id)
+                if not current_workflow:
+                    return None
+            return save_buffer.add(
+                self.collection, workflow_id, current_workflow, update_data, author
+            )
+
         # Prepare new log entry
         new_log_entry = {
             "username": current_username if current_username else current_user_id,
@@ -118,7 +167,8 @@ class WorkflowService:
                         "$slice": -50  # Keep only the last 50 entries
                     }
                 }
-            }
+            },
+            **session_kwargs(),
         )
 
         # Check if update was successful
@@ -128,22 +178,31 @@ class WorkflowService:
                 status_code=status.HTTP_409_CONFLICT,
                 detail={
                     "message": "Workflow was modified during update. Please refresh and try again.",
-                    "current_workflow": (await self.get_workflow(workflow_id)).model_dump()
+                    "current_workflow": (await self.get_workflow(workflow_id)).model_dump(
+                        mode="json"
+                    )
                 }
             )
 
+        workflow_saves.inc("written")
         return await self.get_workflow(workflow_id)
 
     async def delete_workflow(self, workflow_id: str) -> bool:
         if not ObjectId.is_valid(workflow_id):
             return False
-        result = await self.collection.delete_one({"_id": ObjectId(workflow_id)})
+        save_buffer.discard(workflow_id)
+        result = await self.collection.delete_one(
+            {"_id": ObjectId(workflow_id)}, **session_kwargs()
+        )
         return result.deleted_count > 0
 
     async def share_workflow(self, workflow_id: str, owner_id: str) -> Optional[Workflow]:
         if not ObjectId.is_valid(workflow_id):
             return None
 
+        # The share token is written separately, so buffered saves go first
+        await save_buffer.flush(workflow_id)
+
         # Check if workflow exists and belongs to user
         workflow = await self.get_workflow(workflow_id)
         if not workflow:
@@ -158,6 +217,7 @@ class WorkflowService:
             await self.collection.update_one(
                 {"_id": ObjectId(workflow_id)},
                 {"$set": {"share_token": share_token, "is_public": True}},
+                **session_kwargs(),
             )
             workflow = await self.get_workflow(workflow_id)
 
@@ -167,7 +227,8 @@ class WorkflowService:
         """Team mode: Any authenticated user can share any workflow"""
         if not ObjectId.is_valid(workflow_id):
             return None
-        
+
+        await save_buffer.flush(workflow_id)
         workflow = await self.get_workflow(workflow_id)
         if not workflow:
             return None
@@ -178,16 +239,23 @@ class WorkflowService:
             await self.collection.update_one(
                 {"_id": ObjectId(workflow_id)},
                 {"$set": {"share_token": share_token, "is_public": True}},
+                **session_kwargs(),
             )
             workflow = await self.get_workflow(workflow_id)
         
         return workflow
 
     async def get_workflow_by_share_token(self, share_token: str) -> Optional[Workflow]:
-        workflow = await self.collection.find_one({"share_token": share_token, "is_public": True})
+        # Shared views are read-only and anonymous, so a slightly stale secondary is fine
+        workflow = await secondary_reads(self.collection).find_one(
+            {"share_token": share_token, "is_public": True}
+        )
         if workflow:
             workflow["id"] = str(workflow["_id"])
             workflow.pop("_id", None)
+            buffered = save_buffer.pending_view(workflow["id"])
+            if buffered is not None:
+                return buffered
         return Workflow(**workflow) if workflow else None
 
     async def generate_share_token(self, workflow_id: str) -> Optional[str]:
@@ -196,6 +264,7 @@ class WorkflowService:
             return None
         
         # Check if workflow exists
+        await save_buffer.flush(workflow_id)
         workflow = await self.get_workflow(workflow_id)
         if not workflow:
             return None
@@ -206,6 +275,7 @@ class WorkflowService:
             await self.collection.update_one(
                 {"_id": ObjectId(workflow_id)},
                 {"$set": {"share_token": share_token, "is_public": True}},
+                **session_kwargs(),
             )
             return share_token
         
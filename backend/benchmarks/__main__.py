@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Load-test the API in-process and compare against the committed baseline.
+
+Boots the app (lifespan included) on the in-memory storage engine or a local
+mongod, seeds users and workflows, then has concurrent virtual users send a
+fixed, seeded sequence of list / get / autosave / conflicting save / shared
+view / login requests through httpx's ASGI transport. Reports throughput and
+p50/p95/p99 per scenario, and exits non-zero when any request failed or p95 or
+throughput is worse than baseline.json by more than the tolerance.
+
+Absolute numbers depend on the host, so the baseline records the machine and
+configuration it was measured with, and a run on a different host or with a
+different configuration refuses to compare (exit status 2) unless given
+--ignore-mismatch. Record a baseline on the machine that runs the comparison
+with --update-baseline, and refresh it after an intended change.
+Password hashing uses BCRYPT_ROUNDS=4 unless set, so logins measure the
+service rather than bcrypt (see scripts/calibrate_password_hashing.py).
+
+Usage (from backend/):
+    python -m benchmarks
+    python -m benchmarks --users 50 --requests 400
+    python -m benchmarks --backend mongodb --mongodb-url mongodb://localhost:27017
+    python -m benchmarks --update-baseline
+    python -m benchmarks --ignore-mismatch
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import uuid
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the API under a mixed workload")
+    parser.add_argument("--backend", choices=["memory", "mongodb"], default="memory")
+    parser.add_argument(
+        "--mongodb-url", default=os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+    )
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--requests", type=int, default=100, help="Measured requests per user")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per user")
+    parser.add_argument("--workflows", type=int, default=5, help="Workflows seeded per user")
+    parser.add_argument("--nodes", type=int, default=30, help="Mean nodes per workflow")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--mix",
+        type=json.loads,
+        help='Scenario weights as JSON, e.g. \'{"get": 3, "autosave": 1}\'',
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="Allowed slowdown before failing"
+    )
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument(
+        "--ignore-mismatch",
+        action="store_true",
+        help="Compare even if the baseline was recorded on another host or configuration",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # Settings are read at import, so the environment is prepared first
+    os.environ["STORAGE_BACKEND"] = args.backend
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    database_name = None
+    if args.backend == "mongodb":
+        database_name = f"musashi_bench_{uuid.uuid4().hex[:8]}"
+        os.environ["MONGODB_URL"] = args.mongodb_url
+        os.environ["DATABASE_NAME"] = database_name
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from benchmarks.report import (
+        baseline_mismatches,
+        format_table,
+        load_baseline,
+        regressions,
+        save_baseline,
+    )
+    from benchmarks.runner import BenchmarkConfig, run_benchmark
+
+    config = BenchmarkConfig(
+        users=args.users,
+        requests_per_user=args.requests,
+        warmup_per_user=args.warmup,
+        workflows_per_user=args.workflows,
+        nodes_per_workflow=args.nodes,
+        seed=args.seed,
+    )
+    if args.mix:
+        config.mix = args.mix
+
+    try:
+        results = asyncio.run(run_benchmark(config))
+    finally:
+        if database_name is not None:
+            from pymongo import MongoClient
+
+            MongoClient(args.mongodb_url).drop_database(database_name)
+
+    baseline = load_baseline(args.backend)
+    print(f"\nBackend: {args.backend}, {config.users} users x {config.requests_per_user} requests")
+    print(format_table(results, baseline))
+
+    if args.update_baseline:
+        save_baseline(args.backend, results, config.as_dict())
+        print("\nBaseline updated")
+        return
+    if not baseline:
+        print("\nNo baseline for this backend; record one with --update-baseline")
+    else:
+        mismatches = baseline_mismatches(baseline, config.as_dict())
+        if mismatches:
+            print("\n" + "!" * 72)
+            print("The baseline was not recorded on this host with this configuration:")
+            for line in mismatches:
+                print(f"  {line}")
+            if not args.ignore_mismatch:
+                print("Refusing to compare; re-record it here with --update-baseline")
+                print("!" * 72)
+                sys.exit(2)
+            print("Comparing anyway (--ignore-mismatch); the numbers below may mislead")
+            print("!" * 72)
+    found = regressions(results, baseline, args.tolerance)
+    if found:
+        print(f"\nRegressions beyond {args.tolerance:.0%}:")
+        for line in found:
+            print(f"  {line}")
+        sys.exit(1)
+    if baseline:
+        print(f"\nWithin {args.tolerance:.0%} of baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Latency summaries and comparison against the committed baseline"""
+import json
+import os
+import platform
+import statistics
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+
+@dataclass
+class ScenarioResult:
+    requests: int
+    errors: int
+    throughput: float  # requests per second
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+    @classmethod
+    def from_latencies(cls, latencies: List[float], errors: int, elapsed: float):
+        """latencies in seconds, elapsed is the wall time of the whole run"""
+        milliseconds = sorted(latency * 1000 for latency in latencies)
+        if len(milliseconds) > 1:
+            cuts = statistics.quantiles(milliseconds, n=100, method="inclusive")
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = milliseconds[0] if milliseconds else 0.0
+        return cls(
+            requests=len(milliseconds),
+            errors=errors,
+            throughput=len(milliseconds) / elapsed if elapsed else 0.0,
+            p50_ms=round(p50, 3),
+            p95_ms=round(p95, 3),
+            p99_ms=round(p99, 3),
+        )
+
+
+def host_info() -> dict:
+    """What a baseline's numbers depend on besides the code: machine and interpreter"""
+    return {
+        "system": platform.system(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+
+def load_baseline(backend: str, path: Path = BASELINE_PATH) -> Dict[str, dict]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text()).get(backend, {})
+
+
+def save_baseline(
+    backend: str, results: Dict[str, ScenarioResult], config: dict, path: Path = BASELINE_PATH
+) -> None:
+    """Replace the backend's entry, keeping the others"""
+    baselines = json.loads(path.read_text()) if path.exists() else {}
+    baselines[backend] = {
+        "host": host_info(),
+        "config": config,
+        "scenarios": {
+            name: {
+                "errors": result.errors,
+                "throughput": round(result.throughput, 1),
+                "p50_ms": result.p50_ms,
+                "p95_ms": result.p95_ms,
+                "p99_ms": result.p99_ms,
+            }
+            for name, result in sorted(results.items())
+        },
+    }
+    path.write_text(json.dumps(baselines, indent=2) + "\n")
+
+
+def baseline_mismatches(baseline: Dict[str, dict], config: dict) -> List[str]:
+    """Ways the baseline was recorded differently from this run, which make it incomparable"""
+    found = []
+    recorded_host = baseline.get("host")
+    if recorded_host is None:
+        found.append("baseline does not record the host it was measured on")
+    else:
+        current = host_info()
+        for key in sorted(set(recorded_host) | set(current)):
+            if recorded_host.get(key) != current.get(key):
+                found.append(
+                    f"host {key}: {recorded_host.get(key)!r} in baseline, {current.get(key)!r} here"
+                )
+    recorded_config = baseline.get("config", {})
+    for key in sorted(set(recorded_config) | set(config)):
+        if recorded_config.get(key) != config.get(key):
+            found.append(
+                f"config {key}: {recorded_config.get(key)!r} in baseline, {config.get(key)!r} here"
+            )
+    return found
+
+
+def regressions(
+    results: Dict[str, ScenarioResult], baseline: Dict[str, dict], tolerance: float
+) -> List[str]:
+    """Scenarios that did worse than baseline
+
+    Any errors beyond the baseline's count (zero for scenarios it lacks) fail,
+    as does p95 latency or throughput worse by more than tolerance.
+    """
+    found = []
+    for name, result in sorted(results.items()):
+        expected = baseline.get("scenarios", {}).get(name)
+        allowed_errors = (expected or {}).get("errors", 0)
+        if result.errors > allowed_errors:
+            found.append(f"{name}: {result.errors} errors vs {allowed_errors}")
+        if expected is None:
+            continue
+        if result.p95_ms > expected["p95_ms"] * (1 + tolerance):
+            found.append(f"{name}: p95 {result.p95_ms:.2f} ms vs {expected['p95_ms']:.2f} ms")
+        if result.throughput < expected["throughput"] * (1 - tolerance):
+            found.append(
+                f"{name}: {result.throughput:.1f} req/s vs {expected['throughput']:.1f} req/s"
+            )
+    return found
+
+
+def _change(value: float, expected: Optional[float]) -> str:
+    if not expected:
+        return ""
+    return f"{(value - expected) / expected * 100:+.0f}%"
+
+
+def format_table(results: Dict[str, ScenarioResult], baseline: Dict[str, dict]) -> str:
+    expected = baseline.get("scenarios", {})
+    lines = [
+        f"{'scenario':<18}{'requests':>9}{'errors':>8}{'req/s':>10}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'vs baseline (p95, req/s)':>28}"
+    ]
+    for name, result in sorted(results.items()):
+        base = expected.get(name, {})
+        change = " ".join(
+            filter(
+                None,
+                [
+                    _change(result.p95_ms, base.get("p95_ms")),
+                    _change(result.throughput, base.get("throughput")),
+                ],
+            )
+        )
+        lines.append(
+            f"{name:<18}{result.requests:>9}{result.errors:>8}{result.throughput:>10.1f}"
+            f"{result.p50_ms:>9.2f}{result.p95_ms:>9.2f}{result.p99_ms:>9.2f}{change:>28}"
+        )
+    return "\n".join(lines)
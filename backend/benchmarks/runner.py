@@ -0,0 +1,116 @@
+"""Boots the app in-process and drives the workload with concurrent virtual users"""
+import asyncio
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List
+
+import httpx
+
+from app.core import database as database_module
+from app.main import app
+from benchmarks import workloads
+from benchmarks.report import ScenarioResult
+from benchmarks.seed import SeededData, seed
+
+
+@dataclass
+class BenchmarkConfig:
+    users: int = 20
+    requests_per_user: int = 100
+    warmup_per_user: int = 20
+    workflows_per_user: int = 5
+    nodes_per_workflow: int = 30
+    share_ratio: float = 0.3
+    seed: int = 1
+    mix: Dict[str, int] = field(default_factory=lambda: dict(workloads.DEFAULT_MIX))
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class Samples:
+    latencies: Dict[str, List[float]] = field(default_factory=dict)
+    errors: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, scenario: str, latency: float, ok: bool) -> None:
+        self.latencies.setdefault(scenario, []).append(latency)
+        self.errors[scenario] = self.errors.get(scenario, 0) + (not ok)
+
+
+async def _virtual_user(client, user, data: SeededData, rng, requests: int, mix, samples):
+    for _ in range(requests):
+        scenario = workloads.choose(rng, mix)
+        started = time.perf_counter()
+        ok = await workloads.send(client, scenario, user, data, rng)
+        samples.add(scenario.name, time.perf_counter() - started, ok)
+
+
+def _client(index: int) -> httpx.AsyncClient:
+    # A distinct address per user, as per-client limits (login admission) expect
+    address = (f"10.0.{index // 250}.{index % 250 + 1}", 50000)
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app, client=address), base_url="http://benchmark"
+    )
+
+
+async def _drive(clients, data: SeededData, config: BenchmarkConfig, requests: int):
+    samples = Samples()
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            # Each user draws from its own generator, so the request sequence is
+            # the same from run to run however the loop interleaves them
+            _virtual_user(
+                client,
+                user,
+                data,
+                random.Random(config.seed * 1000 + index),
+                requests,
+                config.mix,
+                samples,
+            )
+            for index, (client, user) in enumerate(zip(clients, data.users))
+        )
+    )
+    return samples, time.perf_counter() - started
+
+
+async def run_benchmark(config: BenchmarkConfig) -> Dict[str, ScenarioResult]:
+    """Start the app (lifespan included) on the configured backend, seed it, and measure
+
+    The database is expected to be empty; with MongoDB, point DATABASE_NAME at a
+    throwaway database.
+    """
+    async with app.router.lifespan_context(app):
+        data = await seed(
+            database_module.get_database(),
+            users=config.users,
+            workflows_per_user=config.workflows_per_user,
+            nodes_per_workflow=config.nodes_per_workflow,
+            share_ratio=config.share_ratio,
+            seed=config.seed,
+        )
+        if not data.share_tokens and config.mix.get("shared_view"):
+            raise ValueError("No workflow was shared; raise share_ratio or drop shared_view")
+
+        clients = [_client(index) for index in range(len(data.users))]
+        try:
+            if config.warmup_per_user:
+                await _drive(clients, data, config, config.warmup_per_user)
+            samples, elapsed = await _drive(clients, data, config, config.requests_per_user)
+        finally:
+            for client in clients:
+                await client.aclose()
+
+    results = {
+        name: ScenarioResult.from_latencies(latencies, samples.errors[name], elapsed)
+        for name, latencies in samples.latencies.items()
+    }
+    results["all"] = ScenarioResult.from_latencies(
+        [latency for latencies in samples.latencies.values() for latency in latencies],
+        sum(samples.errors.values()),
+        elapsed,
+    )
+    return results
@@ -0,0 +1,109 @@
+"""Realistic data for the benchmark: users, workflows of varying size, some shared"""
+import random
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List
+
+from app.models.user import User, UserRole
+from app.models.workflow import Edge, Node, WorkflowCreate
+from app.services.auth import AuthService
+from app.services.workflow import WorkflowService
+
+PASSWORD = "benchmark-password-1234"
+NODE_TYPES = ["agent", "tool", "router", "memory", "input", "output"]
+
+
+@dataclass
+class SeededUser:
+    user: User
+    token: str
+    # Workflow id -> the version this user last saw (users only save their own)
+    workflows: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class SeededData:
+    users: List[SeededUser]
+    share_tokens: List[str]
+
+
+def build_graph(rng: random.Random, node_count: int):
+    """A layered DAG with a few fan-outs, shaped like workflows drawn in the editor"""
+    nodes = [
+        Node(
+            id=f"n{i}",
+            type=NODE_TYPES[i % len(NODE_TYPES)],
+            label=f"Step {i}",
+            properties={
+                "prompt": " ".join(rng.choice(["plan", "call", "check", "merge"]) for _ in range(40)),
+                "model": rng.choice(["gpt-4o", "gpt-4o-mini", "claude-3-5-sonnet"]),
+            },
+            position_x=(i % 6) * 220.0,
+            position_y=(i // 6) * 140.0,
+        )
+        for i in range(node_count)
+    ]
+    edges = []
+    for i in range(1, node_count):
+        for source in {rng.randrange(max(0, i - 6), i), i - 1}:
+            edges.append(Edge(id=f"e{source}-{i}", source=f"n{source}", target=f"n{i}"))
+    return nodes, edges
+
+
+async def seed(
+    db,
+    users: int,
+    workflows_per_user: int,
+    nodes_per_workflow: int,
+    share_ratio: float,
+    seed: int,
+) -> SeededData:
+    rng = random.Random(seed)
+    auth_service = AuthService(db)
+    workflow_service = WorkflowService(db)
+    # One hash for everyone; hashing per user would dominate seeding
+    hashed_password = await auth_service.get_password_hash_async(PASSWORD)
+
+    seeded = []
+    share_tokens = []
+    for index in range(users):
+        now = datetime.utcnow()
+        document = {
+            "username": f"bench-user-{index}",
+            "hashed_password": hashed_password,
+            "role": UserRole.USER,
+            "is_active": True,
+            "created_at": now,
+            "updated_at": now,
+        }
+        result = await db.users.insert_one(document)
+        user = User(
+            id=str(result.inserted_id),
+            username=document["username"],
+            role=UserRole.USER,
+            created_at=now,
+            updated_at=now,
+        )
+        seeded_user = SeededUser(user, auth_service.create_user_tokens(user).access_token)
+
+        for number in range(workflows_per_user):
+            nodes, edges = build_graph(
+                rng, max(2, int(rng.gauss(nodes_per_workflow, nodes_per_workflow / 4)))
+            )
+            workflow = await workflow_service.create_workflow(
+                WorkflowCreate(
+                    name=f"{user.username} workflow {number}",
+                    description="Seeded for benchmarking",
+                    nodes=nodes,
+                    edges=edges,
+                ),
+                owner_id=user.id,
+                username=user.username,
+            )
+            seeded_user.workflows[str(workflow.id)] = workflow.version
+            if rng.random() < share_ratio:
+                shared = await workflow_service.share_workflow_team_mode(str(workflow.id))
+                share_tokens.append(shared.share_token)
+        seeded.append(seeded_user)
+
+    return SeededData(seeded, share_tokens)
@@ -0,0 +1,101 @@
+"""The request mix each virtual user draws from"""
+import random
+from typing import Awaitable, Callable, Dict
+
+import httpx
+
+from benchmarks.seed import PASSWORD, SeededData, SeededUser
+
+API = "/api/v1"
+
+# Relative frequencies, roughly what the editor sends: mostly reads and
+# autosaves, the occasional stale save from a second tab, and a few logins
+DEFAULT_MIX = {
+    "list": 25,
+    "get": 25,
+    "autosave": 25,
+    "conflicting_save": 5,
+    "shared_view": 15,
+    "login": 5,
+}
+
+
+class Scenario:
+    """A named request and the status a healthy server answers it with"""
+
+    def __init__(self, name: str, expected_status: int, send: Callable[..., Awaitable]):
+        self.name = name
+        self.expected_status = expected_status
+        self.send = send
+
+
+def _auth(user: SeededUser) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {user.token}"}
+
+
+async def list_workflows(client, user, data, rng):
+    return await client.get(f"{API}/workflows/", headers=_auth(user))
+
+
+async def get_workflow(client, user, data, rng):
+    workflow_id = rng.choice(list(user.workflows))
+    return await client.get(f"{API}/workflows/{workflow_id}", headers=_auth(user))
+
+
+async def autosave(client, user, data, rng):
+    workflow_id = rng.choice(list(user.workflows))
+    response = await client.put(
+        f"{API}/workflows/{workflow_id}",
+        headers=_auth(user),
+        json={
+            "description": f"edited {rng.random():.6f}",
+            "metadata": {"viewport": {"x": rng.randint(0, 2000), "zoom": 1.0}},
+            "version": user.workflows[workflow_id],
+        },
+    )
+    if response.status_code == 200:
+        user.workflows[workflow_id] = response.json()["version"]
+    return response
+
+
+async def conflicting_save(client, user, data, rng):
+    workflow_id = rng.choice(list(user.workflows))
+    return await client.put(
+        f"{API}/workflows/{workflow_id}",
+        headers=_auth(user),
+        json={"description": "from a stale tab", "version": user.workflows[workflow_id] - 1},
+    )
+
+
+async def shared_view(client, user, data: SeededData, rng):
+    return await client.get(f"{API}/workflows/shared/{rng.choice(data.share_tokens)}")
+
+
+async def login(client, user, data, rng):
+    return await client.post(
+        f"{API}/auth/login", json={"username": user.user.username, "password": PASSWORD}
+    )
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario("list", 200, list_workflows),
+        Scenario("get", 200, get_workflow),
+        Scenario("autosave", 200, autosave),
+        Scenario("conflicting_save", 409, conflicting_save),
+        Scenario("shared_view", 200, shared_view),
+        Scenario("login", 200, login),
+    )
+}
+
+
+def choose(rng: random.Random, mix: Dict[str, int]) -> Scenario:
+    names = list(mix)
+    return SCENARIOS[rng.choices(names, weights=[mix[name] for name in names])[0]]
+
+
+async def send(client: httpx.AsyncClient, scenario: Scenario, user, data, rng) -> bool:
+    """Send one request; whether it got the expected status"""
+    response = await scenario.send(client, user, data, rng)
+    return response.status_code == scenario.expected_status
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Audit $$TOKEN$$ placeholders in every agent prompt across all workflows.
+
+Streams workflows from MongoDB in batches, scans them in a process pool and
+writes one NDJSON line per workflow with unresolved tokens or unused inputs.
+
+Usage:
+    python scripts/audit_placeholders.py --output placeholder_audit.ndjson
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.services.audit import audit_workflows
+
+# Only the fields the scanner needs are shipped to worker processes
+PROJECTION = {"name": 1, "nodes.id": 1, "nodes.type": 1, "nodes.label": 1, "nodes.properties": 1}
+
+
+async def run_audit(output_path: str, workers: int, batch_size: int, include_clean: bool):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.DATABASE_NAME]
+    loop = asyncio.get_running_loop()
+
+    scanned = 0
+    with_findings = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(
+        output_path, "w", encoding="utf-8"
+    ) as out:
+        pending = set()
+
+        def write_results(results):
+            nonlocal scanned, with_findings
+            for report in results:
+                scanned += 1
+                if report["nodes"]:
+                    with_findings += 1
+                if report["nodes"] or include_clean:
+                    out.write(json.dumps(report, ensure_ascii=False) + "\n")
+
+        batch = []
+        cursor = db.workflows.find({}, PROJECTION, batch_size=batch_size)
+        async for workflow in cursor:
+            workflow["_id"] = str(workflow["_id"])
+            batch.append(workflow)
+            if len(batch) >= batch_size:
+                pending.add(loop.run_in_executor(pool, audit_workflows, batch))
+                batch = []
+            # Keep a bounded number of batches in flight so memory stays flat
+            if len(pending) >= workers * 2:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    write_results(future.result())
+        if batch:
+            pending.add(loop.run_in_executor(pool, audit_workflows, batch))
+        for future in asyncio.as_completed(pending):
+            write_results(await future)
+
+    client.close()
+    elapsed = time.perf_counter() - started
+    print(f"Scanned {scanned} workflows in {elapsed:.2f}s")
+    print(f"{with_findings} workflows with unresolved tokens or unused inputs -> {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", default="placeholder_audit.ndjson", help="Report path")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=200, help="Workflows per worker task")
+    parser.add_argument(
+        "--include-clean", action="store_true", help="Also write workflows without findings"
+    )
+    args = parser.parse_args()
+    asyncio.run(run_audit(args.output, args.workers, args.batch_size, args.include_clean))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Calibrate and benchmark password hashing on this host.
+
+calibrate: times bcrypt rounds and argon2id time costs and suggests the
+highest cost whose hash stays within a latency budget.
+
+benchmark: runs verifications on a thread pool the way the login endpoint
+does and reports logins per second, in total and per core, for the
+configured (or given) parameters.
+
+Usage:
+    python scripts/calibrate_password_hashing.py calibrate --target-ms 250
+    python scripts/calibrate_password_hashing.py benchmark --seconds 10
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.auth import argon2_available, build_password_context
+
+PASSWORD = "calibration-password-1234"
+
+
+def time_hash(context, samples: int) -> float:
+    """Median milliseconds to hash one password"""
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.hash(PASSWORD)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate_cost(name: str, costs, build, target_ms: float, samples: int):
+    """Time increasing costs until the budget is exceeded; return the last one within it"""
+    chosen = None
+    for cost in costs:
+        elapsed = time_hash(build(cost), samples)
+        within = elapsed <= target_ms
+        print(f"  {name}={cost:<3} {elapsed:8.1f} ms {'ok' if within else 'over budget'}")
+        if not within:
+            break
+        chosen = cost
+    return chosen
+
+
+def calibrate(args):
+    print(f"Target: {args.target_ms:.0f} ms per hash, median of {args.samples} samples\n")
+    suggestions = []
+
+    if args.scheme in ("bcrypt", "both"):
+        print("bcrypt")
+        rounds = calibrate_cost(
+            "rounds",
+            range(10, 20),
+            lambda cost: build_password_context("bcrypt", bcrypt_rounds=cost),
+            args.target_ms,
+            args.samples,
+        )
+        if rounds is None:
+            print("  even 10 rounds exceeds the budget; 10 is the lowest recommended cost")
+            rounds = 10
+        suggestions.append(["PASSWORD_HASH_SCHEME=bcrypt", f"BCRYPT_ROUNDS={rounds}"])
+
+    if args.scheme in ("argon2", "both"):
+        if not argon2_available():
+            print("argon2: skipped, install argon2-cffi to enable it")
+        else:
+            print(
+                f"\nargon2id (memory {args.memory_kib} KiB, parallelism {args.parallelism})"
+            )
+            time_cost = calibrate_cost(
+                "time_cost",
+                range(1, 11),
+                lambda cost: build_password_context(
+                    "argon2",
+                    argon2_time_cost=cost,
+                    argon2_memory_cost=args.memory_kib,
+                    argon2_parallelism=args.parallelism,
+                ),
+                args.target_ms,
+                args.samples,
+            )
+            if time_cost is None:
+                print("  time_cost=1 exceeds the budget; lower --memory-kib")
+            else:
+                suggestions.append(
+                    [
+                        "PASSWORD_HASH_SCHEME=argon2",
+                        f"ARGON2_TIME_COST={time_cost}",
+                        f"ARGON2_MEMORY_COST={args.memory_kib}",
+                        f"ARGON2_PARALLELISM={args.parallelism}",
+                    ]
+                )
+
+    for settings_lines in suggestions:
+        print("\nSuggested settings:")
+        for line in settings_lines:
+            print(f"  {line}")
+    print(
+        "\nExisting hashes are upgraded to the new parameters on each user's next login."
+    )
+
+
+def benchmark(args):
+    context = build_password_context(
+        args.scheme,
+        bcrypt_rounds=args.bcrypt_rounds,
+        argon2_time_cost=args.argon2_time_cost,
+        argon2_memory_cost=args.memory_kib,
+        argon2_parallelism=args.parallelism,
+    )
+    hashed = context.hash(PASSWORD)
+    cores = os.cpu_count() or 1
+    workers = args.workers or cores
+
+    started = time.perf_counter()
+    deadline = started + args.seconds
+
+    def worker():
+        count = 0
+        while time.perf_counter() < deadline:
+            context.verify(PASSWORD, hashed)
+            count += 1
+        return count
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        completed = sum(pool.map(lambda _: worker(), range(workers)))
+    elapsed = time.perf_counter() - started
+
+    per_second = completed / elapsed
+    if args.scheme == "bcrypt":
+        parameters = f"rounds={args.bcrypt_rounds}"
+    else:
+        parameters = (
+            f"time_cost={args.argon2_time_cost}, memory={args.memory_kib} KiB, "
+            f"parallelism={args.parallelism}"
+        )
+    print(f"Scheme:            {args.scheme} ({parameters})")
+    print(f"Workers:           {workers} threads on {cores} cores")
+    print(f"Verifications:     {completed} in {elapsed:.1f} s")
+    print(f"Logins per second: {per_second:.1f}")
+    print(f"Per core:          {per_second / min(workers, cores):.1f}")
+    print(f"Mean latency:      {workers * elapsed / completed * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate and benchmark password hashing")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    calibrate_parser = subparsers.add_parser("calibrate", help="Suggest costs for a latency budget")
+    calibrate_parser.add_argument("--target-ms", type=float, default=250.0)
+    calibrate_parser.add_argument("--samples", type=int, default=3)
+    calibrate_parser.add_argument(
+        "--scheme", choices=["bcrypt", "argon2", "both"], default="both"
+    )
+    calibrate_parser.add_argument("--memory-kib", type=int, default=settings.ARGON2_MEMORY_COST)
+    calibrate_parser.add_argument("--parallelism", type=int, default=settings.ARGON2_PARALLELISM)
+    calibrate_parser.set_defaults(handler=calibrate)
+
+    benchmark_parser = subparsers.add_parser("benchmark", help="Measure logins per second")
+    benchmark_parser.add_argument(
+        "--scheme", choices=["bcrypt", "argon2"], default=settings.PASSWORD_HASH_SCHEME
+    )
+    benchmark_parser.add_argument("--bcrypt-rounds", type=int, default=settings.BCRYPT_ROUNDS)
+    benchmark_parser.add_argument(
+        "--argon2-time-cost", type=int, default=settings.ARGON2_TIME_COST
+    )
+    benchmark_parser.add_argument("--memory-kib", type=int, default=settings.ARGON2_MEMORY_COST)
+    benchmark_parser.add_argument("--parallelism", type=int, default=settings.ARGON2_PARALLELISM)
+    benchmark_parser.add_argument(
+        "--workers", type=int, default=settings.PASSWORD_HASH_WORKERS, help="Hashing threads"
+    )
+    benchmark_parser.add_argument("--seconds", type=float, default=5.0)
+    benchmark_parser.set_defaults(handler=benchmark)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import pytest
 import pytest_asyncio
 import asyncio
+from contextlib import contextmanager
 from unittest.mock import AsyncMock, MagicMock
 from fastapi.testclient import TestClient
 from datetime import datetime, timedelta
@@ -11,9 +12,15 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from app.main import app
+from app.core import database as database_module
+from app.core.config import settings
 from app.services.auth import AuthService
 from app.services.workflow import WorkflowService
 from app.services.user import UserService
+from app.services.auth import user_cache
+from app.services.revocation import revocation_list
+from app.services.storage.memory import open_memory_database
+from app.core.tracing import add_trace_listener, remove_trace_listener
 
 
 @pytest.fixture(scope="session")
@@ -24,6 +31,16 @@ def event_loop():
     loop.close()
 
 
+@pytest.fixture(autouse=True)
+def clear_user_cache():
+    """Keep authenticated users and revocations from one test leaking into the next."""
+    user_cache.clear()
+    revocation_list.clear()
+    yield
+    user_cache.clear()
+    revocation_list.clear()
+
+
 @pytest_asyncio.fixture
 async def mock_db():
     """Mock database for testing."""
@@ -36,6 +53,8 @@ async def mock_db():
     db.users.insert_one = AsyncMock()
     db.users.update_one = AsyncMock()
     db.users.delete_one = AsyncMock()
+    db.users.find_one_and_update = AsyncMock(return_value=None)
+    db.users.find_one_and_delete = AsyncMock(return_value=None)
     db.users.find = MagicMock()
 
     db.workflows.find_one = AsyncMock(return_value=None)
@@ -44,9 +63,58 @@ async def mock_db():
     db.workflows.delete_one = AsyncMock()
     db.workflows.find = MagicMock()
 
+    db.compiled_workflows.find_one = AsyncMock(return_value=None)
+    db.compiled_workflows.update_one = AsyncMock()
+    db.compiled_workflows.delete_many = AsyncMock()
+
+    db.revoked_tokens.update_one = AsyncMock()
+
     return db
 
 
+@pytest.fixture
+def memory_db():
+    """Empty in-memory database with real MongoDB query and index semantics."""
+    return open_memory_database()
+
+
+@pytest.fixture
+def memory_backend(memory_db, monkeypatch):
+    """Serve the app from memory_db, including code that calls get_database() directly."""
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "memory")
+    monkeypatch.setattr(database_module, "client", None)
+    monkeypatch.setattr(database_module, "database", memory_db)
+    return memory_db
+
+
+@pytest.fixture
+def query_budget():
+    """Fail when a request made inside `with query_budget(n):` sends more than n database commands.
+
+    Counts come from the request tracing middleware, so this works on any backend
+    the app is served from (usually memory_backend).
+    """
+    traced = []
+
+    def record(endpoint, trace):
+        traced.append((endpoint, trace))
+
+    @contextmanager
+    def budget(max_commands: int):
+        first = len(traced)
+        yield
+        assert len(traced) > first, "no request was traced inside the budget"
+        for endpoint, trace in traced[first:]:
+            assert trace.commands <= max_commands, (
+                f"{endpoint} sent {trace.commands} database commands, budget is "
+                f"{max_commands}: {', '.join(trace.calls)}"
+            )
+
+    add_trace_listener(record)
+    yield budget
+    remove_trace_listener(record)
+
+
 @pytest_asyncio.fixture
 async def auth_service(mock_db):
     """Create AuthService instance with mock database."""
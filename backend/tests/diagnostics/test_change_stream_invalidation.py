@@ -0,0 +1,66 @@
+"""
+Diagnostic test for change-stream cache invalidation against a replica set.
+
+Checks that a user cached by this process is evicted when another client
+(standing in for another worker) deactivates the user.
+
+NOTE: Requires the replica set from docker-compose.replicaset.yml and
+MONGODB_REPLICA_SET_URL; skipped otherwise.
+"""
+
+import asyncio
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core import database as database_module
+from app.core.config import settings
+from app.models.user import User
+from app.services.auth import user_cache
+from app.services.invalidation import CacheInvalidator
+
+REPLICA_SET_URL = os.getenv("MONGODB_REPLICA_SET_URL")
+
+pytestmark = pytest.mark.skipif(
+    not REPLICA_SET_URL, reason="MONGODB_REPLICA_SET_URL not set"
+)
+
+
+@pytest.mark.asyncio
+async def test_other_process_write_evicts_cached_user(monkeypatch):
+    monkeypatch.setattr(settings, "MONGODB_URL", REPLICA_SET_URL)
+    monkeypatch.setattr(settings, "DATABASE_NAME", f"musashi_cs_test_{uuid.uuid4().hex[:8]}")
+    monkeypatch.setattr(database_module, "client", None)
+    monkeypatch.setattr(database_module, "database", None)
+
+    db = database_module.get_database()
+    other = AsyncIOMotorClient(REPLICA_SET_URL)[settings.DATABASE_NAME]
+    invalidator = CacheInvalidator()
+    watcher = asyncio.create_task(invalidator.watch(db))
+    try:
+        now = datetime.utcnow()
+        result = await db.users.insert_one({"username": "cs-user", "is_active": True})
+        for _ in range(50):
+            if invalidator.watching:
+                break
+            await asyncio.sleep(0.1)
+        user_cache.set(
+            "cs-user",
+            User(id=str(result.inserted_id), username="cs-user", created_at=now, updated_at=now),
+        )
+
+        await other.users.update_one({"_id": result.inserted_id}, {"$set": {"is_active": False}})
+
+        for _ in range(50):
+            if user_cache.get("cs-user") is None:
+                break
+            await asyncio.sleep(0.1)
+        assert user_cache.get("cs-user") is None
+    finally:
+        watcher.cancel()
+        other.client.close()
+        await database_module.get_client().drop_database(settings.DATABASE_NAME)
+        await database_module.close_database_connection()
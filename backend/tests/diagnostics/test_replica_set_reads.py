@@ -0,0 +1,51 @@
+"""
+Diagnostic test for secondary reads against a three-node replica set.
+
+Checks that listing with secondary reads enabled still shows a user's own
+write immediately, through the user's causally consistent session.
+
+NOTE: Requires the replica set from docker-compose.replicaset.yml and
+MONGODB_REPLICA_SET_URL; skipped otherwise.
+"""
+
+import os
+import uuid
+
+import pytest
+
+from app.core import database as database_module
+from app.core.config import settings
+from app.models.workflow import WorkflowCreate
+from app.services.workflow import WorkflowService
+
+REPLICA_SET_URL = os.getenv("MONGODB_REPLICA_SET_URL")
+
+pytestmark = pytest.mark.skipif(
+    not REPLICA_SET_URL, reason="MONGODB_REPLICA_SET_URL not set"
+)
+
+
+@pytest.mark.asyncio
+async def test_user_reads_own_write_from_secondaries(monkeypatch):
+    monkeypatch.setattr(settings, "MONGODB_URL", REPLICA_SET_URL)
+    monkeypatch.setattr(settings, "DATABASE_NAME", f"musashi_rs_test_{uuid.uuid4().hex[:8]}")
+    monkeypatch.setattr(settings, "MONGODB_SECONDARY_READS", True)
+    monkeypatch.setattr(database_module, "client", None)
+    monkeypatch.setattr(database_module, "database", None)
+
+    db = database_module.get_database()
+    service = WorkflowService(db)
+    try:
+        for attempt in range(20):
+            name = f"causal-{attempt}"
+            async with database_module.causal_session("rs-user"):
+                await service.create_workflow(WorkflowCreate(name=name), "rs-user", "rs-user")
+
+            # A new request: a new session continuing from the previous one
+            async with database_module.causal_session("rs-user"):
+                workflows = await service.get_workflows(owner_id="rs-user", limit=100)
+
+            assert name in {workflow.name for workflow in workflows}
+    finally:
+        await database_module.get_client().drop_database(settings.DATABASE_NAME)
+        await database_module.close_database_connection()
@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import AsyncMock, MagicMock
@@ -80,16 +81,35 @@ class TestAuthEndpoints:
 
         assert response.status_code == 422
 
-    def test_register_success(self, client, mock_db):
-        """Test successful user registration."""
-        # Skip this test for now since it's complex to mock properly
-        # The endpoint works but needs complex mocking structure
-        pytest.skip("Complex mocking required for register endpoint integration test")
+    def test_register_success(self, client, memory_backend):
+        """Test successful user registration against the in-memory database."""
+        app.dependency_overrides[get_database] = lambda: memory_backend
 
-    def test_register_duplicate_username(self, client, mock_db):
+        response = client.post(
+            "/api/v1/auth/register",
+            json={"username": "newuser", "email": "new@example.com", "password": "password123"},
+        )
+
+        assert response.status_code == 200
+        assert response.json()["user"]["username"] == "newuser"
+        stored = asyncio.run(memory_backend.users.find_one({"username": "newuser"}))
+        assert stored["email"] == "new@example.com"
+        assert stored["hashed_password"] != "password123"
+
+    def test_register_duplicate_username(self, client, mock_db, monkeypatch):
         """Test registration with existing username."""
-        mock_db.users.find_one = AsyncMock(
-            return_value={"_id": ObjectId("507f1f77bcf86cd799439011"), "username": "existing"}
+        from pymongo.errors import DuplicateKeyError
+        from app.services import user as user_module
+
+        monkeypatch.setattr(user_module, "unique_indexes_ready", True)
+
+        # The unique username index rejects the insert
+        mock_db.users.insert_one = AsyncMock(
+            side_effect=DuplicateKeyError(
+                "E11000 duplicate key error",
+                code=11000,
+                details={"keyPattern": {"username": 1}, "keyValue": {"username": "existing"}},
+            )
         )
 
         response = client.post(
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from concurrent.futures import Executor, Future
+import pytest
+import httpx
+from unittest.mock import AsyncMock, MagicMock
+from datetime import datetime
+from bson import ObjectId
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.main import app
+from app.core.database import get_database
+from app.models.user import User
+from app.core.admission import password_hashing_admission
+from app.services import auth as auth_module
+from app.services.auth import get_current_active_user_dependency, pwd_context
+
+LOGINS = 8
+PROBES = 20
+
+
+class InlineExecutor(Executor):
+    """Runs submitted calls at once on the caller's thread, i.e. on the event loop."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+class TestLoginStorm:
+    """Load test: password hashing must not stall unrelated requests."""
+
+    @pytest.fixture
+    def mock_db(self):
+        """Mock database with one user and one workflow."""
+        db = MagicMock()
+        hashed_password = pwd_context.hash("secret123")
+        db.users.find_one = AsyncMock(
+            side_effect=lambda query: {
+                "_id": ObjectId("507f1f77bcf86cd799439011"),
+                "username": "testuser",
+                "hashed_password": hashed_password,
+                "is_active": True,
+                "role": "user",
+                "created_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow(),
+            }
+        )
+        db.workflows.find_one = AsyncMock(
+            side_effect=lambda query: {
+                "_id": ObjectId("507f1f77bcf86cd799439014"),
+                "name": "Workflow",
+                "owner_id": "507f1f77bcf86cd799439011",
+                "created_at": datetime.utcnow(),
+            }
+        )
+        return db
+
+    @pytest.fixture(autouse=True)
+    def admit_whole_storm(self, monkeypatch):
+        """Queue every login from the single test client instead of shedding them."""
+        monkeypatch.setattr(password_hashing_admission, "queue_size", LOGINS)
+        monkeypatch.setattr(password_hashing_admission, "per_client_queue", LOGINS)
+
+    @pytest.fixture(autouse=True)
+    def override_dependencies(self, mock_db):
+        """Override database and auth dependencies."""
+        app.dependency_overrides[get_database] = lambda: mock_db
+        app.dependency_overrides[get_current_active_user_dependency] = lambda: User(
+            id="507f1f77bcf86cd799439011",
+            username="testuser",
+            is_active=True,
+            role="user",
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow(),
+        )
+        yield
+        app.dependency_overrides.clear()
+
+    async def probe_latencies(self, client):
+        latencies = []
+        for _ in range(PROBES):
+            started = time.perf_counter()
+            response = await client.get("/api/v1/workflows/507f1f77bcf86cd799439014")
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200
+            await asyncio.sleep(0.01)
+        return latencies
+
+    async def storm(self):
+        """Probe latencies measured while LOGINS logins run concurrently"""
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # Probes and logins run concurrently on the same event loop
+            probes = asyncio.create_task(self.probe_latencies(client))
+            responses = await asyncio.gather(
+                *(
+                    client.post(
+                        "/api/v1/auth/login",
+                        json={"username": "testuser", "password": "secret123"},
+                    )
+                    for _ in range(LOGINS)
+                )
+            )
+            during = await probes
+
+        assert all(response.status_code == 200 for response in responses)
+        return during
+
+    @pytest.mark.asyncio
+    async def test_workflow_get_latency_flat_during_login_storm(self, monkeypatch):
+        """Test that workflow GETs stay fast while many logins hash passwords.
+
+        Compared with a control run that hashes on the event loop, so the check
+        holds on slow and fast machines alike.
+        """
+        during = await self.storm()
+        monkeypatch.setattr(auth_module, "password_hash_executor", InlineExecutor())
+        blocked = await self.storm()
+
+        # A bcrypt call on the loop stalls the probe caught behind it for its whole
+        # duration; off the loop, no probe should wait anywhere near that long
+        assert max(during) < max(blocked) / 2
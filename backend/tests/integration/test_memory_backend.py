@@ -0,0 +1,83 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.main import app
+
+
+class TestMemoryBackend:
+    """End-to-end tests running the whole app, lifespan included, on the in-memory database."""
+
+    @pytest.fixture
+    def client(self, memory_backend):
+        """Test client whose startup creates indexes and the admin user in memory."""
+        with TestClient(app) as client:
+            yield client
+
+    @pytest.fixture
+    def headers(self, client):
+        """Auth headers for a freshly registered user."""
+        response = client.post(
+            "/api/v1/auth/register", json={"username": "editor", "password": "password123"}
+        )
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    def _create(self, client, headers, name):
+        response = client.post(
+            "/api/v1/workflows/", json={"name": name, "nodes": [], "edges": []}, headers=headers
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    def test_duplicate_registration_hits_unique_index(self, client, headers):
+        """Test that the username index created at startup rejects a second registration."""
+        response = client.post(
+            "/api/v1/auth/register", json={"username": "editor", "password": "password123"}
+        )
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Username already registered"
+
+    def test_list_pages_through_owned_workflows(self, client, headers):
+        """Test that skip and limit page through the caller's workflows in insertion order."""
+        for index in range(5):
+            self._create(client, headers, f"wf{index}")
+
+        response = client.get("/api/v1/workflows/?skip=1&limit=2", headers=headers)
+
+        assert response.status_code == 200
+        assert [workflow["name"] for workflow in response.json()] == ["wf1", "wf2"]
+
+    def test_autosave_bumps_version_and_detects_conflicts(self, client, headers):
+        """Test optimistic locking: stale versions get 409, update logs keep accumulating."""
+        workflow_id = self._create(client, headers, "draft")["_id"]
+
+        first = client.put(
+            f"/api/v1/workflows/{workflow_id}", json={"name": "v2", "version": 1}, headers=headers
+        )
+        stale = client.put(
+            f"/api/v1/workflows/{workflow_id}", json={"name": "v2b", "version": 1}, headers=headers
+        )
+
+        assert first.status_code == 200
+        assert first.json()["version"] == 2
+        assert [log["version"] for log in first.json()["update_logs"]] == [1, 2]
+        assert stale.status_code == 409
+        assert stale.json()["detail"]["current_version"] == 2
+
+    def test_shared_view(self, client, headers):
+        """Test that a shared workflow is readable anonymously by its token."""
+        workflow_id = self._create(client, headers, "public")["_id"]
+
+        token = client.post(f"/api/v1/workflows/{workflow_id}/share", headers=headers).json()[
+            "share_token"
+        ]
+        response = client.get(f"/api/v1/workflows/shared/{token}")
+
+        assert response.status_code == 200
+        assert response.json()["name"] == "public"
+        assert client.get("/api/v1/workflows/shared/unknown").status_code == 404
@@ -0,0 +1,81 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.main import app
+
+
+class TestQueryBudgets:
+    """Database commands per endpoint; raising a budget should be a deliberate change."""
+
+    @pytest.fixture
+    def client(self, memory_backend):
+        with TestClient(app) as client:
+            yield client
+
+    @pytest.fixture
+    def headers(self, client):
+        response = client.post(
+            "/api/v1/auth/register", json={"username": "editor", "password": "password123"}
+        )
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    @pytest.fixture
+    def workflow_id(self, client, headers):
+        response = client.post(
+            "/api/v1/workflows/", json={"name": "draft", "nodes": [], "edges": []}, headers=headers
+        )
+        return response.json()["_id"]
+
+    def test_login(self, client, headers, query_budget):
+        """Test that login is one lookup (the user is not cached by password logins)."""
+        with query_budget(1):
+            client.post("/api/v1/auth/login", json={"username": "editor", "password": "password123"})
+
+    def test_workflow_reads(self, client, headers, workflow_id, query_budget):
+        """Test that listing and loading a workflow take one query each."""
+        with query_budget(1):
+            client.get("/api/v1/workflows/", headers=headers)
+            client.get(f"/api/v1/workflows/{workflow_id}", headers=headers)
+
+    def test_update_workflow(self, client, headers, workflow_id, query_budget):
+        """Test the autosave path: read, conditional update, read back."""
+        with query_budget(3):
+            response = client.put(
+                f"/api/v1/workflows/{workflow_id}",
+                json={"name": "saved", "version": 1},
+                headers=headers,
+            )
+        assert response.status_code == 200
+        assert 'db;dur=' in response.headers["server-timing"]
+
+    def test_shared_view(self, client, headers, workflow_id, query_budget):
+        """Test that an anonymous shared view is a single lookup by token."""
+        token = client.post(f"/api/v1/workflows/{workflow_id}/share", headers=headers).json()[
+            "share_token"
+        ]
+        with query_budget(1):
+            client.get(f"/api/v1/workflows/shared/{token}")
+
+    def test_create_user(self, client, query_budget):
+        """Test that an admin creating a user costs the admin lookup and one insert."""
+        admin = client.post("/api/v1/auth/login", json={"username": "admin", "password": "1234"})
+        headers = {"Authorization": f"Bearer {admin.json()['access_token']}"}
+
+        with query_budget(2):
+            response = client.post(
+                "/api/v1/users/",
+                json={"username": "newbie", "password": "password123"},
+                headers=headers,
+            )
+        assert response.status_code == 200
+
+    def test_budget_failure_names_the_commands(self, client, headers, query_budget):
+        """Test that an exceeded budget reports the endpoint and its commands."""
+        with pytest.raises(AssertionError, match=r"POST /api/v1/workflows/ sent 3 .*insert_one"):
+            with query_budget(2):
+                client.post("/api/v1/workflows/", json={"name": "x"}, headers=headers)
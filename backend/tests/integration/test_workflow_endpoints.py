@@ -28,6 +28,9 @@ class TestWorkflowEndpoints:
         db = MagicMock()
         db.users = MagicMock()
         db.workflows = MagicMock()
+        db.compiled_workflows.find_one = AsyncMock(return_value=None)
+        db.compiled_workflows.update_one = AsyncMock()
+        db.compiled_workflows.delete_many = AsyncMock()
         return db
 
     @pytest.fixture
@@ -304,3 +307,80 @@ class TestWorkflowEndpoints:
         assert response.status_code == 200
         data = response.json()
         assert data["name"] == "Shared Workflow"
+
+    def test_get_workflow_subgraph(self, client, mock_db, auth_token):
+        """Test getting the upstream part of a workflow."""
+        workflow_id = "507f1f77bcf86cd799439015"
+        mock_db.workflows.find_one = AsyncMock(
+            return_value={
+                "_id": ObjectId(workflow_id),
+                "name": "Graph Workflow",
+                "owner_id": "507f1f77bcf86cd799439011",
+                "nodes": [
+                    {"id": "input", "type": "userinput", "label": "Input"},
+                    {"id": "agent", "type": "agent", "label": "Agent"},
+                    {"id": "output", "type": "finaloutput", "label": "Output"},
+                ],
+                "edges": [
+                    {"id": "e1", "source": "input", "target": "agent"},
+                    {"id": "e2", "source": "agent", "target": "output"},
+                ],
+                "created_at": datetime.utcnow(),
+            }
+        )
+
+        response = client.get(
+            f"/api/v1/workflows/{workflow_id}/subgraph",
+            params={"node": "agent", "direction": "up"},
+            headers={"Authorization": f"Bearer {auth_token}"},
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [node["id"] for node in data["nodes"]] == ["input", "agent"]
+        assert [edge["id"] for edge in data["edges"]] == ["e1"]
+
+        response = client.get(
+            f"/api/v1/workflows/{workflow_id}/subgraph",
+            params={"node": "missing"},
+            headers={"Authorization": f"Bearer {auth_token}"},
+        )
+        assert response.status_code == 404
+
+    def test_export_workflow_with_plan(self, client, mock_db, auth_token):
+        """Test exporting a workflow with its execution plan."""
+        workflow_id = "507f1f77bcf86cd799439016"
+        mock_db.workflows.find_one = AsyncMock(
+            return_value={
+                "_id": ObjectId(workflow_id),
+                "name": "Plan Workflow",
+                "owner_id": "507f1f77bcf86cd799439011",
+                "nodes": [
+                    {"id": "input", "type": "userinput", "label": "Input"},
+                    {"id": "a", "type": "agent", "label": "A"},
+                    {"id": "b", "type": "agent", "label": "B"},
+                ],
+                "edges": [
+                    {"id": "e1", "source": "input", "target": "a"},
+                    {"id": "e2", "source": "input", "target": "b"},
+                ],
+                "created_at": datetime.utcnow(),
+            }
+        )
+
+        response = client.get(
+            f"/api/v1/workflows/{workflow_id}/export",
+            headers={"Authorization": f"Bearer {auth_token}"},
+        )
+        assert response.status_code == 200
+        assert "execution_plan" not in response.json()
+
+        response = client.get(
+            f"/api/v1/workflows/{workflow_id}/export",
+            params={"include_plan": True},
+            headers={"Authorization": f"Bearer {auth_token}"},
+        )
+        assert response.status_code == 200
+        plan = response.json()["execution_plan"]
+        assert plan["stages"] == [["input"], ["a", "b"]]
+        assert plan["nodes"]["input"]["fan_out"] == 2
@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.core.admission import AdmissionController
+
+
+async def hold(controller, client, order, release):
+    async with controller.slot(client):
+        order.append(client)
+        await release.wait()
+
+
+class TestAdmissionController:
+    """Test suite for password-hashing admission control."""
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_queue_full(self):
+        """Test fast 503 with Retry-After once the wait queue is full."""
+        controller = AdmissionController(limit=1, queue_size=1, per_client_queue=1, retry_after=3)
+        release = asyncio.Event()
+        order = []
+        tasks = [asyncio.create_task(hold(controller, f"c{i}", order, release)) for i in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as exc_info:
+            async with controller.slot("c2"):
+                pass
+
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.headers["Retry-After"] == "3"
+        release.set()
+        await asyncio.gather(*tasks)
+        assert controller.stats() == {"active": 0, "waiting": 0, "rejected": 1}
+
+    @pytest.mark.asyncio
+    async def test_per_client_limit(self):
+        """Test that one client cannot fill the shared queue."""
+        controller = AdmissionController(limit=1, queue_size=10, per_client_queue=1)
+        release = asyncio.Event()
+        order = []
+        tasks = [asyncio.create_task(hold(controller, "flood", order, release)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException):
+            async with controller.slot("flood"):
+                pass
+        tasks.append(asyncio.create_task(hold(controller, "other", order, release)))
+        await asyncio.sleep(0)
+
+        assert controller.waiting == 2
+        release.set()
+        await asyncio.gather(*tasks)
+
+    @pytest.mark.asyncio
+    async def test_round_robin_across_clients(self):
+        """Test that queued clients are served in turn, not first-come."""
+        controller = AdmissionController(limit=1, queue_size=10, per_client_queue=10)
+        release = asyncio.Event()
+        order = []
+        clients = ["first", "flood", "flood", "flood", "quiet"]
+        tasks = []
+        for client in clients:
+            tasks.append(asyncio.create_task(hold(controller, client, order, release)))
+            await asyncio.sleep(0)
+
+        release.set()
+        await asyncio.gather(*tasks)
+
+        assert order == ["first", "flood", "quiet", "flood", "flood"]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        """Test that a cancelled waiter does not leak a slot or queue entry."""
+        controller = AdmissionController(limit=1, queue_size=10, per_client_queue=10)
+        release = asyncio.Event()
+        order = []
+        holder = asyncio.create_task(hold(controller, "a", order, release))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold(controller, "b", order, release))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        release.set()
+        await holder
+
+        assert controller.stats()["active"] == 0
+        assert controller.stats()["waiting"] == 0
@@ -0,0 +1,72 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.services.audit import audit_workflow, audit_workflows
+
+
+def agent(node_id, developer_message, input_keys, prompts=None):
+    return {
+        "id": node_id,
+        "type": "agent",
+        "label": node_id,
+        "properties": {
+            "connected_inputs": [{"nodeId": "input", "outputKey": key} for key in input_keys],
+            "parameters": {"developer_message": developer_message, "prompts": prompts or []},
+        },
+    }
+
+
+class TestPlaceholderAudit:
+    """Test suite for the bulk placeholder audit."""
+
+    def test_unresolved_and_unused(self):
+        """Test that unknown tokens and unreferenced inputs are reported."""
+        report = audit_workflow(
+            {
+                "_id": "wf1",
+                "name": "Audit",
+                "nodes": [agent("a", "Use $$topic$$ and $$missing$$", ["topic", "extra"])],
+            }
+        )
+
+        (finding,) = report["nodes"]
+        assert report["workflow_id"] == "wf1"
+        assert finding["unresolved_tokens"] == ["missing"]
+        assert finding["unused_inputs"] == ["extra"]
+
+    def test_prompt_contexts_count_as_usage(self):
+        """Test that tokens in prompt contexts resolve inputs too."""
+        report = audit_workflow(
+            {
+                "_id": "wf2",
+                "nodes": [
+                    agent("a", "No tokens", ["topic"], prompts=[{"type": "user", "content": "$$topic$$"}])
+                ],
+            }
+        )
+
+        assert report["nodes"] == []
+
+    def test_nodes_without_inputs_or_message_pass(self):
+        """Test that, as in the editor, empty inputs or an empty message are not checked."""
+        report = audit_workflow(
+            {
+                "_id": "wf4",
+                "nodes": [
+                    agent("a", "Use $$topic$$", []),
+                    agent("b", "", ["topic"], prompts=[{"type": "user", "content": "$$other$$"}]),
+                ],
+            }
+        )
+
+        assert report["nodes"] == []
+
+    def test_non_agent_nodes_skipped(self):
+        """Test that only agent nodes are scanned."""
+        reports = audit_workflows(
+            [{"_id": "wf3", "nodes": [{"id": "in", "type": "userinput", "properties": {}}]}]
+        )
+
+        assert reports[0]["nodes"] == []
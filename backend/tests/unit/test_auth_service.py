@@ -241,3 +241,114 @@ class TestAuthService:
 
         decoded = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         assert decoded["sub"] == special_username
+
+    @pytest.mark.asyncio
+    async def test_get_current_user_cached(self, auth_service, mock_db, sample_user):
+        """Test that repeated authentication is served from the user cache."""
+        from unittest.mock import AsyncMock
+        from fastapi.security import HTTPAuthorizationCredentials
+        from app.services.auth import invalidate_cached_user
+
+        mock_db.users.find_one = AsyncMock(return_value=dict(sample_user))
+        token = auth_service.create_access_token({"sub": "testuser"})
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+        first = await auth_service.get_current_user(credentials)
+        second = await auth_service.get_current_user(credentials)
+
+        assert second is first
+        assert mock_db.users.find_one.call_count == 1
+
+        # Writes through UserService invalidate by id
+        invalidate_cached_user(user_id=first.id)
+        mock_db.users.find_one.return_value = dict(sample_user)
+        await auth_service.get_current_user(credentials)
+        assert mock_db.users.find_one.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_stateless_mode_trusts_claims(
+        self, auth_service, mock_db, sample_user, monkeypatch
+    ):
+        """Test that stateless access tokens authenticate without a database read."""
+        from unittest.mock import AsyncMock
+        from fastapi.security import HTTPAuthorizationCredentials
+
+        monkeypatch.setattr(settings, "AUTH_STATELESS", True)
+        mock_db.users.find_one = AsyncMock(return_value=dict(sample_user))
+        auth_service.verify_and_update_password_async = AsyncMock(return_value=(True, None))
+
+        token = await auth_service.authenticate_user("testuser", "TestPassword123!")
+        assert token.refresh_token is not None
+        mock_db.users.find_one.reset_mock()
+
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token.access_token)
+        user = await auth_service.get_current_user(credentials)
+
+        assert user.username == "testuser"
+        assert user.id == str(sample_user["_id"])
+        assert user.email == sample_user["email"]
+        mock_db.users.find_one.assert_not_called()
+
+        # Refresh tokens are not accepted as access tokens
+        assert auth_service.decode_token(token.refresh_token) is None
+
+    @pytest.mark.asyncio
+    async def test_refresh_rechecks_user(self, auth_service, mock_db, sample_user, monkeypatch):
+        """Test that refreshing re-reads the user and refuses deactivated accounts."""
+        from unittest.mock import AsyncMock
+
+        monkeypatch.setattr(settings, "AUTH_STATELESS", True)
+        refresh_token = auth_service.create_access_token({"sub": "testuser", "typ": "refresh"})
+
+        mock_db.users.find_one = AsyncMock(return_value=dict(sample_user))
+        refreshed = await auth_service.refresh_user_tokens(refresh_token)
+        assert refreshed is not None
+        assert refreshed.user.username == "testuser"
+
+        mock_db.users.find_one = AsyncMock(return_value={**sample_user, "is_active": False})
+        assert await auth_service.refresh_user_tokens(refresh_token) is None
+
+        # Access tokens cannot be used to refresh
+        access_token = auth_service.create_access_token({"sub": "testuser"})
+        assert await auth_service.refresh_user_tokens(access_token) is None
+
+    @pytest.mark.asyncio
+    async def test_login_rehashes_outdated_password(self, auth_service, mock_db, sample_user):
+        """Test that a hash with an outdated cost is upgraded on successful login."""
+        from unittest.mock import AsyncMock
+        from app.services.auth import build_password_context, pwd_context
+
+        old_hash = build_password_context("bcrypt", bcrypt_rounds=4).hash("secret123")
+        outdated_user = {**sample_user, "hashed_password": old_hash}
+        mock_db.users.find_one = AsyncMock(return_value=outdated_user)
+
+        result = await auth_service.authenticate_user("testuser", "secret123")
+
+        assert result is not None
+        mock_db.users.update_one.assert_called_once()
+        new_hash = mock_db.users.update_one.call_args[0][1]["$set"]["hashed_password"]
+        assert pwd_context.verify("secret123", new_hash)
+        assert not pwd_context.needs_update(new_hash)
+
+        # Current hashes are left alone
+        mock_db.users.update_one.reset_mock()
+        mock_db.users.find_one = AsyncMock(return_value=sample_user)
+        await auth_service.authenticate_user("testuser", "secret123")
+        mock_db.users.update_one.assert_not_called()
+
+    def test_argon2_context_upgrades_bcrypt(self):
+        """Test that switching to argon2 keeps bcrypt hashes valid but marks them outdated."""
+        pytest.importorskip("argon2")
+        from app.services.auth import build_password_context
+
+        bcrypt_hash = build_password_context("bcrypt", bcrypt_rounds=4).hash("secret123")
+        context = build_password_context("argon2", argon2_time_cost=1, argon2_memory_cost=1024)
+
+        verified, new_hash = context.verify_and_update("secret123", bcrypt_hash)
+
+        assert verified is True
+        assert new_hash.startswith("$argon2id$")
+        assert not context.needs_update(new_hash)
+        assert context.needs_update(
+            build_password_context("argon2", argon2_time_cost=2, argon2_memory_cost=1024).hash("x")
+        )
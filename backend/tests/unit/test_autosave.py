@@ -0,0 +1,255 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import pytest
+from fastapi import HTTPException
+from app.core.config import settings
+from app.models.workflow import WorkflowCreate, WorkflowUpdate
+from pymongo.errors import AutoReconnect
+from app.services import compiler as compiler_module
+from app.services import graph as graph_module
+from app.services import workflow as workflow_module
+from app.services.autosave import MAX_FLUSH_ATTEMPTS, WorkflowSaveBuffer, workflow_saves
+from app.services.compiler import WorkflowCompiler
+from app.services.workflow import WorkflowService
+
+
+@pytest.fixture
+def buffer(monkeypatch):
+    """A fresh save buffer with a window long enough that only explicit flushes write."""
+    monkeypatch.setattr(settings, "WORKFLOW_SAVE_COALESCE_MS", 60_000)
+    save_buffer = WorkflowSaveBuffer()
+    for module in (workflow_module, graph_module, compiler_module):
+        monkeypatch.setattr(module, "save_buffer", save_buffer)
+    yield save_buffer
+    for workflow_id in list(save_buffer._pending):
+        save_buffer.discard(workflow_id)
+
+
+@pytest.fixture
+def service(memory_db):
+    """Workflow service on the in-memory database, counting update_one calls."""
+    service = WorkflowService(memory_db)
+    service.collection.update_one = AsyncMock(wraps=service.collection.update_one)
+    return service
+
+
+async def _create(service) -> str:
+    workflow = await service.create_workflow(
+        WorkflowCreate(name="draft"), owner_id="u1", username="alice"
+    )
+    return str(workflow.id)
+
+
+class TestWorkflowSaveBuffer:
+    """Test suite for write-behind coalescing of workflow saves."""
+
+    @pytest.mark.asyncio
+    async def test_consecutive_saves_become_one_write(self, buffer, service, memory_db):
+        """Test that one author's saves are merged, versioned as if written through."""
+        workflow_id = await _create(service)
+
+        versions = []
+        for version in range(1, 11):
+            saved = await service.update_workflow(
+                workflow_id,
+                WorkflowUpdate(name=f"draft {version}", version=version),
+                current_username="alice",
+            )
+            versions.append(saved.version)
+
+        assert versions == list(range(2, 12))
+        assert service.collection.update_one.await_count == 0
+        assert (await service.get_workflow(workflow_id)).name == "draft 10"
+
+        await buffer.flush(workflow_id)
+
+        stored = await memory_db.workflows.find_one({})
+        assert service.collection.update_one.await_count == 1
+        assert stored["version"] == 11
+        assert stored["name"] == "draft 10"
+        assert [log["version"] for log in stored["update_logs"]] == [1, 11]
+
+    @pytest.mark.asyncio
+    async def test_stale_version_conflicts_with_buffered_state(self, buffer, service):
+        """Test that optimistic locking checks against the buffered version."""
+        workflow_id = await _create(service)
+        await service.update_workflow(
+            workflow_id, WorkflowUpdate(name="a", version=1), current_username="alice"
+        )
+
+        with pytest.raises(HTTPException) as error:
+            await service.update_workflow(
+                workflow_id, WorkflowUpdate(name="b", version=1), current_username="alice"
+            )
+
+        assert error.value.status_code == 409
+        assert error.value.detail["current_version"] == 2
+
+    @pytest.mark.asyncio
+    async def test_other_author_flushes_first(self, buffer, service, memory_db):
+        """Test that a different author's save writes the buffered saves before joining."""
+        workflow_id = await _create(service)
+        for version in (1, 2):
+            await service.update_workflow(
+                workflow_id, WorkflowUpdate(name="alice", version=version), current_username="alice"
+            )
+
+        saved = await service.update_workflow(
+            workflow_id, WorkflowUpdate(description="bob", version=3), current_username="bob"
+        )
+
+        stored = await memory_db.workflows.find_one({})
+        assert stored["version"] == 3
+        assert saved.version == 4
+        assert (saved.name, saved.description, saved.last_modified_by) == ("alice", "bob", "bob")
+
+    @pytest.mark.asyncio
+    async def test_other_author_builds_on_what_was_written(self, buffer, service, memory_db):
+        """Test that a save joining after a dropped flush starts from the stored workflow."""
+        workflow_id = await _create(service)
+        await service.update_workflow(
+            workflow_id, WorkflowUpdate(name="alice", version=1), current_username="alice"
+        )
+        await memory_db.workflows.update_one({}, {"$set": {"name": "other", "version": 5}})
+
+        saved = await service.update_workflow(
+            workflow_id, WorkflowUpdate(description="bob", version=2), current_username="bob"
+        )
+
+        assert (saved.version, saved.name, saved.description) == (6, "other", "bob")
+        await buffer.flush(workflow_id)
+        stored = await memory_db.workflows.find_one({})
+        assert (stored["version"], stored["description"]) == (6, "bob")
+
+    @pytest.mark.asyncio
+    async def test_window_flushes_automatically(self, buffer, service, memory_db, monkeypatch):
+        """Test that buffered saves are written when the window closes."""
+        monkeypatch.setattr(settings, "WORKFLOW_SAVE_COALESCE_MS", 10)
+        workflow_id = await _create(service)
+        await service.update_workflow(
+            workflow_id, WorkflowUpdate(name="saved", version=1), current_username="alice"
+        )
+
+        await asyncio.sleep(0.05)
+
+        assert (await memory_db.workflows.find_one({}))["name"] == "saved"
+        assert buffer.pending_view(workflow_id) is None
+
+    @pytest.mark.asyncio
+    async def test_changed_underneath_drops_saves(self, buffer, service, memory_db):
+        """Test that a merged write failing its version check is dropped, not forced."""
+        workflow_id = await _create(service)
+        await service.update_workflow(
+            workflow_id, WorkflowUpdate(name="buffered", version=1), current_username="alice"
+        )
+        await memory_db.workflows.update_one({}, {"$set": {"name": "other", "version": 5}})
+        dropped = workflow_saves.snapshot().get(("dropped",), 0)
+
+        await buffer.flush_all()
+
+        assert (await memory_db.workflows.find_one({}))["name"] == "other"
+        assert workflow_saves.snapshot()[("dropped",)] == dropped + 1
+
+        # The author learns on their next save, once
+        with pytest.raises(HTTPException) as error:
+            await service.update_workflow(
+                workflow_id, WorkflowUpdate(name="again", version=2), current_username="alice"
+            )
+        assert error.value.status_code == 409
+        assert "1 saves were not stored" in error.value.detail["message"]
+        assert error.value.detail["current_version"] == 5
+        saved = await service.update_workflow(
+            workflow_id, WorkflowUpdate(name="again", version=5), current_username="alice"
+        )
+        assert saved.version == 6
+
+    @pytest.mark.asyncio
+    async def test_failed_write_is_buffered_again(self, buffer, service, memory_db):
+        """Test that a write that raises keeps the saves buffered and retries them."""
+        workflow_id = await _create(service)
+        await service.update_workflow(
+            workflow_id, WorkflowUpdate(name="kept", version=1), current_username="alice"
+        )
+        write = service.collection.update_one.side_effect
+        service.collection.update_one.side_effect = [AutoReconnect("primary stepped down")]
+
+        with pytest.raises(AutoReconnect):
+            await buffer.flush(workflow_id)
+        assert (await service.get_workflow(workflow_id)).name == "kept"
+
+        service.collection.update_one.side_effect = write
+        await buffer.flush(workflow_id)
+
+        stored = await memory_db.workflows.find_one({})
+        assert (stored["name"], stored["version"]) == ("kept", 2)
+
+    @pytest.mark.asyncio
+    async def test_timer_write_failures_are_reported(self, buffer, service, memory_db, monkeypatch):
+        """Test that saves whose background writes keep failing are reported to the author."""
+        monkeypatch.setattr(settings, "WORKFLOW_SAVE_COALESCE_MS", 5)
+        workflow_id = await _create(service)
+        await service.update_workflow(
+            workflow_id, WorkflowUpdate(name="lost", version=1), current_username="alice"
+        )
+        service.collection.update_one.side_effect = AutoReconnect("no primary")
+
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if buffer.pending_view(workflow_id) is None and not buffer._flushing:
+                break
+
+        assert service.collection.update_one.await_count == MAX_FLUSH_ATTEMPTS
+        failed = buffer.take_failure(workflow_id, "alice")
+        assert failed.saves == 1 and "could not be written" in failed.reason
+
+    @pytest.mark.asyncio
+    async def test_disabled_with_several_workers(self, buffer, service, monkeypatch):
+        """Test that the per-process buffer is not used when there are several workers."""
+        monkeypatch.setattr(settings, "WEB_CONCURRENCY", 2)
+        workflow_id = await _create(service)
+
+        await service.update_workflow(
+            workflow_id, WorkflowUpdate(name="direct", version=1), current_username="alice"
+        )
+
+        assert service.collection.update_one.await_count == 1
+        assert buffer.pending_view(workflow_id) is None
+
+    @pytest.mark.asyncio
+    async def test_write_through_conflict_is_not_counted(self, buffer, service, monkeypatch):
+        """Test that a write-through save losing its version check is not counted as written."""
+        monkeypatch.setattr(settings, "WEB_CONCURRENCY", 2)
+        workflow_id = await _create(service)
+        service.collection.update_one = AsyncMock(return_value=AsyncMock(modified_count=0))
+        written = workflow_saves.snapshot().get(("written",), 0)
+
+        with pytest.raises(HTTPException) as error:
+            await service.update_workflow(
+                workflow_id, WorkflowUpdate(name="lost", version=1), current_username="alice"
+            )
+
+        assert error.value.status_code == 409
+        assert workflow_saves.snapshot().get(("written",), 0) == written
+
+    @pytest.mark.asyncio
+    async def test_buffered_versions_are_not_compiled_into_caches(
+        self, buffer, service, memory_db
+    ):
+        """Test that artifacts for a version that only exists in the buffer are not kept."""
+        workflow_id = await _create(service)
+        view = await service.update_workflow(
+            workflow_id, WorkflowUpdate(name="buffered", version=1), current_username="alice"
+        )
+
+        compiled = await WorkflowCompiler(memory_db).get_compiled(view)
+
+        assert compiled.version == 2
+        assert await memory_db.compiled_workflows.count_documents({}) == 0
+        assert compiler_module._compiled_cache.get((workflow_id, 2)) is None
+        assert graph_module._index_cache.get((workflow_id, 2)) is None
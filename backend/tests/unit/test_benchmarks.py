@@ -0,0 +1,97 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import pytest
+from benchmarks.report import (
+    ScenarioResult,
+    baseline_mismatches,
+    host_info,
+    load_baseline,
+    regressions,
+    save_baseline,
+)
+from benchmarks.runner import BenchmarkConfig, run_benchmark
+
+
+class TestBenchmarks:
+    """Test suite for the load-testing harness."""
+
+    def test_percentiles(self):
+        """Test that percentiles and throughput are computed from the latencies."""
+        result = ScenarioResult.from_latencies([i / 1000 for i in range(1, 101)], 2, 10.0)
+
+        assert (result.requests, result.errors, result.throughput) == (100, 2, 10.0)
+        assert result.p50_ms == pytest.approx(50.5)
+        assert result.p99_ms == pytest.approx(99.01)
+
+    def test_regressions_against_baseline(self, tmp_path):
+        """Test that slower p95 or lower throughput beyond the tolerance is reported."""
+        path = tmp_path / "baseline.json"
+        baseline = ScenarioResult(100, 0, 50.0, 5.0, 10.0, 20.0)
+        save_baseline("memory", {"get": baseline, "list": baseline}, {}, path=path)
+
+        results = {
+            "get": ScenarioResult(100, 0, 48.0, 5.0, 11.0, 20.0),
+            "list": ScenarioResult(100, 0, 30.0, 5.0, 15.0, 20.0),
+        }
+        found = regressions(results, load_baseline("memory", path=path), tolerance=0.25)
+
+        assert found == ["list: p95 15.00 ms vs 10.00 ms", "list: 30.0 req/s vs 50.0 req/s"]
+
+    def test_errors_are_regressions(self, tmp_path):
+        """Test that errors beyond the baseline's count fail, with or without a baseline."""
+        path = tmp_path / "baseline.json"
+        save_baseline("memory", {"get": ScenarioResult(100, 1, 50.0, 5.0, 10.0, 20.0)}, {}, path)
+        results = {
+            "get": ScenarioResult(100, 2, 50.0, 5.0, 10.0, 20.0),
+            "login": ScenarioResult(10, 1, 5.0, 5.0, 10.0, 20.0),
+        }
+
+        found = regressions(results, load_baseline("memory", path=path), tolerance=0.25)
+
+        assert found == ["get: 2 errors vs 1", "login: 1 errors vs 0"]
+        assert regressions(results, {}, tolerance=0.25) == [
+            "get: 2 errors vs 0",
+            "login: 1 errors vs 0",
+        ]
+
+    def test_baseline_from_another_host_or_config(self, tmp_path):
+        """Test that a baseline recorded elsewhere or with other options is flagged."""
+        path = tmp_path / "baseline.json"
+        config = BenchmarkConfig().as_dict()
+        save_baseline("memory", {}, config, path=path)
+        baseline = load_baseline("memory", path=path)
+
+        assert baseline["host"] == host_info()
+        assert baseline_mismatches(baseline, config) == []
+        assert baseline_mismatches(baseline, {**config, "users": 1}) == [
+            f"config users: {config['users']!r} in baseline, 1 here"
+        ]
+        moved = {**baseline, "host": {**baseline["host"], "cpus": -1}}
+        assert baseline_mismatches(moved, config) == [
+            f"host cpus: -1 in baseline, {host_info()['cpus']!r} here"
+        ]
+        unrecorded = {key: value for key, value in baseline.items() if key != "host"}
+        assert baseline_mismatches(unrecorded, config) == [
+            "baseline does not record the host it was measured on"
+        ]
+
+    @pytest.mark.asyncio
+    async def test_smoke_run(self, memory_backend):
+        """Test that a small mixed workload runs end to end with expected statuses."""
+        config = BenchmarkConfig(
+            users=2,
+            requests_per_user=15,
+            warmup_per_user=0,
+            workflows_per_user=2,
+            nodes_per_workflow=5,
+            share_ratio=1.0,
+            mix={"list": 1, "get": 1, "autosave": 1, "conflicting_save": 1, "shared_view": 1},
+        )
+
+        results = await run_benchmark(config)
+
+        assert results["all"].requests == 30
+        assert results["all"].errors == 0
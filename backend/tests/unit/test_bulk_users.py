@@ -0,0 +1,134 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from pymongo.errors import BulkWriteError
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.services import user as user_module
+from app.services.auth import pwd_context
+from app.services.bulk_users import hash_passwords_parallel, parse_user_rows
+
+
+async def fake_hash(passwords):
+    return [f"hashed-{password}" for password in passwords]
+
+
+class TestBulkUsers:
+    """Test suite for bulk user provisioning."""
+
+    def test_parse_csv(self):
+        """Test CSV parsing with blank cells and invalid rows reported by line."""
+        text = (
+            "username,password,email,role\n"
+            "alice,secret1,alice@example.com,admin\n"
+            "bob,secret2,,\n"
+            "x,secret3,,\n"
+        )
+        users, errors = parse_user_rows(text, "csv")
+
+        assert [(row, user.username) for row, user in users] == [(2, "alice"), (3, "bob")]
+        assert users[0][1].role == "admin"
+        assert users[1][1].email is None
+        assert [(error.row, error.username) for error in errors] == [(4, "x")]
+
+    def test_parse_ndjson(self):
+        """Test NDJSON parsing with malformed lines."""
+        text = '{"username": "alice", "password": "pw"}\n\nnot json\n["list"]\n'
+        users, errors = parse_user_rows(text, "ndjson")
+
+        assert [(row, user.username) for row, user in users] == [(1, "alice")]
+        assert [error.row for error in errors] == [3, 4]
+        assert errors[0].detail.startswith("Invalid JSON")
+
+    def test_non_string_usernames_are_reported(self):
+        """Test that a row whose username is not a string is reported, not raised."""
+        text = '{"username": 5, "password": "pw"}\n{"username": null, "password": "pw"}\n'
+        users, errors = parse_user_rows(text, "ndjson")
+
+        assert users == []
+        assert [(error.row, error.username) for error in errors] == [(1, "5"), (2, None)]
+
+    @pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+    def test_parsing_stops_past_max_rows(self, fmt):
+        """Test that parsing stops after one row more than the limit."""
+        if fmt == "csv":
+            text = "username,password\n" + "".join(f"user{i},pw\n" for i in range(10))
+        else:
+            text = "".join(f'{{"username": "user{i}", "password": "pw"}}\n' for i in range(10))
+        users, errors = parse_user_rows(text, fmt, max_rows=3)
+
+        assert len(users) == 4
+        assert errors == []
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_rejects_conflicts(self, user_service, mock_db, monkeypatch):
+        """Test that duplicates within the upload are rejected before hashing."""
+        monkeypatch.setattr(user_module, "hash_passwords_parallel", fake_hash)
+        users, _ = parse_user_rows(
+            "username,password,email\n"
+            "alice,pw,shared@example.com\n"
+            "alice,pw,\n"
+            "bob,pw,shared@example.com\n"
+            "carol,pw,\n",
+            "csv",
+        )
+        mock_db.users.insert_many = AsyncMock(
+            return_value=MagicMock(inserted_ids=["id1", "id2"])
+        )
+
+        result = await user_service.bulk_create_users(users)
+
+        documents = mock_db.users.insert_many.call_args[0][0]
+        assert [doc["username"] for doc in documents] == ["alice", "carol"]
+        assert documents[0]["hashed_password"] == "hashed-pw"
+        assert "password" not in documents[0]
+        assert mock_db.users.insert_many.call_args.kwargs["ordered"] is False
+        assert result.created == 2
+        assert [(error.row, error.detail) for error in result.errors] == [
+            (3, "Username already registered"),
+            (4, "Email already registered"),
+        ]
+        mock_db.users.find.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_maps_write_errors_to_rows(self, user_service, mock_db, monkeypatch):
+        """Test that unique-index violations are reported against their rows."""
+        monkeypatch.setattr(user_module, "hash_passwords_parallel", fake_hash)
+        users, _ = parse_user_rows(
+            '{"username": "alice", "password": "pw"}\n{"username": "bob", "password": "pw"}\n',
+            "ndjson",
+        )
+        mock_db.users.insert_many = AsyncMock(
+            side_effect=BulkWriteError(
+                {
+                    "nInserted": 1,
+                    "writeErrors": [
+                        {
+                            "index": 1,
+                            "code": 11000,
+                            "keyValue": {"username": "bob"},
+                            "errmsg": "E11000 duplicate key error",
+                        }
+                    ],
+                }
+            )
+        )
+
+        result = await user_service.bulk_create_users(users)
+
+        assert result.created == 1
+        assert result.failed == 1
+        assert (result.errors[0].row, result.errors[0].username) == (2, "bob")
+        assert result.errors[0].detail == "Username already registered"
+
+    @pytest.mark.asyncio
+    async def test_parallel_hashing(self):
+        """Test that passwords hashed in the process pool verify in this process."""
+        passwords = ["first", "second", "third"]
+        hashed = await hash_passwords_parallel(passwords)
+
+        assert len(hashed) == 3
+        assert all(pwd_context.verify(p, h) for p, h in zip(passwords, hashed))
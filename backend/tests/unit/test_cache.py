@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.core import cache as cache_module
+from app.core.cache import LRUCache, TTLCache
+
+
+class TestCaches:
+    """Test suite for the in-process caches."""
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted."""
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert "a" in cache
+        assert "b" not in cache
+        assert cache.stats()["hits"] == 1
+
+    def test_ttl_expiry(self, monkeypatch):
+        """Test that entries expire after the TTL."""
+        now = [100.0]
+        monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+        cache = TTLCache(maxsize=10, ttl=5)
+        cache.set("user", "value")
+
+        assert cache.get("user") == "value"
+        now[0] += 5
+        assert cache.get("user") is None
+        assert cache.stats() == {
+            "size": 0, "maxsize": 10, "hits": 1, "misses": 1, "hit_ratio": 0.5
+        }
+
+    def test_zero_ttl_disables(self):
+        """Test that a zero TTL never stores entries."""
+        cache = TTLCache(maxsize=10, ttl=0)
+        cache.set("user", "value")
+
+        assert len(cache) == 0
@@ -0,0 +1,116 @@
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.models.workflow import Workflow
+from app.services.compiler import COMPILER_VERSION, WorkflowCompiler, compile_workflow
+
+
+@pytest.fixture
+def workflow():
+    """User input feeding an agent whose prompt references one unknown token."""
+    return Workflow(
+        _id=str(ObjectId()),
+        name="Compiled Workflow",
+        owner_id="507f1f77bcf86cd799439011",
+        version=3,
+        nodes=[
+            {
+                "id": "input",
+                "type": "userinput",
+                "label": "User Input",
+                "properties": {"name": "Question", "outputs": [{"key": "question", "type": "string"}]},
+            },
+            {
+                "id": "agent",
+                "type": "agent",
+                "label": "Agent",
+                "properties": {
+                    "parameters": {
+                        "developer_message": "Answer $$question$$ using $$context$$.",
+                        "prompts": [{"type": "user", "content": "Again: $$question$$"}],
+                    }
+                },
+            },
+        ],
+        edges=[{"id": "e1", "source": "input", "target": "agent", "sourceHandle": "output-question"}],
+    )
+
+
+class TestCompiler:
+    """Test suite for compiled workflow artifacts."""
+
+    def test_compile_workflow(self, workflow):
+        """Test that derived data is computed from nodes and edges."""
+        compiled = compile_workflow(workflow)
+
+        assert compiled.version == 3
+        assert compiled.compiler_version == COMPILER_VERSION
+        assert compiled.adjacency == {"input": ["agent"], "agent": []}
+        assert compiled.topological_order == ["input", "agent"]
+        assert compiled.placeholders == {"agent": ["question", "context"]}
+        (connected,) = compiled.connected_inputs["agent"]
+        assert connected.nodeName == "Question"
+        assert connected.outputKey == "question"
+
+    def test_structured_output_examples_become_json_text(self, workflow):
+        """Test that a non-string output example is stored as stable JSON text."""
+        workflow.nodes[0].properties["outputs"][0]["example"] = {"b": 1, "a": [2]}
+
+        (connected,) = compile_workflow(workflow).connected_inputs["agent"]
+
+        assert connected.outputExample == '{"a": [2], "b": 1}'
+
+    @pytest.mark.asyncio
+    async def test_get_compiled_stores_and_caches(self, mock_db, workflow):
+        """Test that a miss compiles once, stores the artifact and then serves from memory."""
+        compiler = WorkflowCompiler(mock_db)
+
+        first = await compiler.get_compiled(workflow)
+        second = await compiler.get_compiled(workflow)
+
+        assert second is first
+        mock_db.compiled_workflows.find_one.assert_called_once()
+        mock_db.compiled_workflows.update_one.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_get_compiled_from_side_collection(self, mock_db, workflow):
+        """Test that a stored artifact is used instead of recompiling."""
+        stored = compile_workflow(workflow).model_dump()
+        stored["_id"] = ObjectId()
+        stored["topological_order"] = ["from-store"]
+        mock_db.compiled_workflows.find_one.return_value = stored
+
+        next_version = workflow.model_copy(update={"version": 4})
+        compiled = await WorkflowCompiler(mock_db).get_compiled(next_version)
+
+        assert compiled.topological_order == ["from-store"]
+        mock_db.compiled_workflows.update_one.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_unique_index_drops_duplicate_artifacts(self, memory_db, workflow):
+        """Test that ensure_indexes clears racing duplicates, after which stores are unique."""
+        artifact = compile_workflow(workflow).model_dump()
+        await memory_db.compiled_workflows.insert_many([dict(artifact), dict(artifact)])
+        compiler = WorkflowCompiler(memory_db)
+
+        await compiler.ensure_indexes()
+        await compiler.get_compiled(workflow)
+        with pytest.raises(DuplicateKeyError):
+            await memory_db.compiled_workflows.insert_one(dict(artifact))
+
+        assert await memory_db.compiled_workflows.count_documents({}) == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_store_is_not_an_error(self, mock_db, workflow):
+        """Test that losing an upsert race to an identical artifact is ignored."""
+        mock_db.compiled_workflows.update_one.side_effect = DuplicateKeyError("E11000", 11000)
+
+        compiled = await WorkflowCompiler(mock_db).get_compiled(workflow)
+
+        assert compiled.version == 3
@@ -0,0 +1,195 @@
+from types import SimpleNamespace
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import bson
+import pytest
+from app.core import database as database_module
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram
+from app.core.tracing import RequestTrace
+
+
+class TestMetrics:
+    """Test suite for the in-process metrics."""
+
+    def test_histogram_buckets(self):
+        """Test that observations land in the first bucket whose bound covers them."""
+        histogram = Histogram("test_seconds", "test", labels=("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 5.0):
+            histogram.observe(value, "/a")
+        histogram.observe(0.2, "/b")
+
+        series = histogram.snapshot()
+        assert series[("/a",)]["buckets"] == [(0.1, 2), (1.0, 1)]
+        assert series[("/a",)]["overflow"] == 1
+        assert series[("/a",)]["count"] == 4
+        assert series[("/a",)]["sum"] == pytest.approx(5.65)
+        assert series[("/b",)]["count"] == 1
+
+    def test_counter(self):
+        """Test that counters accumulate per label combination."""
+        counter = Counter("test_total", "test", labels=("outcome",))
+        counter.inc("ok")
+        counter.inc("ok", amount=2)
+        counter.inc("error")
+
+        assert counter.snapshot() == {("ok",): 3, ("error",): 1}
+
+
+class TestDatabase:
+    """Test suite for the Mongo client setup."""
+
+    def test_client_options_from_settings(self, monkeypatch):
+        """Test that pool, timeout, compression and write concern settings are applied."""
+        monkeypatch.setattr(settings, "MONGODB_MAX_POOL_SIZE", 20)
+        monkeypatch.setattr(settings, "MONGODB_WAIT_QUEUE_TIMEOUT_MS", 500)
+        monkeypatch.setattr(settings, "MONGODB_COMPRESSORS", "zstd,zlib")
+        monkeypatch.setattr(settings, "MONGODB_WRITE_CONCERN", "2")
+
+        options = database_module.client_options()
+
+        assert options["maxPoolSize"] == 20
+        assert options["waitQueueTimeoutMS"] == 500
+        assert options["compressors"] == "zstd,zlib"
+        assert options["w"] == 2
+        assert "socketTimeoutMS" not in options
+
+    @pytest.mark.asyncio
+    async def test_single_client(self, monkeypatch):
+        """Test that the client is created once and recreated only after closing."""
+        monkeypatch.setattr(database_module, "client", None)
+        monkeypatch.setattr(database_module, "database", None)
+
+        db = database_module.get_database()
+        await database_module.connect_to_database()
+        client = database_module.client
+
+        assert database_module.get_database() is db
+        assert database_module.client is client
+
+        await database_module.close_database_connection()
+        assert database_module.client is None
+
+    @pytest.mark.asyncio
+    async def test_sqlite_backend(self, monkeypatch, tmp_path):
+        """Test that the sqlite backend opens an embedded database instead of a client."""
+        monkeypatch.setattr(database_module, "client", None)
+        monkeypatch.setattr(database_module, "database", None)
+        monkeypatch.setattr(settings, "STORAGE_BACKEND", "sqlite")
+        monkeypatch.setattr(settings, "SQLITE_PATH", str(tmp_path / "musashi.db"))
+
+        await database_module.connect_to_database()
+        db = database_module.get_database()
+        await db.workflows.insert_one({"name": "embedded"})
+
+        assert database_module.client is None
+        assert (await db.workflows.find_one({}))["name"] == "embedded"
+
+        await database_module.close_database_connection()
+        assert database_module.database is None
+
+    def test_command_listener_records_latency(self):
+        """Test that command durations are recorded by command and collection."""
+        listener = database_module.CommandLatencyListener()
+        key = {"connection_id": ("localhost", 27017), "request_id": 7}
+        listener.started(
+            SimpleNamespace(command_name="find", command={"find": "listener_test"}, **key)
+        )
+        listener.succeeded(SimpleNamespace(command_name="find", duration_micros=2500, **key))
+
+        series = database_module.mongo_command_seconds.snapshot()[
+            ("find", "listener_test", "success")
+        ]
+        assert series["count"] >= 1
+        assert series["sum"] >= 0.0025
+
+    def test_command_listener_reports_to_request_trace(self, monkeypatch):
+        """Test that commands sent inside observe_commands are counted, with payload sizes."""
+        monkeypatch.setattr(settings, "DB_TRACING_BYTES", True)
+        listener = database_module.CommandLatencyListener()
+        key = {"connection_id": ("localhost", 27017), "request_id": 8}
+        command = {"find": "workflows", "filter": {"owner_id": "u1"}}
+        reply = {"cursor": {"firstBatch": [{"name": "draft"}]}, "ok": 1}
+
+        with database_module.observe_commands(RequestTrace()) as trace:
+            listener.started(SimpleNamespace(command_name="find", command=command, **key))
+            listener.succeeded(
+                SimpleNamespace(command_name="find", duration_micros=1500, reply=reply, **key)
+            )
+        listener.started(SimpleNamespace(command_name="find", command=command, **key))
+
+        assert (trace.commands, trace.calls) == (1, ["find workflows"])
+        assert trace.bytes_sent == len(bson.encode(command))
+        assert trace.bytes_received == len(bson.encode(reply))
+        assert trace.server_timing(0.01).startswith('db;dur=1.5;desc="1 commands, ')
+
+
+class FakeSession:
+    """Stands in for a Motor client session."""
+
+    def __init__(self):
+        self.cluster_time = None
+        self.operation_time = None
+
+    def advance_cluster_time(self, cluster_time):
+        self.cluster_time = cluster_time
+
+    def advance_operation_time(self, operation_time):
+        self.operation_time = operation_time
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class TestReadRouting:
+    """Test suite for secondary reads and causal sessions."""
+
+    def test_secondary_reads_disabled_by_default(self):
+        """Test that collections are used as-is unless secondary reads are enabled."""
+        from unittest.mock import MagicMock
+
+        collection = MagicMock()
+        assert database_module.secondary_reads(collection) is collection
+        assert database_module.session_kwargs() == {}
+
+    def test_secondary_reads_use_staleness_bound(self, monkeypatch):
+        """Test that enabled secondary reads use secondaryPreferred with maxStaleness."""
+        from unittest.mock import MagicMock
+
+        monkeypatch.setattr(settings, "MONGODB_SECONDARY_READS", True)
+        collection = MagicMock()
+
+        database_module.secondary_reads(collection)
+
+        read_preference = collection.with_options.call_args.kwargs["read_preference"]
+        assert read_preference.mongos_mode == "secondaryPreferred"
+        assert read_preference.max_staleness == settings.MONGODB_MAX_STALENESS_SECONDS
+
+    @pytest.mark.asyncio
+    async def test_causal_session_carries_user_times(self, monkeypatch):
+        """Test that a user's next session continues from their previous one."""
+        from unittest.mock import AsyncMock, MagicMock
+
+        monkeypatch.setattr(settings, "MONGODB_SECONDARY_READS", True)
+        sessions = [FakeSession(), FakeSession()]
+        fake_client = MagicMock()
+        fake_client.start_session = AsyncMock(side_effect=sessions)
+        monkeypatch.setattr(database_module, "get_client", lambda: fake_client)
+
+        async with database_module.causal_session("user-1") as session:
+            assert database_module.session_kwargs() == {"session": session}
+            # A write in this session advances its times
+            session.cluster_time, session.operation_time = "cluster-1", "op-1"
+        assert database_module.session_kwargs() == {}
+
+        async with database_module.causal_session("user-1") as session:
+            assert (session.cluster_time, session.operation_time) == ("cluster-1", "op-1")
+
+        fake_client.start_session.assert_called_with(causal_consistency=True)
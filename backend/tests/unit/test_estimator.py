@@ -0,0 +1,117 @@
+import json
+import pytest
+from bson import ObjectId
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.core.config import settings
+from app.models.workflow import Workflow
+from app.services.estimator import estimate_workflow, load_profiles
+
+
+def agent(node_id, model, max_tokens, developer_message="", tools=None):
+    return {
+        "id": node_id,
+        "type": "agent",
+        "label": node_id,
+        "properties": {
+            "parameters": {
+                "model": model,
+                "max_tokens": max_tokens,
+                "developer_message": developer_message,
+                "tools": tools or [],
+            }
+        },
+    }
+
+
+@pytest.fixture
+def profiles_file(tmp_path, monkeypatch):
+    """Point the estimator at a small, predictable profile table."""
+    path = tmp_path / "profiles.json"
+    path.write_text(
+        json.dumps(
+            {
+                "models": {
+                    "fast": {"latency_ms": 100, "output_tokens_per_second": 1000,
+                             "input_cost_per_million": 1.0, "output_cost_per_million": 2.0},
+                    "slow": {"latency_ms": 1000, "output_tokens_per_second": 100,
+                             "input_cost_per_million": 10.0, "output_cost_per_million": 20.0},
+                },
+                "tools": {"web_search": 500},
+            }
+        )
+    )
+    monkeypatch.setattr(settings, "MODEL_PROFILES_PATH", str(path))
+    load_profiles.cache_clear()
+    yield path
+    load_profiles.cache_clear()
+
+
+@pytest.fixture
+def diamond_workflow():
+    """input -> fast & slow agents in parallel -> output."""
+    return Workflow(
+        _id=str(ObjectId()),
+        name="Diamond",
+        owner_id="507f1f77bcf86cd799439011",
+        nodes=[
+            {"id": "input", "type": "userinput", "label": "Input"},
+            agent("fast", "fast", 1000, developer_message="x" * 400),
+            agent("slow", "slow", 1000, tools=[{"type": "web_search", "enabled": True}]),
+            {"id": "output", "type": "finaloutput", "label": "Output"},
+        ],
+        edges=[
+            {"id": "e1", "source": "input", "target": "fast"},
+            {"id": "e2", "source": "input", "target": "slow"},
+            {"id": "e3", "source": "fast", "target": "output"},
+            {"id": "e4", "source": "slow", "target": "output"},
+        ],
+    )
+
+
+class TestEstimator:
+    """Test suite for the workflow latency and cost estimator."""
+
+    def test_critical_path_follows_slowest_branch(self, profiles_file, diamond_workflow):
+        """Test that the critical path goes through the slowest agent."""
+        result = estimate_workflow(diamond_workflow)
+
+        assert result.critical_path == ["input", "slow", "output"]
+        # 1000ms overhead + 1000 tokens at 100 tok/s + 500ms web search
+        assert result.critical_path_latency_ms == pytest.approx(11500)
+
+    def test_token_budget_and_cost(self, profiles_file, diamond_workflow):
+        """Test total token budget and cost per run."""
+        result = estimate_workflow(diamond_workflow)
+
+        assert result.total_input_tokens == 100
+        assert result.total_output_tokens == 2000
+        assert result.total_tokens == 2100
+        expected = (100 * 1.0 + 1000 * 2.0 + 1000 * 20.0) / 1_000_000
+        assert result.cost_per_run == pytest.approx(expected)
+
+    def test_dominant_nodes_flagged(self, profiles_file, diamond_workflow):
+        """Test that the node carrying most latency and cost is flagged."""
+        nodes = {node.node_id: node for node in estimate_workflow(diamond_workflow).nodes}
+
+        assert nodes["slow"].dominant is True
+        assert nodes["fast"].dominant is False
+        assert nodes["input"].latency_ms == 0
+
+    def test_unknown_model_uses_default(self, profiles_file):
+        """Test that unknown models fall back to the default profile."""
+        workflow = Workflow(
+            _id=str(ObjectId()),
+            name="Unknown",
+            owner_id="507f1f77bcf86cd799439011",
+            nodes=[agent("a", "not-a-model", 100)],
+        )
+
+        (node,) = estimate_workflow(workflow).nodes
+
+        assert node.unknown_model is True
+        assert node.latency_ms > 0
@@ -0,0 +1,164 @@
+import pytest
+from bson import ObjectId
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.models.workflow import TraversalDirection, Workflow
+from app.services.graph import extract_subgraph, get_execution_plan, get_graph_index
+
+
+def make_workflow(edges, node_ids=("input", "agent1", "agent2", "agent3", "output"), version=1):
+    # Indexes are cached by (id, version), so every fixture gets a fresh id
+    return Workflow(
+        _id=str(ObjectId()),
+        name="Graph Workflow",
+        owner_id="507f1f77bcf86cd799439011",
+        version=version,
+        nodes=[{"id": node_id, "type": "agent", "label": node_id} for node_id in node_ids],
+        edges=[
+            {"id": f"e{i}", "source": edge[0], "target": edge[1], **(edge[2] if len(edge) > 2 else {})}
+            for i, edge in enumerate(edges)
+        ],
+    )
+
+
+@pytest.fixture
+def chain_workflow():
+    """input -> agent1 -> agent2 -> output, with agent3 branching off agent1."""
+    return make_workflow(
+        [
+            ("input", "agent1"),
+            ("agent1", "agent2"),
+            ("agent2", "output"),
+            ("agent1", "agent3"),
+        ]
+    )
+
+
+class TestSubgraph:
+    """Test suite for server-side subgraph extraction."""
+
+    def test_downstream(self, chain_workflow):
+        """Test walking downstream from a node."""
+        result = extract_subgraph(chain_workflow, "agent1", TraversalDirection.DOWN)
+
+        assert {node.id for node in result.nodes} == {"agent1", "agent2", "agent3", "output"}
+        assert {edge.id for edge in result.edges} == {"e1", "e2", "e3"}
+
+    def test_upstream(self, chain_workflow):
+        """Test walking upstream from a node."""
+        result = extract_subgraph(chain_workflow, "agent2", TraversalDirection.UP)
+
+        assert {node.id for node in result.nodes} == {"input", "agent1", "agent2"}
+        assert {edge.id for edge in result.edges} == {"e0", "e1"}
+
+    def test_both_excludes_sibling_branches(self, chain_workflow):
+        """Test that 'both' is upstream plus downstream, not the whole component."""
+        result = extract_subgraph(chain_workflow, "agent2", TraversalDirection.BOTH)
+
+        assert {node.id for node in result.nodes} == {"input", "agent1", "agent2", "output"}
+
+    def test_depth_limit(self, chain_workflow):
+        """Test that depth bounds the number of hops."""
+        result = extract_subgraph(chain_workflow, "input", TraversalDirection.DOWN, depth=1)
+
+        assert {node.id for node in result.nodes} == {"input", "agent1"}
+        assert [edge.id for edge in result.edges] == ["e0"]
+
+    def test_bidirectional_edge(self):
+        """Test that bidirectional edges are followed both ways."""
+        workflow = make_workflow(
+            [("agent1", "agent2", {"data": {"direction": "bidirectional"}})],
+            node_ids=("agent1", "agent2"),
+        )
+
+        result = extract_subgraph(workflow, "agent2", TraversalDirection.DOWN)
+
+        assert {node.id for node in result.nodes} == {"agent1", "agent2"}
+
+    def test_unknown_node(self, chain_workflow):
+        """Test that an unknown node returns None."""
+        assert extract_subgraph(chain_workflow, "missing") is None
+
+    def test_index_cached_per_version(self, chain_workflow):
+        """Test that the adjacency index is reused until the version changes."""
+        first = get_graph_index(chain_workflow)
+        assert get_graph_index(chain_workflow) is first
+
+        bumped = chain_workflow.model_copy(update={"version": 2})
+        assert get_graph_index(bumped) is not first
+
+
+class TestExecutionPlan:
+    """Test suite for the topological execution plan."""
+
+    def test_stages_group_independent_nodes(self, chain_workflow):
+        """Test that Kahn levels put independent nodes in the same stage."""
+        plan = get_execution_plan(chain_workflow)
+
+        assert plan.stages == [["input"], ["agent1"], ["agent2", "agent3"], ["output"]]
+        assert plan.cyclic_nodes == []
+        assert plan.unscheduled_nodes == []
+
+    def test_critical_path(self, chain_workflow):
+        """Test that the critical path is the longest dependency chain."""
+        plan = get_execution_plan(chain_workflow)
+
+        assert plan.critical_path == ["input", "agent1", "agent2", "output"]
+
+    def test_fan_in_fan_out(self, chain_workflow):
+        """Test per-node fan-in and fan-out counts."""
+        plan = get_execution_plan(chain_workflow)
+
+        assert plan.nodes["agent1"].fan_in == 1
+        assert plan.nodes["agent1"].fan_out == 2
+        assert plan.nodes["output"].stage == 3
+
+    def test_cycle_reported(self):
+        """Test that nodes on a cycle are left unscheduled."""
+        workflow = make_workflow(
+            [("input", "agent1"), ("agent1", "agent2"), ("agent2", "agent1")],
+            node_ids=("input", "agent1", "agent2"),
+        )
+
+        plan = get_execution_plan(workflow)
+
+        assert plan.stages == [["input"]]
+        assert sorted(plan.cyclic_nodes) == ["agent1", "agent2"]
+        assert plan.nodes["agent1"].stage is None
+
+    def test_downstream_of_cycle_is_unscheduled_but_not_cyclic(self):
+        """Test that only nodes on the cycle are cyclic; nodes after it are just unscheduled."""
+        workflow = make_workflow(
+            [
+                ("input", "agent1"),
+                ("agent1", "agent2"),
+                ("agent2", "agent1"),
+                ("agent2", "agent3"),
+                ("agent3", "output"),
+            ]
+        )
+
+        plan = get_execution_plan(workflow)
+
+        assert sorted(plan.cyclic_nodes) == ["agent1", "agent2"]
+        assert sorted(plan.unscheduled_nodes) == ["agent1", "agent2", "agent3", "output"]
+        assert plan.nodes["output"].stage is None
+
+    def test_self_loop_is_not_a_cycle(self):
+        """Test that a node feeding itself is scheduled and not reported as cyclic."""
+        workflow = make_workflow(
+            [("input", "agent1"), ("agent1", "agent1")], node_ids=("input", "agent1")
+        )
+
+        plan = get_execution_plan(workflow)
+
+        assert plan.stages == [["input"], ["agent1"]]
+        assert plan.cyclic_nodes == []
+
+    def test_plan_cached_per_version(self, chain_workflow):
+        """Test that the plan is computed once per version."""
+        assert get_execution_plan(chain_workflow) is get_execution_plan(chain_workflow)
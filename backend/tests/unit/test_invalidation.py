@@ -0,0 +1,152 @@
+from datetime import datetime
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+from app.core.config import settings
+from app.models.user import User
+from app.services import compiler, graph
+from app.services.auth import user_cache
+from app.services.invalidation import CacheInvalidator, run_cache_invalidation
+
+
+def _user(user_id: str, username: str) -> User:
+    now = datetime.utcnow()
+    return User(id=user_id, username=username, created_at=now, updated_at=now)
+
+
+class FakeStream:
+    """Change stream replaying events, then failing with the given error (if any)."""
+
+    def __init__(self, events, error=None):
+        self._events = list(events)
+        self._error = error
+        self.resume_token = None
+        self.alive = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def try_next(self):
+        if self._events:
+            change = self._events.pop(0)
+            self.resume_token = {"_data": change["_id"]}
+            return change
+        if self._error is not None:
+            raise self._error
+        self.alive = False
+        return None
+
+
+class FakeDatabase:
+    """Database whose watch() hands out prepared streams, recording resume tokens."""
+
+    def __init__(self, *streams):
+        self._streams = list(streams)
+        self.start_after = []
+
+    def watch(self, pipeline, start_after=None):
+        self.start_after.append(start_after)
+        return self._streams.pop(0)
+
+
+@pytest.fixture
+def invalidator(monkeypatch):
+    """A fresh invalidator that leaves cache TTLs as it found them."""
+    monkeypatch.setattr(settings, "CACHE_INVALIDATION_RETRY_SECONDS", 0)
+    ttl = user_cache.ttl
+    yield CacheInvalidator()
+    user_cache.ttl = ttl
+
+
+class TestCacheInvalidation:
+    """Test suite for change-stream driven cache invalidation."""
+
+    def test_user_change_drops_cached_user(self, invalidator):
+        """Test that an update to a user document evicts that user only."""
+        user_id = ObjectId()
+        user_cache.set("alice", _user(str(user_id), "alice"))
+        user_cache.set("bob", _user(str(ObjectId()), "bob"))
+
+        invalidator.publish(
+            {"operationType": "update", "ns": {"coll": "users"}, "documentKey": {"_id": user_id}}
+        )
+
+        assert user_cache.get("alice") is None
+        assert user_cache.get("bob") is not None
+
+    def test_workflow_delete_drops_derived_entries(self, invalidator):
+        """Test that compiled artifacts and graph indexes of a deleted workflow are dropped."""
+        workflow_id = ObjectId()
+        compiler._compiled_cache.set((str(workflow_id), 1), object())
+        compiler._compiled_cache.set(("other", 1), object())
+        graph._index_cache.set((str(workflow_id), 2), object())
+
+        invalidator.publish(
+            {
+                "operationType": "delete",
+                "ns": {"coll": "workflows"},
+                "documentKey": {"_id": workflow_id},
+            }
+        )
+
+        assert (str(workflow_id), 1) not in compiler._compiled_cache
+        assert ("other", 1) in compiler._compiled_cache
+        assert (str(workflow_id), 2) not in graph._index_cache
+        compiler._compiled_cache.pop(("other", 1))
+
+    def test_drop_database_clears_everything(self, invalidator):
+        """Test that collection-wide events clear every subscribed cache."""
+        user_cache.set("alice", _user(str(ObjectId()), "alice"))
+
+        invalidator.publish({"operationType": "dropDatabase", "ns": {"db": "musashi"}})
+
+        assert len(user_cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_watch_resumes_then_falls_back(self, invalidator, monkeypatch):
+        """Test resuming from the last token, and the TTL fallback on a standalone server."""
+        monkeypatch.setattr(settings, "CACHE_FALLBACK_TTL_SECONDS", 1)
+        user_id = ObjectId()
+        user_cache.set("alice", _user(str(user_id), "alice"))
+        change = {
+            "_id": "token-1",
+            "operationType": "replace",
+            "ns": {"coll": "users"},
+            "documentKey": {"_id": user_id},
+        }
+        db = FakeDatabase(
+            FakeStream([change], error=PyMongoError("connection reset")),
+            FakeStream([], error=OperationFailure("not a replica set", code=40573)),
+        )
+
+        await invalidator.watch(db)
+
+        assert db.start_after == [None, {"_data": "token-1"}]
+        assert user_cache.get("alice") is None
+        assert user_cache.ttl == 1
+        assert not invalidator.watching
+
+    @pytest.mark.asyncio
+    async def test_embedded_backend_uses_fallback_ttl(self, invalidator, monkeypatch):
+        """Test that backends without change streams only cap TTLs, and restoring undoes it."""
+        from app.services import invalidation
+
+        monkeypatch.setattr(invalidation, "cache_invalidator", invalidator)
+        monkeypatch.setattr(settings, "STORAGE_BACKEND", "sqlite")
+        monkeypatch.setattr(settings, "CACHE_FALLBACK_TTL_SECONDS", 2)
+        configured = user_cache.ttl
+
+        await run_cache_invalidation(db=None)
+        assert user_cache.ttl == min(configured, 2)
+
+        invalidator.use_configured_ttl()
+        assert user_cache.ttl == configured
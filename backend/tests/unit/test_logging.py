@@ -0,0 +1,141 @@
+import io
+import json
+import logging
+import queue
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core import logging as logging_module
+from app.core.config import settings
+
+
+@pytest.fixture
+def log_output(monkeypatch):
+    """Logging configured to write JSON lines into a buffer; yields a function reading them."""
+    monkeypatch.setattr(settings, "LOG_FORMAT", "json")
+    monkeypatch.setattr(settings, "LOG_LEVEL", "info")
+    monkeypatch.setattr(settings, "LOG_LEVELS", "tests.chatty=debug")
+    monkeypatch.setattr(settings, "LOG_DEBUG_SAMPLE_EVERY", 1)
+    stream = io.StringIO()
+    logging_module.shutdown_logging()
+    logging_module.configure_logging(stream)
+
+    def read():
+        logging_module.shutdown_logging()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield read
+    logging_module.shutdown_logging()
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("tests.chatty").setLevel(logging.NOTSET)
+
+
+def _record(level: int, lineno: int = 1) -> logging.LogRecord:
+    return logging.LogRecord("tests", level, __file__, lineno, "message", None, None)
+
+
+class TestLogging:
+    """Test suite for the queued, structured logging pipeline."""
+
+    def test_json_records_carry_request_id_and_extras(self, log_output):
+        """Test that records become JSON lines with the request id set when they were logged."""
+        token = logging_module.request_id.set("req-1")
+        try:
+            logging.getLogger("tests.app").info("saved %s", "draft", extra={"workflow": "w1"})
+        finally:
+            logging_module.request_id.reset(token)
+        logging.getLogger("tests.app").info("outside")
+
+        first, second = log_output()
+        assert first["message"] == "saved draft"
+        assert (first["level"], first["logger"]) == ("INFO", "tests.app")
+        assert (first["request_id"], first["workflow"]) == ("req-1", "w1")
+        assert second["request_id"] == "-"
+
+    def test_exception_text_is_kept(self, log_output):
+        """Test that a traceback logged with exception() reaches the output."""
+        try:
+            raise ValueError("broken")
+        except ValueError:
+            logging.getLogger("tests.app").exception("failed")
+
+        (entry,) = log_output()
+        assert entry["message"] == "failed"
+        assert "ValueError: broken" in entry["exception"]
+
+    def test_per_module_levels(self, log_output):
+        """Test that LOG_LEVELS lowers one logger's level without affecting the rest."""
+        logging.getLogger("tests.chatty").debug("kept")
+        logging.getLogger("tests.quiet").debug("dropped")
+
+        assert [entry["message"] for entry in log_output()] == ["kept"]
+
+    def test_debug_sampling(self):
+        """Test that debug records are sampled per call site and warnings always pass."""
+        sampler = logging_module.DebugSampler(3)
+
+        kept = [sampler.filter(_record(logging.DEBUG)) for _ in range(7)]
+        other_site = sampler.filter(_record(logging.DEBUG, lineno=2))
+        warning = _record(logging.WARNING)
+
+        assert kept == [True, False, False, True, False, False, True]
+        assert other_site
+        assert all(sampler.filter(warning) for _ in range(3))
+        assert not hasattr(warning, "sampled")
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """Test that records beyond the queue size are counted as dropped."""
+        handler = logging_module.NonBlockingQueueHandler(queue.Queue(1))
+        dropped = logging_module.log_records_dropped.snapshot().get((), 0)
+
+        handler.handle(_record(logging.INFO))
+        handler.handle(_record(logging.INFO))
+
+        assert handler.queue.qsize() == 1
+        assert logging_module.log_records_dropped.snapshot()[()] == dropped + 1
+
+    def test_parse_levels(self):
+        """Test the LOG_LEVELS format."""
+        assert logging_module.parse_levels("app.services=debug, pymongo=WARNING,,bad") == {
+            "app.services": logging.DEBUG,
+            "pymongo": logging.WARNING,
+        }
+
+
+class TestRequestIdMiddleware:
+    """Test suite for request ids."""
+
+    @pytest.fixture
+    def client(self):
+        app = FastAPI()
+
+        @app.get("/work")
+        async def work():
+            logging.getLogger("tests.app").info("working")
+            return {"request_id": logging_module.request_id.get()}
+
+        app.add_middleware(logging_module.RequestIdMiddleware)
+        return TestClient(app)
+
+    def test_generated_id_is_logged_and_returned(self, client, log_output):
+        """Test that a request without an id gets one, in its logs and its response."""
+        response = client.get("/work")
+
+        (entry,) = [entry for entry in log_output() if entry["logger"] == "tests.app"]
+        assert response.headers["x-request-id"] == response.json()["request_id"]
+        assert entry["request_id"] == response.json()["request_id"]
+
+    def test_incoming_id_is_reused_only_if_well_formed(self, client):
+        """Test that a proxy's id is kept and a malformed one replaced."""
+        kept = client.get("/work", headers={"X-Request-ID": "edge-42"})
+        replaced = client.get("/work", headers={"X-Request-ID": "bad id\twith spaces"})
+
+        assert kept.headers["x-request-id"] == "edge-42"
+        assert replaced.headers["x-request-id"] != "bad id\twith spaces"
+        assert len(replaced.headers["x-request-id"]) == 32
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import time
+from datetime import datetime
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core.database import command_observers
+from app.core.profiling import ProfilingMiddleware
+from app.models.user import User, UserRole
+from app.services.auth import AuthService
+
+
+def _busy(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def _mongo_command(seconds: float) -> None:
+    """Stand-in for a MongoDB command, reported the way the command listener does"""
+    for observer in command_observers.get():
+        observer.command_started(None)
+    await asyncio.sleep(seconds)
+    for observer in command_observers.get():
+        observer.command_finished(None, "workflows")
+
+
+@pytest.fixture
+def client(memory_backend, monkeypatch):
+    """Client for an app with one slow endpoint behind the profiling middleware."""
+    monkeypatch.setattr(settings, "PROFILING_MAX_PER_MINUTE", 2)
+    monkeypatch.setattr(settings, "PROFILING_OUTPUT_DIR", None)
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        _busy(0.05)
+        await _mongo_command(0.05)
+        await asyncio.sleep(0.05)
+        return {"done": True}
+
+    app.add_middleware(ProfilingMiddleware)
+    return TestClient(app)
+
+
+async def _token(db, role: UserRole) -> str:
+    now = datetime.utcnow()
+    document = {"username": role.value, "role": role, "is_active": True}
+    result = await db.users.insert_one({**document, "created_at": now, "updated_at": now})
+    user = User(id=str(result.inserted_id), created_at=now, updated_at=now, **document)
+    return AuthService(db).create_user_tokens(user).access_token
+
+
+class TestProfiling:
+    """Test suite for on-demand request profiling."""
+
+    @pytest.mark.asyncio
+    async def test_admin_gets_speedscope_profile(self, client, memory_db):
+        """Test that a profiled request splits its time into CPU, database and other waits."""
+        token = await _token(memory_db, UserRole.ADMIN)
+
+        response = client.get(
+            "/slow", headers={"Authorization": f"Bearer {token}", "X-Profile": "1"}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["x-profiled-status"] == "200"
+        profile = response.json()
+        names = {frame["name"] for frame in profile["shared"]["frames"]}
+        assert {"_busy", "[awaiting database]", "[awaiting other I/O]"} <= names
+        summary = dict(
+            item.split("=") for item in response.headers["x-profile-summary"].split(", ")
+        )
+        for key in ("cpu_ms", "database_ms", "other_ms"):
+            assert float(summary[key]) >= 25
+        assert sum(profile["profiles"][0]["weights"]) <= float(summary["wall_ms"]) + 5
+
+    @pytest.mark.asyncio
+    async def test_non_admin_is_served_unprofiled(self, client, memory_db):
+        """Test that the flag is ignored for users who are not admins."""
+        token = await _token(memory_db, UserRole.USER)
+
+        response = client.get("/slow?profile=1", headers={"Authorization": f"Bearer {token}"})
+
+        assert response.json() == {"done": True}
+        assert "x-profile-summary" not in response.headers
+
+    @pytest.mark.asyncio
+    async def test_rate_limited(self, client, memory_db):
+        """Test that profiles beyond the per-minute limit are skipped, not refused."""
+        headers = {"Authorization": f"Bearer {await _token(memory_db, UserRole.ADMIN)}"}
+
+        for _ in range(2):
+            assert "x-profiled-status" in client.get("/slow?profile=1", headers=headers).headers
+        response = client.get("/slow?profile=1", headers=headers)
+
+        assert response.json() == {"done": True}
+        assert response.headers["x-profile"] == "rate-limited"
+
+    @pytest.mark.asyncio
+    async def test_stores_profile(self, client, memory_db, monkeypatch, tmp_path):
+        """Test that with an output directory the response passes through and the file is named."""
+        monkeypatch.setattr(settings, "PROFILING_OUTPUT_DIR", str(tmp_path))
+        token = await _token(memory_db, UserRole.ADMIN)
+
+        response = client.get("/slow?profile=1", headers={"Authorization": f"Bearer {token}"})
+
+        assert response.json() == {"done": True}
+        stored = json.loads((tmp_path / response.headers["x-profile"]).read_text())
+        assert stored["profiles"][0]["type"] == "sampled"
@@ -0,0 +1,135 @@
+import pytest
+import time
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.models.user import TokenPayload
+from app.services.revocation import BloomFilter, RevocationList
+
+
+class AsyncCursor:
+    """Minimal async iterator standing in for a Motor cursor."""
+
+    def __init__(self, docs):
+        self.docs = list(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.docs:
+            raise StopAsyncIteration
+        return self.docs.pop(0)
+
+
+class TestRevocation:
+    """Test suite for the token revocation list."""
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test that every added item is reported as present."""
+        bloom = BloomFilter(capacity=1000)
+        items = [uuid.uuid4().hex for _ in range(1000)]
+        for item in items:
+            bloom.add(item)
+
+        assert all(item in bloom for item in items)
+        false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+        assert false_positives < 100
+
+    def test_revoke_token_by_jti(self):
+        """Test that only the revoked jti is rejected."""
+        revocations = RevocationList(capacity=10)
+        revocations.add_token("revoked", time.time() + 60)
+
+        assert revocations.is_revoked(TokenPayload(sub="alice", jti="revoked"))
+        assert not revocations.is_revoked(TokenPayload(sub="alice", jti="other"))
+        assert not revocations.is_revoked(TokenPayload(sub="alice"))
+
+    def test_filter_grows_past_capacity(self):
+        """Test that revocations beyond the initial capacity are still caught."""
+        revocations = RevocationList(capacity=4)
+        jtis = [uuid.uuid4().hex for _ in range(50)]
+        for jti in jtis:
+            revocations.add_token(jti, time.time() + 60)
+
+        assert all(revocations.is_revoked(TokenPayload(sub="alice", jti=jti)) for jti in jtis)
+
+    def test_revoke_user_by_issue_time(self):
+        """Test that a user cutoff revokes older tokens but not newer ones."""
+        revocations = RevocationList(capacity=10)
+        cutoff = int(time.time())
+        revocations.add_user("alice", cutoff, time.time() + 60)
+
+        assert revocations.is_revoked(TokenPayload(sub="alice", iat=cutoff - 10))
+        assert revocations.is_revoked(TokenPayload(sub="alice"))  # Legacy token without iat
+        assert not revocations.is_revoked(TokenPayload(sub="alice", iat=cutoff + 1))
+        assert not revocations.is_revoked(TokenPayload(sub="bob", iat=cutoff - 10))
+
+    def test_prune_drops_expired_entries(self):
+        """Test that entries are forgotten once their tokens have expired."""
+        revocations = RevocationList(capacity=10)
+        revocations.add_token("expired", time.time() - 1)
+        revocations.add_token("live", time.time() + 60)
+        revocations.add_user("alice", int(time.time()), time.time() - 1)
+
+        revocations.prune()
+
+        assert not revocations.is_revoked(TokenPayload(sub="alice", jti="expired"))
+        assert revocations.is_revoked(TokenPayload(sub="bob", jti="live"))
+
+    @pytest.mark.asyncio
+    async def test_sync_reads_incrementally(self):
+        """Test that sync applies stored revocations and then queries from the watermark."""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(hours=1)
+        db = MagicMock()
+        db.revoked_tokens.find = MagicMock(
+            return_value=AsyncCursor(
+                [
+                    {"jti": "abc", "revoked_at": now, "expires_at": expires_at},
+                    {
+                        "username": "alice",
+                        "revoked_before": int(time.time()),
+                        "revoked_at": now,
+                        "expires_at": expires_at,
+                    },
+                ]
+            )
+        )
+        revocations = RevocationList(capacity=10)
+
+        await revocations.sync(db)
+
+        assert revocations.is_revoked(TokenPayload(sub="bob", jti="abc"))
+        assert revocations.is_revoked(TokenPayload(sub="alice", iat=int(time.time()) - 5))
+        db.revoked_tokens.find.assert_called_once_with({})
+
+        db.revoked_tokens.find = MagicMock(return_value=AsyncCursor([]))
+        await revocations.sync(db)
+        query = db.revoked_tokens.find.call_args[0][0]
+        assert query["revoked_at"]["$gte"] < now
+
+    @pytest.mark.asyncio
+    async def test_logout_revokes_token(self, auth_service, mock_db, sample_user):
+        """Test that a token is rejected after it has been revoked."""
+        from fastapi import HTTPException
+        from fastapi.security import HTTPAuthorizationCredentials
+        from app.services.revocation import revoke_token
+
+        mock_db.users.find_one = AsyncMock(return_value=dict(sample_user))
+        token = auth_service.create_access_token({"sub": "testuser"}, timedelta(minutes=5))
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        await auth_service.get_current_user(credentials)
+
+        await revoke_token(mock_db, auth_service.decode_token(token))
+
+        with pytest.raises(HTTPException) as exc_info:
+            await auth_service.get_current_user(credentials)
+        assert exc_info.value.status_code == 401
+        assert mock_db.revoked_tokens.update_one.call_args.kwargs["upsert"] is True
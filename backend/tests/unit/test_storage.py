@@ -0,0 +1,203 @@
+from datetime import datetime, timedelta
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import pytest
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.services.storage import engine
+from app.services.storage.query import apply_update, matches, project
+from app.services.storage.memory import open_memory_database
+from app.services.storage.sqlite import open_sqlite_database
+from app.services.user import duplicate_key_field
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def storage_db(request, tmp_path):
+    if request.param == "sqlite":
+        db = open_sqlite_database(str(tmp_path / "musashi.db"), "musashi")
+    else:
+        db = open_memory_database()
+    yield db
+    db.close()
+
+
+class TestQuery:
+    """Test suite for MongoDB query and update semantics."""
+
+    def test_matches_operators(self):
+        """Test comparison, membership, existence and logical operators."""
+        doc = {"version": 3, "owner_id": "u1", "tags": ["a", "b"], "meta": {"level": 2}}
+
+        assert matches(doc, {"version": {"$gte": 3, "$lt": 4}})
+        assert matches(doc, {"tags": "a"})
+        assert matches(doc, {"meta.level": {"$in": [1, 2]}})
+        assert matches(doc, {"email": None})
+        assert matches(doc, {"email": {"$exists": False}})
+        assert matches(doc, {"$or": [{"owner_id": "u2"}, {"version": 3}]})
+        assert not matches(doc, {"version": {"$gt": "2"}})
+        assert not matches(doc, {"owner_id": {"$ne": "u1"}})
+        assert not matches(doc, {"email": {"$type": "string"}})
+
+    def test_apply_update(self):
+        """Test $set, $inc, $unset and $push with $each and $slice."""
+        doc = {"name": "a", "version": 1, "logs": [1, 2], "draft": True}
+        apply_update(
+            doc,
+            {
+                "$set": {"name": "b", "metadata.saved": True},
+                "$inc": {"version": 1},
+                "$unset": {"draft": ""},
+                "$push": {"logs": {"$each": [3, 4], "$slice": -3}},
+            },
+        )
+
+        assert doc == {"name": "b", "version": 2, "logs": [2, 3, 4], "metadata": {"saved": True}}
+
+    def test_projection(self):
+        """Test inclusion and exclusion projections."""
+        doc = {"_id": 1, "username": "a", "hashed_password": "x"}
+
+        assert project(doc, {"hashed_password": 0}) == {"_id": 1, "username": "a"}
+        assert project(doc, {"username": 1, "_id": 0}) == {"username": "a"}
+
+
+class TestEmbeddedStorage:
+    """Test suite for the embedded SQLite and in-memory backends."""
+
+    @pytest.mark.asyncio
+    async def test_round_trips_bson_types(self, storage_db):
+        """Test that ObjectIds and datetimes come back as they went in."""
+        created_at = datetime(2024, 1, 2, 3, 4, 5, 678000)
+        document = {"owner_id": ObjectId(), "created_at": created_at, "nodes": [{"id": "n1"}]}
+        result = await storage_db.workflows.insert_one(document)
+
+        assert document["_id"] == result.inserted_id
+        stored = await storage_db.workflows.find_one({"_id": result.inserted_id})
+        assert stored == document
+
+    @pytest.mark.asyncio
+    async def test_results_are_copies(self, storage_db):
+        """Test that mutating a document after writing or reading it leaves the stored one alone."""
+        document = {"name": "a", "nodes": [{"id": "n1"}]}
+        await storage_db.workflows.insert_one(document)
+        document["nodes"].append({"id": "n2"})
+        found = await storage_db.workflows.find_one({"name": "a"})
+        found["nodes"].clear()
+
+        stored = await storage_db.workflows.find_one({"name": "a"})
+        assert stored["nodes"] == [{"id": "n1"}]
+
+    @pytest.mark.asyncio
+    async def test_find_skip_limit_sort(self, storage_db):
+        """Test cursor filtering, ordering and paging."""
+        await storage_db.workflows.insert_many(
+            [{"owner_id": "u1" if i % 2 else "u2", "version": i} for i in range(10)]
+        )
+
+        cursor = storage_db.workflows.find({"owner_id": "u1"}).sort("version", -1).skip(1).limit(2)
+        workflows = await cursor.to_list(length=None)
+
+        assert [workflow["version"] for workflow in workflows] == [7, 5]
+        assert await storage_db.workflows.count_documents({"version": {"$gte": 5}}) == 5
+
+    @pytest.mark.asyncio
+    async def test_update_operators_and_upsert(self, storage_db):
+        """Test update_one results, upserts and find_one_and_update."""
+        inserted = await storage_db.workflows.insert_one({"version": 1, "update_logs": []})
+
+        result = await storage_db.workflows.update_one(
+            {"_id": inserted.inserted_id, "version": 1},
+            {"$inc": {"version": 1}, "$push": {"update_logs": {"$each": ["a"], "$slice": -50}}},
+        )
+        assert (result.matched_count, result.modified_count) == (1, 1)
+
+        stale = await storage_db.workflows.update_one(
+            {"_id": inserted.inserted_id, "version": 1}, {"$inc": {"version": 1}}
+        )
+        assert stale.matched_count == 0
+
+        upserted = await storage_db.compiled_workflows.update_one(
+            {"workflow_id": "w1", "version": 2}, {"$set": {"nodes": []}}, upsert=True
+        )
+        assert upserted.upserted_id is not None
+        assert await storage_db.compiled_workflows.find_one({"workflow_id": "w1"}) == {
+            "_id": upserted.upserted_id,
+            "workflow_id": "w1",
+            "version": 2,
+            "nodes": [],
+        }
+
+        after = await storage_db.workflows.find_one_and_update(
+            {"_id": inserted.inserted_id},
+            {"$set": {"name": "renamed"}},
+            projection={"update_logs": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+        assert after == {"_id": inserted.inserted_id, "version": 2, "name": "renamed"}
+
+    @pytest.mark.asyncio
+    async def test_unique_and_partial_indexes(self, storage_db):
+        """Test unique indexes, ignoring documents outside a partial filter."""
+        await storage_db.users.create_index("username", unique=True)
+        await storage_db.users.create_index(
+            "email", unique=True, partialFilterExpression={"email": {"$type": "string"}}
+        )
+        await storage_db.users.insert_one({"username": "a", "email": None})
+        await storage_db.users.insert_one({"username": "b", "email": None})
+
+        with pytest.raises(DuplicateKeyError) as error:
+            await storage_db.users.insert_one({"username": "a"})
+        assert duplicate_key_field(error.value.details) == "username"
+
+        with pytest.raises(BulkWriteError) as error:
+            await storage_db.users.insert_many(
+                [{"username": "c", "email": "x@y.z"}, {"username": "d", "email": "x@y.z"}],
+                ordered=False,
+            )
+        assert error.value.details["nInserted"] == 1
+        assert error.value.details["writeErrors"][0]["index"] == 1
+        assert duplicate_key_field(error.value.details["writeErrors"][0]) == "email"
+
+    @pytest.mark.asyncio
+    async def test_indexes_persist_across_processes(self, tmp_path):
+        """Test that a second handle on the same file enforces indexes created by the first."""
+        path = str(tmp_path / "shared.db")
+        first = open_sqlite_database(path, "musashi")
+        second = open_sqlite_database(path, "musashi")
+        try:
+            await first.users.create_index("username", unique=True)
+            await second.users.insert_one({"username": "a"})
+            with pytest.raises(DuplicateKeyError):
+                await first.users.insert_one({"username": "a"})
+        finally:
+            first.close()
+            second.close()
+
+    @pytest.mark.asyncio
+    async def test_delete_and_ttl_expiry(self, storage_db, monkeypatch):
+        """Test deletes and that TTL indexes purge expired documents."""
+        monkeypatch.setattr(engine, "TTL_INTERVAL_SECONDS", 0)
+        await storage_db.revoked_tokens.create_index("expires_at", expireAfterSeconds=0)
+        now = datetime.utcnow()
+        await storage_db.revoked_tokens.insert_many(
+            [
+                {"jti": "old", "expires_at": now - timedelta(minutes=1)},
+                {"jti": "new", "expires_at": now + timedelta(hours=1)},
+                {"jti": "other", "expires_at": now + timedelta(hours=1)},
+            ]
+        )
+
+        remaining = await storage_db.revoked_tokens.find({}).to_list(None)
+        assert [doc["jti"] for doc in remaining] == ["new", "other"]
+
+        deleted = await storage_db.revoked_tokens.find_one_and_delete(
+            {"jti": "new"}, projection={"jti": 1, "_id": 0}
+        )
+        assert deleted == {"jti": "new"}
+        result = await storage_db.revoked_tokens.delete_many({})
+        assert result.deleted_count == 1
@@ -0,0 +1,162 @@
+"""
+Parity checks between the embedded storage backends and MongoDB.
+
+Each case states the result MongoDB gives and runs against the in-memory and
+SQLite backends. With MONGODB_PARITY_URL pointing at a mongod, the same cases
+also run against it, so an expectation that MongoDB disagrees with fails there.
+"""
+
+import os
+import uuid
+from datetime import datetime
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import pytest
+import pytest_asyncio
+from bson import ObjectId
+from app.services.storage.memory import open_memory_database
+from app.services.storage.sqlite import open_sqlite_database
+
+PARITY_URL = os.getenv("MONGODB_PARITY_URL")
+
+
+@pytest_asyncio.fixture(params=["memory", "sqlite", "mongodb"])
+async def parity_db(request, tmp_path):
+    if request.param == "mongodb":
+        if not PARITY_URL:
+            pytest.skip("MONGODB_PARITY_URL not set")
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(PARITY_URL)
+        name = f"musashi_parity_{uuid.uuid4().hex[:8]}"
+        yield client[name]
+        await client.drop_database(name)
+        client.close()
+        return
+    if request.param == "sqlite":
+        db = open_sqlite_database(str(tmp_path / "musashi.db"), "musashi")
+    else:
+        db = open_memory_database()
+    yield db
+    db.close()
+
+
+async def _labels(collection, filter=None, sort=None):
+    cursor = collection.find(filter or {})
+    if sort:
+        cursor = cursor.sort(sort)
+    return [doc["label"] for doc in await cursor.to_list(None)]
+
+
+class TestStorageParity:
+    """Test suite for query, sort and update results that must match MongoDB."""
+
+    @pytest.mark.asyncio
+    async def test_sort_orders_mixed_types(self, parity_db):
+        """Test BSON type order, and arrays sorting by their smallest or largest element."""
+        await parity_db.items.insert_many(
+            [
+                {"label": "date", "v": datetime(2024, 1, 1)},
+                {"label": "string b", "v": "b"},
+                {"label": "objectid", "v": ObjectId("65a000000000000000000000")},
+                {"label": "int", "v": 2},
+                {"label": "missing"},
+                {"label": "object", "v": {"x": 1}},
+                {"label": "bool", "v": True},
+                {"label": "array", "v": [3, 0.5]},
+                {"label": "string a", "v": "a"},
+                {"label": "double", "v": 1.5},
+            ]
+        )
+
+        assert await _labels(parity_db.items, sort=[("v", 1)]) == [
+            "missing", "array", "double", "int", "string a", "string b",
+            "object", "objectid", "bool", "date",
+        ]
+        assert await _labels(parity_db.items, sort=[("v", -1)]) == [
+            "date", "bool", "objectid", "object", "string b", "string a",
+            "array", "int", "double", "missing",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_sort_compares_embedded_documents_field_by_field(self, parity_db):
+        """Test that embedded documents sort by their fields in order."""
+        await parity_db.items.insert_many(
+            [
+                {"label": "b1", "v": {"k": "b", "n": 1}},
+                {"label": "a2", "v": {"k": "a", "n": 2}},
+                {"label": "a1", "v": {"k": "a", "n": 1}},
+            ]
+        )
+
+        assert await _labels(parity_db.items, sort=[("v", 1)]) == ["a1", "a2", "b1"]
+
+    @pytest.mark.asyncio
+    async def test_push_with_slice(self, parity_db):
+        """Test $push with $each and positive, negative and zero $slice."""
+        await parity_db.items.insert_one({"_id": 1, "logs": [1, 2]})
+
+        async def push(each, limit, field="logs"):
+            await parity_db.items.update_one(
+                {"_id": 1}, {"$push": {field: {"$each": each, "$slice": limit}}}
+            )
+            return (await parity_db.items.find_one({"_id": 1})).get(field)
+
+        assert await push([3, 4], -3) == [2, 3, 4]
+        assert await push([5], 2) == [2, 3]
+        assert await push([6, 7, 8], -10) == [2, 3, 6, 7, 8]
+        assert await push([9], 0) == []
+        assert await push([1, 2, 3], -1, field="fresh") == [3]
+
+    @pytest.mark.asyncio
+    async def test_array_equality(self, parity_db):
+        """Test matching a whole array, an element, and nested arrays."""
+        await parity_db.items.insert_many(
+            [
+                {"label": "ab", "tags": ["a", "b"]},
+                {"label": "ba", "tags": ["b", "a"]},
+                {"label": "nested", "tags": [["a", "b"], "c"]},
+                {"label": "scalar", "tags": "a"},
+            ]
+        )
+        items = parity_db.items
+        sort = [("label", 1)]
+
+        assert await _labels(items, {"tags": ["a", "b"]}, sort) == ["ab", "nested"]
+        assert await _labels(items, {"tags": {"$eq": ["b", "a"]}}, sort) == ["ba"]
+        assert await _labels(items, {"tags": "a"}, sort) == ["ab", "ba", "scalar"]
+        assert await _labels(items, {"tags": {"$ne": "a"}}, sort) == ["nested"]
+        assert await _labels(items, {"tags": {"$in": [["b", "a"], "c"]}}, sort) == [
+            "ba", "nested",
+        ]
+        assert await _labels(items, {"tags": {"$size": 2}}, sort) == ["ab", "ba", "nested"]
+
+    @pytest.mark.asyncio
+    async def test_embedded_document_equality_is_field_order_sensitive(self, parity_db):
+        """Test that an embedded document only equals one with the same fields in order."""
+        await parity_db.items.insert_one({"label": "meta", "meta": {"a": 1, "b": 2}})
+
+        assert await _labels(parity_db.items, {"meta": {"a": 1, "b": 2}}) == ["meta"]
+        assert await _labels(parity_db.items, {"meta": {"b": 2, "a": 1}}) == []
+
+    @pytest.mark.asyncio
+    async def test_comparisons_stay_within_a_type(self, parity_db):
+        """Test that range operators only compare values of the same BSON type."""
+        await parity_db.items.insert_many(
+            [
+                {"label": "number", "v": 1},
+                {"label": "string", "v": "2"},
+                {"label": "null", "v": None},
+                {"label": "bool", "v": False},
+            ]
+        )
+        sort = [("label", 1)]
+
+        assert await _labels(parity_db.items, {"v": {"$gt": 0}}, sort) == ["number"]
+        assert await _labels(parity_db.items, {"v": {"$lt": "z"}}, sort) == ["string"]
+        assert await _labels(parity_db.items, {"v": {"$gte": None}}, sort) == ["null"]
+        assert await _labels(parity_db.items, {"v": {"$eq": 0}}, sort) == []
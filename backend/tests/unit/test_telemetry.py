@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.cache import LRUCache, register_cache
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram, render_prometheus
+from app.core.telemetry import (
+    OTHER_METHOD,
+    UNMATCHED_ROUTE,
+    HTTPMetricsMiddleware,
+    event_loop_lag_seconds,
+    http_request_bytes,
+    http_request_seconds,
+    http_requests_in_flight,
+    http_response_bytes,
+    run_event_loop_lag_monitor,
+)
+
+
+@pytest.fixture
+def client():
+    """Client for a small app behind the metrics middleware."""
+    app = FastAPI()
+
+    @app.post("/items/{item_id}")
+    async def echo(item_id: str, body: dict):
+        return {"item_id": item_id, **body}
+
+    app.add_middleware(HTTPMetricsMiddleware)
+    return TestClient(app)
+
+
+class TestPrometheusExposition:
+    """Test suite for rendering metrics in the Prometheus text format."""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that per-bucket counts become cumulative, ending in +Inf, sum and count."""
+        histogram = Histogram("test_seconds", "Test", labels=("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, "/a")
+
+        lines = render_prometheus([histogram]).splitlines()
+
+        assert lines[:2] == ["# HELP test_seconds Test", "# TYPE test_seconds histogram"]
+        assert lines[2:] == [
+            'test_seconds_bucket{route="/a",le="0.1"} 1',
+            'test_seconds_bucket{route="/a",le="1"} 2',
+            'test_seconds_bucket{route="/a",le="+Inf"} 3',
+            'test_seconds_sum{route="/a"} 5.55',
+            'test_seconds_count{route="/a"} 3',
+        ]
+
+    def test_label_values_are_escaped(self):
+        """Test that quotes, backslashes and newlines in label values are escaped."""
+        counter = Counter("test_total", "Test", labels=("name",))
+        counter.inc('a"b\\c\nd')
+
+        assert 'test_total{name="a\\"b\\\\c\\nd"} 1' in render_prometheus([counter])
+
+
+class TestHTTPMetricsMiddleware:
+    """Test suite for the per-route request metrics."""
+
+    def test_records_route_template_and_sizes(self, client):
+        """Test that requests are labelled by route template, with body sizes."""
+        before = http_request_seconds.snapshot().get(("POST", "/items/{item_id}", "200"))
+        count = before["count"] if before else 0
+
+        response = client.post("/items/42", json={"name": "x"})
+
+        labels = ("POST", "/items/{item_id}", "200")
+        assert http_request_seconds.snapshot()[labels]["count"] == count + 1
+        assert http_request_bytes.snapshot()[labels]["sum"] >= len(b'{"name":"x"}')
+        assert http_response_bytes.snapshot()[labels]["sum"] >= len(response.content)
+        assert http_requests_in_flight.snapshot()[()] == 0
+
+    def test_unknown_paths_share_one_label(self, client):
+        """Test that unmatched paths do not create a series each."""
+        client.get("/nope/1")
+        client.get("/nope/2")
+
+        routes = {labels[1] for labels in http_request_seconds.snapshot()}
+        assert UNMATCHED_ROUTE in routes
+        assert not any(route.startswith("/nope") for route in routes)
+
+    def test_unknown_methods_share_one_label(self, client):
+        """Test that arbitrary request methods do not create a series each."""
+        for method in ("FOO1", "FOO2"):
+            client.request(method, "/items/1")
+
+        methods = {labels[0] for labels in http_request_seconds.snapshot()}
+        assert OTHER_METHOD in methods
+        assert not any(method.startswith("FOO") for method in methods)
+
+class TestMetricsEndpoint:
+    """Test suite for /metrics on the application."""
+
+    def test_exposes_caches_and_database_timings(self):
+        """Test that the scrape includes cache hit ratios and Mongo command timings."""
+        from app.main import app
+
+        cache = register_cache("test_telemetry", LRUCache(maxsize=4))
+        cache.set("k", 1)
+        cache.get("k")
+        cache.get("missing")
+
+        response = TestClient(app).get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'cache_hit_ratio{cache="test_telemetry"} 0.5' in response.text
+        assert "# TYPE mongodb_command_duration_seconds histogram" in response.text
+        assert "# TYPE http_request_duration_seconds histogram" in response.text
+
+    def test_token_is_required_when_configured(self, monkeypatch):
+        """Test that with METRICS_TOKEN set, only scrapes sending it are served."""
+        from app.main import app
+
+        monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+        client = TestClient(app)
+
+        missing = client.get("/metrics")
+        wrong = client.get("/metrics", headers={"Authorization": "Bearer guess"})
+        right = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+
+        assert (missing.status_code, wrong.status_code) == (401, 401)
+        assert missing.headers["www-authenticate"] == "Bearer"
+        assert right.status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_event_loop_lag_is_sampled(self):
+        """Test that a blocked loop shows up as lag."""
+        count = event_loop_lag_seconds.snapshot().get((), {"count": 0})["count"]
+        monitor = asyncio.create_task(run_event_loop_lag_monitor(0.01))
+        await asyncio.sleep(0)
+        time.sleep(0.05)
+        await asyncio.sleep(0.05)
+        monitor.cancel()
+
+        lag = event_loop_lag_seconds.snapshot()[()]
+        assert lag["count"] > count
+        assert lag["sum"] >= 0.03
@@ -0,0 +1,138 @@
+import pytest
+from bson import ObjectId
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.models.workflow import Workflow
+from app.services import tokens
+
+
+class WhitespaceEncoding:
+    """Offline stand-in for a tiktoken encoding that records what it encodes."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode_batch(self, texts, disallowed_special="all"):
+        # Like tiktoken, refuse special-token markers unless told otherwise
+        if disallowed_special == "all" and any("<|endoftext|>" in text for text in texts):
+            raise ValueError("Encountered text corresponding to disallowed special token")
+        self.calls.append(list(texts))
+        return [text.split() for text in texts]
+
+
+@pytest.fixture
+def encoding(monkeypatch):
+    fake = WhitespaceEncoding()
+    monkeypatch.setattr(tokens, "get_encoding", lambda name: fake)
+    tokens._count_cache.clear()
+    return fake
+
+
+def make_workflow(developer_message, prompts=(), max_tokens=100):
+    return Workflow(
+        _id=str(ObjectId()),
+        name="Tokens",
+        owner_id="507f1f77bcf86cd799439011",
+        nodes=[
+            {
+                "id": "agent",
+                "type": "agent",
+                "label": "Agent",
+                "properties": {
+                    "parameters": {
+                        "model": "gpt-4o",
+                        "max_tokens": max_tokens,
+                        "developer_message": developer_message,
+                        "prompts": [{"type": "user", "content": text} for text in prompts],
+                    }
+                },
+            },
+            {"id": "input", "type": "userinput", "label": "Input"},
+        ],
+    )
+
+
+class TestTokenCounting:
+    """Test suite for per-workflow prompt token counting."""
+
+    @pytest.mark.asyncio
+    async def test_counts_per_node(self, encoding):
+        """Test developer message, prompt and total counts for an agent node."""
+        report = await tokens.count_workflow_tokens(
+            make_workflow("one two three", prompts=["four five"], max_tokens=4)
+        )
+
+        (node,) = report.nodes
+        assert node.encoding == "o200k_base"
+        assert node.developer_message_tokens == 3
+        assert node.prompt_tokens == 2
+        assert node.total_tokens == 5
+        assert node.exceeds_max_tokens is True
+        assert report.total_tokens == 5
+
+    @pytest.mark.asyncio
+    async def test_recount_only_encodes_changed_text(self, encoding):
+        """Test that unchanged prompts are served from the cache."""
+        await tokens.count_workflow_tokens(make_workflow("stable text", prompts=["old prompt"]))
+        await tokens.count_workflow_tokens(make_workflow("stable text", prompts=["new prompt here"]))
+
+        assert encoding.calls == [["stable text", "old prompt"], ["new prompt here"]]
+
+    @pytest.mark.asyncio
+    async def test_special_token_markers_are_plain_text(self, encoding):
+        """Test that a prompt containing <|endoftext|> is counted instead of failing."""
+        report = await tokens.count_workflow_tokens(make_workflow("stop <|endoftext|> here"))
+
+        assert report.nodes[0].developer_message_tokens == 3
+
+    @pytest.mark.asyncio
+    async def test_encoding_is_loaded_off_the_event_loop(self, monkeypatch):
+        """Test that loading an encoding, which may read or download files, is off the loop."""
+        import threading
+
+        loaded_on = []
+
+        def load(name):
+            loaded_on.append(threading.current_thread())
+            return WhitespaceEncoding()
+
+        monkeypatch.setattr(tokens, "get_encoding", load)
+        tokens._count_cache.clear()
+
+        await tokens.count_tokens(["some text"], "o200k_base")
+
+        assert loaded_on and loaded_on[0] is not threading.main_thread()
+
+    @pytest.mark.asyncio
+    async def test_max_tokens_given_as_string(self, encoding):
+        """Test that a max_tokens stored as text is compared as a number."""
+        report = await tokens.count_workflow_tokens(make_workflow("one two", max_tokens="1"))
+
+        assert report.nodes[0].max_tokens == 1
+        assert report.nodes[0].exceeds_max_tokens is True
+
+    @pytest.mark.asyncio
+    async def test_unavailable_encoding_is_a_503(self, monkeypatch):
+        """Test that an encoding that cannot be loaded (e.g. offline) is reported as 503."""
+        from fastapi import HTTPException
+
+        def load(name):
+            raise ConnectionError("no network")
+
+        monkeypatch.setattr(tokens, "get_encoding", load)
+        tokens._count_cache.clear()
+
+        with pytest.raises(HTTPException) as error:
+            await tokens.count_tokens(["some text"], "o200k_base")
+
+        assert error.value.status_code == 503
+        assert "o200k_base" in error.value.detail
+
+    def test_unknown_model_uses_default_encoding(self):
+        """Test the fallback encoding for non-OpenAI models."""
+        assert tokens.encoding_name_for_model("claude-sonnet-4") == "o200k_base"
+        assert tokens.encoding_name_for_model(None) == "o200k_base"
@@ -1,7 +1,8 @@
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 from bson import ObjectId
-from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from pymongo import ReturnDocument
 
 import sys
 from pathlib import Path
@@ -9,11 +10,17 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from app.models.user import UserCreate, UserUpdate
+from app.services import user as user_module
 
 
 class TestUserService:
     """Test suite for UserService."""
 
+    @pytest.fixture(autouse=True)
+    def unique_indexes(self, monkeypatch):
+        """Writes rely on the unique indexes, as after a normal startup."""
+        monkeypatch.setattr(user_module, "unique_indexes_ready", True)
+
     @pytest.mark.asyncio
     async def test_create_user(self, user_service, mock_db):
         """Test user creation."""
@@ -23,29 +30,18 @@ class TestUserService:
 
         inserted_id = ObjectId()
         mock_db.users.insert_one.return_value = MagicMock(inserted_id=inserted_id)
-        mock_db.users.find_one.side_effect = [
-            None,  # Check for existing username
-            None,  # Check for existing email
-            {  # Return created user
-                "_id": inserted_id,
-                "username": "newuser",
-                "email": "new@example.com",
-                "hashed_password": "hashed_password",
-                "is_active": True,
-                "role": "user",
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow(),
-            },
-        ]
 
         result = await user_service.create_user(user_data)
 
         assert result is not None
+        assert result.id == str(inserted_id)
         assert result.username == "newuser"
         assert result.email == "new@example.com"
         assert result.is_active is True
         assert result.role == "user"
         mock_db.users.insert_one.assert_called_once()
+        # The created user is built from the inserted document, not re-read
+        mock_db.users.find_one.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_create_user_duplicate_username(self, user_service, mock_db):
@@ -55,13 +51,17 @@ class TestUserService:
         )
 
         # Username already exists
-        mock_db.users.find_one.return_value = {"username": "existinguser"}
+        mock_db.users.insert_one.side_effect = DuplicateKeyError(
+            "E11000 duplicate key error",
+            code=11000,
+            details={"keyPattern": {"username": 1}, "keyValue": {"username": "existinguser"}},
+        )
 
         with pytest.raises(ValueError) as exc_info:
             await user_service.create_user(user_data)
 
         assert "username already registered" in str(exc_info.value).lower()
-        mock_db.users.insert_one.assert_not_called()
+        mock_db.users.find_one.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_create_user_duplicate_email(self, user_service, mock_db):
@@ -71,16 +71,16 @@ class TestUserService:
         )
 
         # Email already exists
-        mock_db.users.find_one.side_effect = [
-            None,  # Username check
-            {"email": "existing@example.com"},  # Email check
-        ]
+        mock_db.users.insert_one.side_effect = DuplicateKeyError(
+            "E11000 duplicate key error",
+            code=11000,
+            details={"keyPattern": {"email": 1}, "keyValue": {"email": "existing@example.com"}},
+        )
 
         with pytest.raises(ValueError) as exc_info:
             await user_service.create_user(user_data)
 
         assert "email already registered" in str(exc_info.value).lower()
-        mock_db.users.insert_one.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_get_user_by_username(self, user_service, mock_db, sample_user):
@@ -136,8 +136,7 @@ class TestUserService:
         update_data = UserUpdate(email="newemail@example.com", is_active=False)
 
         updated_user = {**sample_user, "email": "newemail@example.com", "is_active": False}
-        # Mock find_one to return None for email check, then updated_user for final fetch
-        mock_db.users.find_one.side_effect = [None, updated_user]
+        mock_db.users.find_one_and_update.return_value = updated_user
 
         result = await user_service.update_user(user_id, update_data)
 
@@ -145,10 +144,30 @@ class TestUserService:
         assert result.email == "newemail@example.com"
         assert result.is_active is False
 
-        mock_db.users.update_one.assert_called_once()
-        update_call = mock_db.users.update_one.call_args[0]
+        mock_db.users.find_one_and_update.assert_called_once()
+        update_call = mock_db.users.find_one_and_update.call_args[0]
         assert update_call[0] == {"_id": ObjectId(user_id)}
         assert "$set" in update_call[1]
+        mock_db.users.find_one.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_update_user_duplicate_email(self, user_service, mock_db, sample_user):
+        """Test updating user to an email that is already taken."""
+        from fastapi import HTTPException
+
+        mock_db.users.find_one_and_update.side_effect = DuplicateKeyError(
+            "E11000 duplicate key error",
+            code=11000,
+            details={"keyPattern": {"email": 1}, "keyValue": {"email": "taken@example.com"}},
+        )
+
+        with pytest.raises(HTTPException) as exc_info:
+            await user_service.update_user(
+                str(sample_user["_id"]), UserUpdate(email="taken@example.com")
+            )
+
+        assert exc_info.value.status_code == 400
+        assert exc_info.value.detail == "Email already exists"
 
     @pytest.mark.asyncio
     async def test_update_user_password(self, user_service, mock_db, sample_user):
@@ -156,14 +175,15 @@ class TestUserService:
         user_id = str(sample_user["_id"])
         update_data = UserUpdate(password="NewPassword123!")
 
-        mock_db.users.find_one.return_value = sample_user
+        mock_db.users.find_one_and_update.return_value = sample_user
 
         result = await user_service.update_user(user_id, update_data)
 
         assert result is not None
+        assert not hasattr(result, "hashed_password")
 
         # Check that password was hashed before update
-        update_call = mock_db.users.update_one.call_args[0][1]["$set"]
+        update_call = mock_db.users.find_one_and_update.call_args[0][1]["$set"]
         assert "hashed_password" in update_call
         assert update_call["hashed_password"] != "NewPassword123!"
 
@@ -171,20 +191,130 @@ class TestUserService:
     async def test_delete_user(self, user_service, mock_db):
         """Test deleting user."""
         user_id = str(ObjectId())
-        mock_db.users.delete_one.return_value = MagicMock(deleted_count=1)
+        mock_db.users.find_one_and_delete.return_value = {
+            "_id": ObjectId(user_id),
+            "username": "testuser",
+        }
 
         result = await user_service.delete_user(user_id)
 
         assert result is True
-        mock_db.users.delete_one.assert_called_once_with({"_id": ObjectId(user_id)})
+        assert mock_db.users.find_one_and_delete.call_args[0][0] == {"_id": ObjectId(user_id)}
 
     @pytest.mark.asyncio
     async def test_delete_user_not_found(self, user_service, mock_db):
         """Test deleting non-existent user."""
         user_id = str(ObjectId())
-        mock_db.users.delete_one.return_value = MagicMock(deleted_count=0)
+        mock_db.users.find_one_and_delete.return_value = None
 
         result = await user_service.delete_user(user_id)
 
         assert result is False
-        mock_db.users.delete_one.assert_called_once_with({"_id": ObjectId(user_id)})
+        assert mock_db.users.find_one_and_delete.call_args[0][0] == {"_id": ObjectId(user_id)}
+
+    @pytest.mark.asyncio
+    async def test_deactivation_revokes_tokens(self, user_service, mock_db, sample_user):
+        """Test that deactivating a user revokes their outstanding tokens."""
+        from app.models.user import AdminUserUpdate, TokenPayload
+        from app.services.revocation import revocation_list
+
+        user_id = str(sample_user["_id"])
+        mock_db.users.find_one_and_update.return_value = {**sample_user, "is_active": False}
+
+        await user_service.admin_update_user(user_id, AdminUserUpdate(is_active=False))
+
+        assert revocation_list.is_revoked(TokenPayload(sub="testuser", iat=0))
+        mock_db.revoked_tokens.update_one.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_self_rename_revokes_old_username(self, user_service, mock_db, sample_user):
+        """Test that a user renaming themselves cannot keep using tokens for the old name."""
+        from app.models.user import TokenPayload
+        from app.services.revocation import revocation_list
+
+        user_id = str(sample_user["_id"])
+        mock_db.users.find_one_and_update.return_value = sample_user
+
+        result = await user_service.update_user(user_id, UserUpdate(username="renamed"))
+
+        assert result.username == "renamed"
+        assert revocation_list.is_revoked(TokenPayload(sub="testuser", iat=0))
+        assert not revocation_list.is_revoked(TokenPayload(sub="renamed", iat=0))
+        mock_db.users.find_one.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_rename_and_deactivate_revokes_old_username(
+        self, user_service, mock_db, sample_user
+    ):
+        """Test that tokens issued under the name a user had before a rename are revoked."""
+        from app.models.user import AdminUserUpdate, TokenPayload
+        from app.services.revocation import revocation_list
+
+        user_id = str(sample_user["_id"])
+        mock_db.users.find_one_and_update.return_value = sample_user
+
+        await user_service.admin_update_user(
+            user_id, AdminUserUpdate(username="renamed", is_active=False)
+        )
+
+        assert revocation_list.is_revoked(TokenPayload(sub="testuser", iat=0))
+        assert revocation_list.is_revoked(TokenPayload(sub="renamed", iat=0))
+        revoked = {
+            call.args[0]["username"] for call in mock_db.revoked_tokens.update_one.call_args_list
+        }
+        assert revoked == {"testuser", "renamed"}
+        assert (
+            mock_db.users.find_one_and_update.call_args.kwargs["return_document"]
+            == ReturnDocument.BEFORE
+        )
+        mock_db.users.find_one.assert_not_called()
+
+
+class TestUniquenessFallback:
+    """Test suite for the read-based checks used while the unique indexes are missing."""
+
+    @pytest.fixture(autouse=True)
+    def missing_indexes(self, monkeypatch):
+        monkeypatch.setattr(user_module, "unique_indexes_ready", False)
+
+    @pytest.mark.asyncio
+    async def test_create_user_checks_with_reads(self, user_service, mock_db, sample_user):
+        """Test that a duplicate username is refused before any insert."""
+        mock_db.users.find_one.return_value = sample_user
+
+        with pytest.raises(ValueError, match="Username already registered"):
+            await user_service.create_user(
+                UserCreate(username="testuser", password="Password123!")
+            )
+
+        mock_db.users.insert_one.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_update_excludes_the_user_itself(self, user_service, mock_db, sample_user):
+        """Test that an update checks the new email against other users only."""
+        from fastapi import HTTPException
+
+        user_id = str(sample_user["_id"])
+        mock_db.users.find_one.return_value = {"_id": ObjectId(), "email": "taken@example.com"}
+
+        with pytest.raises(HTTPException) as exc_info:
+            await user_service.update_user(user_id, UserUpdate(email="taken@example.com"))
+
+        assert exc_info.value.detail == "Email already exists"
+        assert mock_db.users.find_one.call_args[0][0] == {
+            "email": "taken@example.com",
+            "_id": {"$ne": ObjectId(user_id)},
+        }
+        mock_db.users.find_one_and_update.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_ensure_indexes_turns_off_the_reads(self, user_service, mock_db):
+        """Test that once the indexes exist, creating a user is a single insert."""
+        mock_db.users.create_index = AsyncMock()
+        mock_db.users.insert_one.return_value = MagicMock(inserted_id=ObjectId())
+
+        await user_service.ensure_indexes()
+        await user_service.create_user(UserCreate(username="fresh", password="Password123!"))
+
+        assert user_module.unique_indexes_ready
+        mock_db.users.find_one.assert_not_called()
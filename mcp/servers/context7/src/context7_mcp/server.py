@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 
 import json
-import logging
 import os
 from typing import Any, Dict, List, Optional
 from datetime import datetime, timedelta
@@ -20,9 +19,10 @@ from mcp.types import (
 )
 from pydantic import BaseModel, Field
 
+from .log import configure_logging
+
 # Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger("context7-mcp")
+logger = configure_logging("context7-mcp")
 
 class ContextWindow(BaseModel):
     """Represents a context window with semantic boundaries."""
@@ -0,0 +1,62 @@
+"""Queued JSON logging to stderr (stdout carries the MCP protocol)."""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger and message."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Drops records when the writer thread falls behind instead of blocking the server."""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def configure_logging(name: str) -> logging.Logger:
+    """Send all logging through a bounded queue to a writer thread.
+
+    LOG_LEVEL sets the level (MCP_DEBUG=1 forces debug) and LOG_LEVELS
+    overrides it per logger, e.g. "httpx=warning".
+    """
+    root = logging.getLogger()
+    if not any(isinstance(handler, _DroppingQueueHandler) for handler in root.handlers):
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(JSONFormatter())
+        handler = _DroppingQueueHandler(queue.Queue(int(os.getenv("LOG_QUEUE_SIZE", "10000"))))
+        listener = logging.handlers.QueueListener(handler.queue, output)
+        root.addHandler(handler)
+        listener.start()
+        atexit.register(listener.stop)
+
+        level = "debug" if os.getenv("MCP_DEBUG") == "1" else os.getenv("LOG_LEVEL", "info")
+        root.setLevel(level.upper())
+        for item in os.getenv("LOG_LEVELS", "").split(","):
+            logger_name, _, logger_level = item.partition("=")
+            if logger_name.strip() and logger_level.strip():
+                logging.getLogger(logger_name.strip()).setLevel(logger_level.strip().upper())
+    return logging.getLogger(name)
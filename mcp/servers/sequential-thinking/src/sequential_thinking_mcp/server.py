@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 
 import json
-import logging
 import os
 from typing import Any, Dict, List, Optional, Union
 from datetime import datetime
@@ -19,13 +18,14 @@ from mcp.types import (
     LoggingMessage
 )
 from pydantic import BaseModel, Field
+
+from .log import configure_logging
 from rich.console import Console
 from rich.panel import Panel
 from rich.text import Text
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger("sequential-thinking-mcp")
+logger = configure_logging("sequential-thinking-mcp")
 
 console = Console()
 
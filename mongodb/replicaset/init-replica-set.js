@@ -0,0 +1,15 @@
+// Initiate rs0 with members reachable from the host through the published ports
+try {
+  rs.status();
+  print("Replica set already initiated");
+} catch (e) {
+  rs.initiate({
+    _id: "rs0",
+    members: [
+      { _id: 0, host: "localhost:27017", priority: 2 },
+      { _id: 1, host: "localhost:27018" },
+      { _id: 2, host: "localhost:27019" },
+    ],
+  });
+  print("Replica set rs0 initiated");
+}